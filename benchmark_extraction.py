@@ -0,0 +1,187 @@
+"""Benchmarks extracting kinship terms from comments with a KinshipMatcher (patterns compiled once) against the way
+extract_kinship_terms.py used to do it: the query string passed to regex.finditer for every comment, and a scan of
+the whole comment for every determiner. With --n-processes, it instead times write_csv_from_json on a json file of
+comments with each number of processes, and with --engines it compares the throughput of the term matching engines.
+
+Comments are the synthetic comments from mock_pushshift.py, joined together to make longer comments.
+
+Examples:
+    python benchmark_extraction.py --n-comments 5000 --sentences-per-comment 1 5 20
+    python benchmark_extraction.py --n-comments 200000 --sentences-per-comment 5 --n-processes 1 2 4 8
+    python benchmark_extraction.py --engines regex trie --sentences-per-comment 1 5 20
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import regex
+
+import extract_kinship_terms
+from mock_pushshift import make_comments
+
+
+def legacy_determine_determiner(first, sentence):
+    for category, determiners in [('specific', extract_kinship_terms.SPECIFIC_DETERMINERS),
+                                  ('mixed', extract_kinship_terms.MIXED_DETERMINERS),
+                                  ('generic', extract_kinship_terms.GENERIC_DETERMINERS)]:
+        for determiner in determiners:
+            if determiner == '\'s':
+                query_str = rf'(?P<det>{determiner})\s'
+            else:
+                query_str = rf'(^|\s)(?P<det>{determiner})\s'
+            for match in regex.finditer(query_str, sentence, regex.IGNORECASE):
+                start, end = match.span()
+                if end == first:
+                    return category, sentence[start:end].strip()
+    return 'generic', ''
+
+
+def legacy_extract_from_comment(sentence, query):
+    results = []
+    for search_result in regex.finditer(query, sentence, regex.IGNORECASE):
+        term_found = search_result.group("kinship_pl")
+        if term_found is None:
+            term_found = search_result.group("kinship_term")
+            first, _ = search_result.span("kinship_term")
+        else:
+            first, _ = search_result.span("kinship_pl")
+        term_found = term_found.lower()
+        singular = 'wife' if term_found == 'wives' else search_result.group("kinship_term").lower()
+        specific, determiner = legacy_determine_determiner(first, sentence)
+        results.append({'text': sentence, 'kinship_term': singular, 'singular': term_found == singular,
+                        'specific': specific, 'index': first, 'determiner': determiner})
+    return results
+
+
+def make_bodies(n_comments, sentences_per_comment, seed=0):
+    sentences = [c['body'] for c in make_comments('benchmark', n_comments * sentences_per_comment, seed)]
+    return [' '.join(sentences[i:i + sentences_per_comment])
+            for i in range(0, len(sentences), sentences_per_comment)]
+
+
+def time_per_comment(extract, bodies, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for body in bodies:
+            extract(body)
+        best = min(best, time.perf_counter() - start)
+    return best / len(bodies)
+
+
+def run_benchmark(terms_file=extract_kinship_terms.TERMS_FILE, n_comments=5000, sentences_per_comment=(1, 5, 20),
+                  repeats=3):
+    matcher = extract_kinship_terms.KinshipMatcher(terms_file)
+    results = []
+    for n_sentences in sentences_per_comment:
+        bodies = make_bodies(n_comments, n_sentences)
+        assert all(legacy_extract_from_comment(body, matcher.query) == matcher.extract(body) for body in bodies)
+        legacy = time_per_comment(lambda body: legacy_extract_from_comment(body, matcher.query), bodies, repeats)
+        compiled = time_per_comment(matcher.extract, bodies, repeats)
+        results.append({
+            'sentences_per_comment': n_sentences,
+            'comments': len(bodies),
+            'legacy_us_per_comment': legacy * 1e6,
+            'matcher_us_per_comment': compiled * 1e6,
+            'speedup': legacy / compiled,
+        })
+    return results
+
+
+def run_engine_benchmark(terms_file=extract_kinship_terms.TERMS_FILE, n_comments=5000, sentences_per_comment=(1, 5, 20),
+                         engines=('regex', 'trie'), repeats=3):
+    """Time finding the terms (find_terms) and extracting them (extract) with each matcher engine."""
+    query = extract_kinship_terms.get_terms(terms_file)
+    matchers = {engine: extract_kinship_terms.KinshipMatcher(query=query, engine=engine) for engine in engines}
+    results = []
+    for n_sentences in sentences_per_comment:
+        bodies = make_bodies(n_comments, n_sentences)
+        characters = sum(len(body) for body in bodies)
+        for engine, matcher in matchers.items():
+            find = time_per_comment(lambda body: list(matcher.find_terms(body)), bodies, repeats)
+            extract = time_per_comment(matcher.extract, bodies, repeats)
+            results.append({
+                'engine': engine,
+                'sentences_per_comment': n_sentences,
+                'comments': len(bodies),
+                'find_us_per_comment': find * 1e6,
+                'find_mb_per_second': characters / len(bodies) / find / 1e6,
+                'extract_us_per_comment': extract * 1e6,
+            })
+    return results
+
+
+def run_scaling_benchmark(terms_file=extract_kinship_terms.TERMS_FILE, n_comments=200000, sentences_per_comment=5,
+                          n_processes=(1, 2, 4, 8)):
+    """Time write_csv_from_json on n_comments comments with each number of processes, checking that every csv file
+    is the same.
+    """
+    matcher = extract_kinship_terms.KinshipMatcher(terms_file)
+    bodies = make_bodies(n_comments, sentences_per_comment)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file = os.path.join(tmp_dir, 'benchmark.json')
+        with open(file, 'w', encoding='utf-8') as f:
+            for i, body in enumerate(bodies):
+                f.write(json.dumps({'body': body, 'author': 'someone', 'subreddit': 'benchmark', 'created_utc': i,
+                                    'id': format(i, 'x')}) + '\n')
+
+        expected = None
+        for n in n_processes:
+            start = time.perf_counter()
+            extract_kinship_terms.write_csv_from_json(file, matcher, n_processes=n)
+            elapsed = time.perf_counter() - start
+            with open(os.path.join(tmp_dir, 'benchmark.csv'), 'rb') as f:
+                output = f.read()
+            if expected is None:
+                expected = output
+            assert output == expected, f'the csv file written with {n} processes is different'
+            results.append({
+                'n_processes': n,
+                'comments': len(bodies),
+                'seconds': elapsed,
+                'comments_per_second': len(bodies) / elapsed,
+                'speedup': results[0]['seconds'] / elapsed if results else 1.0,
+            })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--terms-file', default=extract_kinship_terms.TERMS_FILE)
+    parser.add_argument('--n-comments', type=int, default=5000)
+    parser.add_argument('--sentences-per-comment', type=int, nargs='+', default=[1, 5, 20])
+    parser.add_argument('--repeats', type=int, default=3, help='the fastest of this many runs is reported')
+    parser.add_argument('--n-processes', type=int, nargs='+',
+                        help='time write_csv_from_json with each of these numbers of processes instead')
+    parser.add_argument('--engines', nargs='+', choices=['regex', 'trie'],
+                        help='compare these term matching engines instead')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    if args.engines:
+        results = run_engine_benchmark(args.terms_file, args.n_comments, args.sentences_per_comment, args.engines,
+                                       args.repeats)
+        print(f"{'engine':<8}{'sentences':>10}{'comments':>10}{'find us':>10}{'find MB/s':>11}{'extract us':>12}")
+        for r in results:
+            print(f"{r['engine']:<8}{r['sentences_per_comment']:>10}{r['comments']:>10}"
+                  f"{r['find_us_per_comment']:>10.1f}{r['find_mb_per_second']:>11.2f}{r['extract_us_per_comment']:>12.1f}")
+    elif args.n_processes:
+        results = run_scaling_benchmark(args.terms_file, args.n_comments, args.sentences_per_comment[0],
+                                        args.n_processes)
+        print(f"{'processes':>10}{'comments':>10}{'seconds':>10}{'comments/s':>12}{'speedup':>9}")
+        for r in results:
+            print(f"{r['n_processes']:>10}{r['comments']:>10}{r['seconds']:>10.2f}{r['comments_per_second']:>12.1f}"
+                  f"{r['speedup']:>9.2f}")
+    else:
+        results = run_benchmark(args.terms_file, args.n_comments, args.sentences_per_comment, args.repeats)
+        print(f"{'sentences':>10}{'comments':>10}{'legacy us':>12}{'matcher us':>12}{'speedup':>9}")
+        for r in results:
+            print(f"{r['sentences_per_comment']:>10}{r['comments']:>10}{r['legacy_us_per_comment']:>12.1f}"
+                  f"{r['matcher_us_per_comment']:>12.1f}{r['speedup']:>9.2f}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,163 @@
+"""Benchmarks each stage of extract_kinship_terms.py and collect_data.py on a synthetic corpus from
+synthetic_corpus.py, at several corpus sizes.
+
+The stages are timed separately, each on the output of the one before:
+    read        parsing the json file into comments
+    filter      valid_comments (bots, deleted authors, removed bodies)
+    match       the prefilter and finding the kinship terms in the comments that pass the filter
+    determiner  determine_determiner for every term found
+    csv_write   writing the rows to a csv file
+    extract     all of the above, with write_csv_from_json
+    frequency   collect_data.py's unique_valid_bodies and count_frequencies
+The results (and the arguments, Python version, platform and git commit) are written as json with --json, and
+--compare prints the speedup of each stage over the results of an earlier run.
+
+Example:
+    python benchmark_pipeline.py --n-comments 10000 100000 1000000 --json results.json
+    python benchmark_pipeline.py --n-comments 10000 100000 --compare results.json
+"""
+
+import argparse
+import csv
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from itertools import islice
+
+import extract_kinship_terms
+from synthetic_corpus import write_corpus
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def result(n_comments, stage, seconds, items, unit):
+    return {'n_comments': n_comments, 'stage': stage, 'seconds': seconds, 'items': items, 'unit': unit,
+            'per_second': items / seconds if seconds else float('nan')}
+
+
+def time_stages(file, n_comments, n_bytes, matcher):
+    """Time each stage on the json file of n_comments comments (n_bytes long), and return a result per stage."""
+    results = []
+    start = time.perf_counter()
+    comments = list(extract_kinship_terms.read_comments(file))
+    results.append(result(n_comments, 'read', time.perf_counter() - start, n_bytes / 1e6, 'MB'))
+
+    start = time.perf_counter()
+    valid = []
+    it = iter(comments)
+    batch = list(islice(it, extract_kinship_terms.FILTER_BATCH_SIZE))
+    while batch:
+        mask = extract_kinship_terms.valid_comments([c['author'] for c in batch], [c['body'] for c in batch],
+                                                    [c['subreddit'] for c in batch])
+        valid.extend(c for c, keep in zip(batch, mask) if keep)
+        batch = list(islice(it, extract_kinship_terms.FILTER_BATCH_SIZE))
+    results.append(result(n_comments, 'filter', time.perf_counter() - start, len(comments), 'comments'))
+
+    start = time.perf_counter()
+    found = []
+    for data in valid:
+        body = data['body']
+        if extract_kinship_terms.PREFILTER and not matcher.might_contain_terms(body):
+            continue
+        found.extend((body, first) for first, _, _ in matcher.find_terms(body))
+    results.append(result(n_comments, 'match', time.perf_counter() - start, len(valid), 'comments'))
+
+    start = time.perf_counter()
+    for body, first in found:
+        extract_kinship_terms.determine_determiner(first, body)
+    results.append(result(n_comments, 'determiner', time.perf_counter() - start, len(found), 'terms'))
+
+    rows = [row for data in valid for row in extract_kinship_terms.comment_rows(data, matcher, valid=True)]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        start = time.perf_counter()
+        with open(os.path.join(tmp_dir, 'rows.csv'), 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=extract_kinship_terms.CSV_FIELDNAMES)
+            writer.writeheader()
+            writer.writerows(rows)
+        results.append(result(n_comments, 'csv_write', time.perf_counter() - start, len(rows), 'rows'))
+
+    start = time.perf_counter()
+    extract_kinship_terms.write_csv_from_json(file, matcher)
+    results.append(result(n_comments, 'extract', time.perf_counter() - start, n_comments, 'comments'))
+    return results
+
+
+def time_frequency(file, n_comments, terms_file=extract_kinship_terms.TERMS_FILE):
+    """Time counting word frequencies like collect_data.py, or return None if its tokenizer can't run here (e.g.
+    the nltk data isn't installed).
+    """
+    import collect_data
+
+    start = time.perf_counter()
+    counter = collect_data.FrequencyCounter(terms_file)
+    try:
+        bodies = collect_data.unique_valid_bodies(extract_kinship_terms.read_comments(file))
+        collect_data.count_frequencies(bodies, counter, max_words=float('inf'))
+    except LookupError:
+        print('Skipping the frequency stage: the nltk data collect_data.wtok needs is not installed', file=sys.stderr)
+        return None
+    return result(n_comments, 'frequency', time.perf_counter() - start, counter.total, 'words')
+
+
+def run_benchmark(n_comments=(10000, 100000, 1000000), term_density=0.2,
+                  terms_file=extract_kinship_terms.TERMS_FILE, engine=extract_kinship_terms.MATCHER_ENGINE, seed=0):
+    """Write a synthetic corpus of each size in n_comments, and return the results of timing each stage on it."""
+    matcher = extract_kinship_terms.KinshipMatcher(terms_file, engine=engine)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file = os.path.join(tmp_dir, 'synthetic.json')
+        for n in n_comments:
+            n_bytes = write_corpus(file, n, term_density=term_density, terms_file=terms_file, seed=seed)
+            results.extend(time_stages(file, n, n_bytes, matcher))
+            frequency = time_frequency(file, n, terms_file)
+            if frequency is not None:
+                results.append(frequency)
+    return results
+
+
+def compare(results, previous):
+    """Print the speedup of each stage in results over the same stage and corpus size in previous."""
+    before = {(r['n_comments'], r['stage']): r for r in previous['results']}
+    print(f"{'comments':>10} {'stage':<11}{'before/s':>14}{'now/s':>14}{'speedup':>9}")
+    for r in results:
+        old = before.get((r['n_comments'], r['stage']))
+        if old is not None:
+            print(f"{r['n_comments']:>10} {r['stage']:<11}{old['per_second']:>14.1f}{r['per_second']:>14.1f}"
+                  f"{r['per_second'] / old['per_second']:>9.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--n-comments', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--term-density', type=float, default=0.2,
+                        help='the probability that a sentence has a kinship term')
+    parser.add_argument('--terms-file', default=extract_kinship_terms.TERMS_FILE)
+    parser.add_argument('--engine', default=extract_kinship_terms.MATCHER_ENGINE, choices=['regex', 'trie'])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--compare', help='a results file from an earlier run to compare with')
+    args = parser.parse_args()
+
+    results = run_benchmark(args.n_comments, args.term_density, args.terms_file, args.engine, args.seed)
+    print(f"{'comments':>10} {'stage':<11}{'seconds':>10}{'items':>12} {'unit':<9}{'per second':>14}")
+    for r in results:
+        print(f"{r['n_comments']:>10} {r['stage']:<11}{r['seconds']:>10.3f}{r['items']:>12.1f} {r['unit']:<9}"
+              f"{r['per_second']:>14.1f}")
+    output = {'args': vars(args), 'python': platform.python_version(), 'platform': platform.platform(),
+              'cpu_count': os.cpu_count(), 'commit': git_commit(), 'results': results}
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(output, f, indent=2)
@@ -0,0 +1,108 @@
+"""Benchmarks the scraping modes in scrape_data.py against the local mock in mock_pushshift.py.
+
+For each mode (sequential, concurrent and sharded) this reports comments scraped per second, the number of retries
+(requests answered with a 429 or 5xx, or that failed), the time spent backing off, and the 50th/95th/99th percentile
+request latency seen by the scraper.
+
+Example:
+    python benchmark_scraping.py --n-comments 5000 --latency 0.05 --error-rate-429 0.02 --error-rate-5xx 0.01
+"""
+
+import argparse
+import json
+import tempfile
+import time
+
+import scrape_data
+from mock_pushshift import MockPushshift
+
+MODES = ['sequential', 'concurrent', 'sharded']
+
+
+def percentile(values, p):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def run_mode(mode, mock, subreddits, max_posts, n_workers, n_windows, requests_per_second, stats):
+    """Scrape subreddits from mock using mode, and return the number of comments written."""
+    with tempfile.TemporaryDirectory() as output_dir:
+        kwargs = dict(output_dir=output_dir, max_posts=max_posts, endpoint=mock.endpoint, stats=stats)
+        if mode == 'sequential':
+            session = scrape_data.make_session(1)
+            return sum(scrape_data.retrieve_reddit_data(sub, session=session, **kwargs) for sub in subreddits)
+        if mode == 'concurrent':
+            counts = scrape_data.retrieve_reddit_data_concurrently(
+                subreddits, n_workers=n_workers, requests_per_second=requests_per_second, **kwargs)
+            return sum(counts.values())
+        if mode == 'sharded':
+            total = 0
+            for sub in subreddits:
+                comments = mock.comments[sub.lower()]
+                total += scrape_data.retrieve_reddit_data_sharded(
+                    sub, n_windows=n_windows, start_date=comments[-1]['created_utc'],
+                    end_date=comments[0]['created_utc'] + 1, requests_per_second=requests_per_second, **kwargs)
+            return total
+        raise ValueError(f'unknown mode: {mode}')
+
+
+def run_benchmark(modes=MODES, subreddits=scrape_data.SUBREDDITS, n_comments=5000, max_posts=None, latency=0.05,
+                  error_rate_429=0.0, error_rate_5xx=0.0, n_workers=scrape_data.N_WORKERS,
+                  n_windows=scrape_data.N_WINDOWS, requests_per_second=1000):
+    results = []
+    with MockPushshift(subreddits, n_comments=n_comments, latency=latency, error_rate_429=error_rate_429,
+                       error_rate_5xx=error_rate_5xx, retry_after=0) as mock:
+        for mode in modes:
+            stats = scrape_data.ScrapeStats()
+            start = time.perf_counter()
+            count = run_mode(mode, mock, subreddits, max_posts, n_workers, n_windows, requests_per_second, stats)
+            elapsed = time.perf_counter() - start
+            results.append({
+                'mode': mode,
+                'comments': count,
+                'seconds': elapsed,
+                'comments_per_second': count / elapsed,
+                'requests': stats.requests,
+                'bytes': stats.bytes,
+                'retries': stats.retries,
+                'sleep_seconds': stats.sleep_seconds,
+                'latency_p50': percentile(stats.latencies, 50),
+                'latency_p95': percentile(stats.latencies, 95),
+                'latency_p99': percentile(stats.latencies, 99),
+            })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', nargs='+', default=MODES, choices=MODES)
+    parser.add_argument('--n-comments', type=int, default=5000, help='synthetic comments per subreddit')
+    parser.add_argument('--max-posts', type=int, default=None)
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds added to every response')
+    parser.add_argument('--error-rate-429', type=float, default=0.0)
+    parser.add_argument('--error-rate-5xx', type=float, default=0.0)
+    parser.add_argument('--n-workers', type=int, default=scrape_data.N_WORKERS)
+    parser.add_argument('--n-windows', type=int, default=scrape_data.N_WINDOWS)
+    parser.add_argument('--requests-per-second', type=float, default=1000)
+    parser.add_argument('--backoff-base', type=float, default=0.1,
+                        help='BACKOFF_BASE for the scraper (seconds); lower than the default to keep runs short')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+    scrape_data.BACKOFF_BASE = args.backoff_base
+
+    results = run_benchmark(args.modes, n_comments=args.n_comments, max_posts=args.max_posts, latency=args.latency,
+                            error_rate_429=args.error_rate_429, error_rate_5xx=args.error_rate_5xx,
+                            n_workers=args.n_workers, n_windows=args.n_windows,
+                            requests_per_second=args.requests_per_second)
+
+    print(f"{'mode':<12}{'comments':>10}{'comments/s':>12}{'requests':>10}{'retries':>9}{'sleep s':>9}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for r in results:
+        print(f"{r['mode']:<12}{r['comments']:>10}{r['comments_per_second']:>12.1f}{r['requests']:>10}"
+              f"{r['retries']:>9}{r['sleep_seconds']:>9.2f}{r['latency_p50'] * 1000:>9.1f}"
+              f"{r['latency_p95'] * 1000:>9.1f}{r['latency_p99'] * 1000:>9.1f}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,107 @@
+"""Compares fast_tokenizer.tokenize with nltk.word_tokenize on a sample of comments: how often they agree, how much
+the total number of words (TOTAL_WORDS in part_1_frequency_chi_squared.py) and the frequency of each term in
+terms.csv drift, and how much faster it is.
+
+The sample is the unique valid bodies (as in collect_data.py) of a json file of comments, or a synthetic corpus from
+synthetic_corpus.py. word_tokenize needs the Punkt English model (nltk.download('punkt_tab')).
+
+Examples:
+    python benchmark_tokenizer.py --comments-file ../scripts/reddit_tools/parenting_comment.json --n-comments 100000
+    python benchmark_tokenizer.py --n-comments 20000 --json tokenizer.json
+"""
+
+import argparse
+import json
+import time
+from itertools import islice
+
+from nltk import word_tokenize
+
+import extract_kinship_terms
+import fast_tokenizer
+from collect_data import FrequencyCounter, TERMS_FILE, term_frequencies, unique_valid_bodies
+from synthetic_corpus import make_corpus
+
+
+def words_per_second(tokenize, bodies, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        n_words = sum(len(tokenize(txt)) for txt in bodies)
+        best = min(best, time.perf_counter() - start)
+    return n_words / best
+
+
+def frequencies(tokenize, bodies, terms_file):
+    """Return the number of words in bodies, and the frequency per million words of each term in terms_file, as
+    collect_data.py counts them with tokenize.
+    """
+    counter = FrequencyCounter(terms_file)
+    for txt in bodies:
+        counter.update(tokenize(txt))
+    return counter.total, {term: per_million for term, _, per_million in
+                           term_frequencies(counter.uni, counter.bi, counter.total, terms_file)}
+
+
+def run_report(bodies, terms_file=TERMS_FILE, repeats=3, max_differences=10):
+    """Compare fast_tokenizer.tokenize with nltk.word_tokenize on bodies, keeping up to max_differences examples of
+    comments they tokenize differently.
+    """
+    agree, differences = 0, []
+    for txt in bodies:
+        expected, actual = word_tokenize(txt), fast_tokenizer.tokenize(txt)
+        if expected == actual:
+            agree += 1
+        elif len(differences) < max_differences:
+            differences.append({'text': txt[:200], 'word_tokenize': expected[:50], 'fast': actual[:50]})
+
+    reference_total, reference_frequencies = frequencies(word_tokenize, bodies, terms_file)
+    fast_total, fast_frequencies = frequencies(fast_tokenizer.tokenize, bodies, terms_file)
+    term_drift = {term: fast_frequencies[term] - frequency for term, frequency in reference_frequencies.items()
+                  if fast_frequencies[term] != frequency}
+    reference_speed = words_per_second(word_tokenize, bodies, repeats)
+    fast_speed = words_per_second(fast_tokenizer.tokenize, bodies, repeats)
+    return {
+        'comments': len(bodies),
+        'agreement_rate': agree / len(bodies),
+        'reference_total_words': reference_total,
+        'fast_total_words': fast_total,
+        'total_words_drift': (fast_total - reference_total) / reference_total,
+        'term_frequency_drift_per_million': term_drift,
+        'reference_words_per_second': reference_speed,
+        'fast_words_per_second': fast_speed,
+        'speedup': fast_speed / reference_speed,
+        'differences': differences,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--comments-file', help='a json file of comments (by default, a synthetic corpus)')
+    parser.add_argument('--n-comments', type=int, default=20000)
+    parser.add_argument('--terms-file', default=TERMS_FILE)
+    parser.add_argument('--repeats', type=int, default=3, help='the fastest of this many runs is reported')
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+
+    if args.comments_file:
+        comments = extract_kinship_terms.read_comments(args.comments_file)
+    else:
+        comments = make_corpus(args.n_comments, terms_file=args.terms_file)
+    bodies = list(islice(unique_valid_bodies(comments), args.n_comments))
+    report = run_report(bodies, args.terms_file, args.repeats)
+
+    print(f"{report['comments']} comments")
+    print(f"comments tokenized the same: {report['agreement_rate']:.2%}")
+    print(f"total words: {report['reference_total_words']} -> {report['fast_total_words']} "
+          f"({report['total_words_drift']:+.3%})")
+    print(f"terms with a different frequency per million: {len(report['term_frequency_drift_per_million'])}")
+    for term, drift in sorted(report['term_frequency_drift_per_million'].items()):
+        print(f'    {term}: {drift:+.2f}')
+    print(f"words/s: {report['reference_words_per_second']:.0f} -> {report['fast_words_per_second']:.0f} "
+          f"({report['speedup']:.1f}x)")
+    for difference in report['differences']:
+        print(json.dumps(difference))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
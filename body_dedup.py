@@ -0,0 +1,150 @@
+"""Compact sets of comment bodies, used to skip comments that start the same way as one already seen (copies of the
+same comment, or the same text posted over and over).
+
+Only the first PREFIX_LENGTH characters of a body are compared, and they are kept as a 64-bit hash rather than as a
+string:
+    - BodyHashSet keeps the hashes in a set. Two different prefixes have the same hash with probability 2**-64, so
+      with a billion bodies the chance of any wrongly skipped comment is about 3%;
+    - BodyBloomFilter keeps them in a Bloom filter with a fixed number of bits, chosen for the expected number of
+      bodies and a false positive rate (the fraction of new bodies wrongly taken as already seen). Memory doesn't
+      grow with the corpus, but past that number of bodies the false positive rate goes up.
+Both report how much memory they use and their expected false positive rate with stats().
+"""
+
+import hashlib
+import math
+import sys
+
+# The number of characters at the start of a body that are compared.
+PREFIX_LENGTH = 100
+
+# The defaults for BodyBloomFilter.
+BLOOM_CAPACITY = 10 ** 7
+BLOOM_ERROR_RATE = 1e-4
+
+# The approximate size of a 64-bit int in a set (the int object and its slot in the hash table).
+BYTES_PER_HASH = 60
+
+
+def body_hash(body, normalize=False):
+    """Return a 64-bit hash of the first PREFIX_LENGTH characters of body. When normalize is True, the body is lower
+    cased and runs of whitespace are replaced by a single space first, so e.g. "My mom" and "my  mom" are the same.
+    """
+    if normalize:
+        body = ' '.join(body[:4 * PREFIX_LENGTH].lower().split())
+    return int.from_bytes(hashlib.blake2b(body[:PREFIX_LENGTH].encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class BodyHashSet:
+    """A set of the hashes of comment bodies."""
+
+    def __init__(self, normalize=False):
+        self.normalize = normalize
+        self.hashes = set()
+        self.added = 0
+        self.repeated = 0
+
+    def __len__(self):
+        return len(self.hashes)
+
+    def __contains__(self, body):
+        return body_hash(body, self.normalize) in self.hashes
+
+    def add(self, body):
+        """Add body, and return True if it wasn't in the set yet."""
+        return self.add_hash(body_hash(body, self.normalize))
+
+    def add_hash(self, value):
+        """Add the body_hash of a body, and return True if it wasn't in the set yet."""
+        if value in self.hashes:
+            self.repeated += 1
+            return False
+        self.hashes.add(value)
+        self.added += 1
+        return True
+
+    def memory_bytes(self):
+        return sys.getsizeof(self.hashes) + BYTES_PER_HASH * len(self.hashes)
+
+    def false_positive_rate(self):
+        """Return the probability that the next new body has the same hash as one already added."""
+        return len(self.hashes) / 2 ** 64
+
+    def stats(self):
+        n = len(self.hashes)
+        return {'mode': 'hash', 'added': self.added, 'repeated': self.repeated, 'memory_bytes': self.memory_bytes(),
+                'false_positive_rate': self.false_positive_rate(),
+                'expected_collisions': n * (n - 1) / 2 ** 65}
+
+
+class BodyBloomFilter:
+    """A Bloom filter of the hashes of comment bodies, sized for capacity bodies with a false positive rate of
+    error_rate.
+    """
+
+    def __init__(self, capacity=BLOOM_CAPACITY, error_rate=BLOOM_ERROR_RATE, normalize=False):
+        if capacity < 1:
+            raise ValueError(f'capacity must be at least 1, not {capacity}')
+        if not 0 < error_rate < 1:
+            raise ValueError(f'error_rate must be between 0 and 1, not {error_rate}')
+        self.normalize = normalize
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.n_bits = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.n_hashes = max(1, round(self.n_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.n_bits + 7) // 8)
+        self.n_set = 0  # the number of bits set, kept as they're set so stats() doesn't have to count them
+        self.added = 0
+        self.repeated = 0
+
+    def __len__(self):
+        return self.added
+
+    def __contains__(self, body):
+        return all(self.bits[i >> 3] & (1 << (i & 7)) for i in self._positions(body_hash(body, self.normalize)))
+
+    def _positions(self, value):
+        # double hashing: the k positions are h1 + i * h2, from the two halves of the 64-bit hash
+        h1, h2 = value & 0xffffffff, (value >> 32) | 1
+        return [(h1 + i * h2) % self.n_bits for i in range(self.n_hashes)]
+
+    def add(self, body):
+        """Add body, and return True if it wasn't in the filter yet (or, rarely, False for a new body)."""
+        return self.add_hash(body_hash(body, self.normalize))
+
+    def add_hash(self, value):
+        """Add the body_hash of a body, and return True if it wasn't in the filter yet."""
+        new = False
+        bits = self.bits
+        for i in self._positions(value):
+            byte, bit = i >> 3, 1 << (i & 7)
+            if not bits[byte] & bit:
+                bits[byte] |= bit
+                self.n_set += 1
+                new = True
+        if new:
+            self.added += 1
+        else:
+            self.repeated += 1
+        return new
+
+    def memory_bytes(self):
+        return len(self.bits)
+
+    def false_positive_rate(self):
+        """Return the probability that the next new body is taken as already seen, from the fraction of bits set."""
+        return (self.n_set / self.n_bits) ** self.n_hashes
+
+    def stats(self):
+        return {'mode': 'bloom', 'added': self.added, 'repeated': self.repeated, 'memory_bytes': self.memory_bytes(),
+                'false_positive_rate': self.false_positive_rate(), 'capacity': self.capacity,
+                'error_rate': self.error_rate, 'n_bits': self.n_bits, 'n_hashes': self.n_hashes}
+
+
+def make_body_set(mode='hash', capacity=BLOOM_CAPACITY, error_rate=BLOOM_ERROR_RATE, normalize=False):
+    """Return a BodyHashSet for mode 'hash', or a BodyBloomFilter for mode 'bloom'."""
+    if mode == 'hash':
+        return BodyHashSet(normalize)
+    if mode == 'bloom':
+        return BodyBloomFilter(capacity, error_rate, normalize)
+    raise ValueError(f'Unknown body dedup mode: {mode}')
@@ -7,13 +7,13 @@ Then, calculates p(gendered | context) and p(feminine | gendered) and saves to d
 
 import csv
 import pandas as pd
-from transformers import BertForMaskedLM, BertTokenizer
-import torch
 from part_2_barplots import create_groups
 from tqdm import tqdm
 import os
 import json
 import collections
+from functools import lru_cache
+from mention_store import load_kinship_terms
 
 
 TERMS_FILE = 'terms.csv'
@@ -27,15 +27,29 @@ OUTPUT_DIR_PROBABILITIES = f'{OUTPUT_DATA_DIR}/probabilities_specific_singular'
 OUTPUT_DIR_P_GENDERED_FEMININE = f'{OUTPUT_DATA_DIR}/p_gendered_feminine'
 
 
-# set up model
-tokenizer = BertTokenizer.from_pretrained('bert-base-uncased', do_lower_case=True)
-model = BertForMaskedLM.from_pretrained('bert-base-uncased')
-model.eval()
-device = "cuda" if torch.cuda.is_available() else "cpu"
-model = model.to(device)
+# The BERT model, and the device it runs on (None for "cuda" when it's available and "cpu" otherwise). The model is
+# only loaded (with torch and transformers) when it's first needed, so importing this file for its helpers is quick.
+MODEL_NAME = 'bert-base-uncased'
+DEVICE = None
 
 
-def get_masked_indices(tokenized_sentences_masked, mask: torch.tensor):
+@lru_cache(maxsize=None)
+def get_model(model_name: str = MODEL_NAME, device: str = DEVICE):
+    """Return the tokenizer, the masked language model (in eval mode, on device) and the device for model_name,
+    loading them the first time they're asked for.
+    """
+    import torch
+    from transformers import BertForMaskedLM, BertTokenizer
+
+    tokenizer = BertTokenizer.from_pretrained(model_name, do_lower_case=True)
+    model = BertForMaskedLM.from_pretrained(model_name)
+    model.eval()
+    if device is None:
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+    return tokenizer, model.to(device), device
+
+
+def get_masked_indices(tokenized_sentences_masked, mask: 'torch.tensor'):
     """Helper function for run_bert. Return a tensor sentence indices that contain mask, and a tensor of
     wordpiece indices that correspond to where mask was found.
     """
@@ -71,14 +85,18 @@ def get_plural_dict(terms_file: str):
 
 
 def load_df(file: str, full_groups: dict):
-    df = pd.read_csv(file)
+    df = load_kinship_terms(file, columns=['kinship_term', 'specific', 'singular', 'index', 'body', 'id'])
     df['group'] = df.apply(lambda row: get_kinship_term_group(row, full_groups), axis=1)
     df = df[df['specific'] == 'specific']
     df = df[df['singular'] == True]
     return df
 
 
-def construct_probability_dict(kinship_set, sentences_with_mask, masked_word_indices, logits):
+def construct_probability_dict(kinship_set, sentences_with_mask, masked_word_indices, logits, tokenizer=None):
+    import torch
+
+    if tokenizer is None:
+        tokenizer, _, _ = get_model()
     assert len(sentences_with_mask) == len(masked_word_indices)
     term_prob_lst = []
     for i in range(len(sentences_with_mask)):
@@ -93,10 +111,14 @@ def construct_probability_dict(kinship_set, sentences_with_mask, masked_word_ind
 
 
 def run_bert(subreddit, masked_sentences, sentence_ids, kinship_term_indices, batch_size, mask, kinship_group,
-             kinship_set, output_file, header, fieldnames):
+             kinship_set, output_file, header, fieldnames, model_name=MODEL_NAME, device=DEVICE):
     """Get probabilities of masked kinship terms for a particular subreddit/kinship_group combination, performed in
-    groups of batch_size. Write to csv file output_file for easy access later.
+    groups of batch_size. Write to csv file output_file for easy access later. Uses the model_name model on device
+    (see get_model).
     """
+    import torch
+
+    tokenizer, model, device = get_model(model_name, device)
     with torch.no_grad():
         for idx in tqdm(range(0, (len(masked_sentences) // batch_size) + 1), total=len(masked_sentences) // batch_size):
             # get batch
@@ -117,7 +139,7 @@ def run_bert(subreddit, masked_sentences, sentence_ids, kinship_term_indices, ba
 
                 # extract probability dictionary
                 term_prob_list = construct_probability_dict(kinship_set, sentences_with_mask, masked_word_indices,
-                                                            logits)
+                                                            logits, tokenizer)
 
                 # write to csv
                 header = write_to_csv(term_prob_list, kinship_indices_batch, id_batch, output_file, header, subreddit,
@@ -243,6 +265,8 @@ def calculate_p_feminine(row, feminine_terms, gendered_terms):
 
 
 if __name__ == "__main__":
+    import torch
+
     subreddits = [("AskReddit", "askscience"), ("Parenting", "entitledparents")]
     kinship_groups = {'parent', 'child', 'sibling', 'partner'}
     batch_size = 32
@@ -1,9 +1,17 @@
-import json
+import argparse
 import csv
-from extract_kinship_terms import valid_text, valid_author
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from extract_kinship_terms import check_comments, read_comments, read_manifest, peak_rss_mb, write_manifest
 import pandas as pd
 from nltk import word_tokenize as wtok
-from collections import Counter
+from fast_tokenizer import tokenize as fast_tokenize
+from body_dedup import make_body_set
+from collections import Counter, deque
 
 TERMS_FILE = 'terms.csv'
 
@@ -20,42 +28,269 @@ GENERIC_DETERMINERS = {'a', 'the', 'another', 'other', 'no', 'some', 'that', 'th
 
 subs = ['entitledparents', 'parenting', 'askscience', 'askreddit']
 
+# Where each subreddit's comments are read from, and where its frequencies are written, with a manifest of the total
+# number of words counted (which part_1_frequency_chi_squared.py reads) and what they were counted from.
+COMMENTS_FILE = '../scripts/reddit_tools/%s_comment.json'
+FREQUENCY_DIR = 'data/part_1_need_probabilities'
+MANIFEST_FILE = 'frequencies.manifest.json'
+
+# Counting stops once this many words of a subreddit have been counted.
+MAX_WORDS = int(1e7)
+
+# With more than one process, comments are tokenized and counted in that many processes, CHUNK_SIZE comments at a
+# time, and the counts are merged; the frequencies are the same as with one process.
+N_PROCESSES = 1
+CHUNK_SIZE = 2000
+
+# Tokenize with fast_tokenizer.py instead of nltk.word_tokenize. It is several times faster; benchmark_tokenizer.py
+# reports how much the tokens and frequencies differ.
+FAST_TOKENIZER = False
+
+# How bodies that start the same way as one already seen are found (see body_dedup.py): 'hash' keeps a 64-bit hash of
+# the start of every body, and 'bloom' a Bloom filter of BLOOM_CAPACITY bodies with a false positive rate of
+# BLOOM_ERROR_RATE, whose memory doesn't grow with the corpus.
+BODY_DEDUP = 'hash'
+BLOOM_CAPACITY = 10 ** 7
+BLOOM_ERROR_RATE = 1e-4
+
+
+class FrequencyCounter:
+    """Counts the words write_frequency needs: every unigram, and only the bigrams that start with the first word of
+    a multi-word term in terms_file. The total number of words is kept as they are counted.
+    """
+
+    def __init__(self, terms_file=TERMS_FILE, bigram_starts=None):
+        """bigram_starts, the first words of the multi-word terms, is used instead of reading terms_file when given."""
+        if bigram_starts is None:
+            with open(terms_file) as f:
+                bigram_starts = {l['term'].split()[0] for l in csv.DictReader(f) if ' ' in l['term']}
+        self.bigram_starts = bigram_starts
+        self.uni = Counter()
+        self.bi = Counter()
+        self.total = 0
+
+    def update(self, tokens):
+        self.uni.update(tokens)
+        self.total += len(tokens)
+        starts = self.bigram_starts
+        self.bi.update([(tokens[i], tokens[i + 1]) for i in range(len(tokens) - 1) if tokens[i] in starts])
+
+    def merge(self, other):
+        """Add the counts of other, a FrequencyCounter."""
+        self.uni.update(other.uni)
+        self.bi.update(other.bi)
+        self.total += other.total
+
+
+def count_frequencies(bodies, counter, tokenize=wtok, max_words=MAX_WORDS, sub='', n_processes=N_PROCESSES,
+                      seen=None):
+    """Tokenize and count the comment bodies with counter (a FrequencyCounter) until max_words words have been
+    counted, printing the progress every million words. With n_processes > 1, the bodies are counted in chunks in
+    that many processes (tokenize must be a function that can be pickled).
+
+    seen is the body set that bodies skips repeats with (see unique_valid_bodies), if any; the parallel count reads
+    ahead of the bodies it counts, and sets its stats back to the last body counted.
+    """
+    if n_processes > 1:
+        return count_frequencies_parallel(bodies, counter, tokenize, max_words, sub, n_processes, seen=seen)
+    prev_n_processed = 0  # track n words processed; not strictly necessary
+    for txt in bodies:
+        counter.update(tokenize(txt))
+
+        # for breaking at 1e7 words and printing every 1e6; not strictly necessary
+        n_words_processed = counter.total
+        if n_words_processed >= max_words:
+            break
+        if n_words_processed // int(1e6) > prev_n_processed // int(1e6):
+            print(sub, n_words_processed // int(1e6), 'million')
+        prev_n_processed = n_words_processed
+    return counter
+
+
+def count_chunk(bodies, bigram_starts, tokenize):
+    """Return a new FrequencyCounter with the counts of bodies, for count_frequencies_parallel."""
+    counter = FrequencyCounter(bigram_starts=bigram_starts)
+    for txt in bodies:
+        counter.update(tokenize(txt))
+    return counter
+
+
+def count_frequencies_parallel(bodies, counter, tokenize, max_words, sub, n_processes, chunk_size=CHUNK_SIZE,
+                               seen=None):
+    """count_frequencies with the chunks of bodies counted in n_processes processes. The chunks are merged in order,
+    and the chunk where max_words is reached is counted again up to the body that reached it, so the counts are the
+    same as count_frequencies with one process.
+
+    Up to 2 * n_processes chunks are read ahead, so the stats of seen (the body set bodies skips repeats with) are
+    kept after each body read, and set back to those of the body where counting stopped: they are the same as with
+    one process too.
+    """
+    pending = deque()  # (chunk, seen stats after each body, future), in the order of bodies
+    body_iterator = iter(bodies)
+    with ProcessPoolExecutor(max_workers=n_processes) as executor:
+        def submit():
+            chunk, chunk_stats = [], []
+            for txt in islice(body_iterator, chunk_size):
+                chunk.append(txt)
+                if seen is not None:
+                    chunk_stats.append((seen.added, seen.repeated))
+            if chunk:
+                pending.append((chunk, chunk_stats, executor.submit(count_chunk, chunk, counter.bigram_starts,
+                                                                    tokenize)))
 
-def write_frequency(uni, bi, sub):
+        for _ in range(2 * n_processes):  # keep every process busy, without reading far ahead
+            submit()
+        while pending:
+            chunk, chunk_stats, future = pending.popleft()
+            chunk_counter = future.result()
+            if counter.total + chunk_counter.total >= max_words:
+                for i, txt in enumerate(chunk):
+                    counter.update(tokenize(txt))
+                    if counter.total >= max_words:
+                        if seen is not None:
+                            seen.added, seen.repeated = chunk_stats[i]
+                        break
+                for _, _, future in pending:
+                    future.cancel()
+                break
+            prev_n_processed = counter.total
+            counter.merge(chunk_counter)
+            if counter.total // int(1e6) > prev_n_processed // int(1e6):
+                print(sub, counter.total // int(1e6), 'million')
+            submit()
+    return counter
+
+
+def term_frequencies(uni, bi, total=None, terms_file=TERMS_FILE):
+    """Return [term, frequency, frequency per million] for each term in terms_file. total is the number of words
+    counted in uni, if already known.
+    """
+    if total is None:
+        total = sum(uni.values())
     hits = []
-    for l in csv.DictReader(open(TERMS_FILE)):
+    for l in csv.DictReader(open(terms_file)):
         if l['term'].count(' ') == 0:
             f = uni[l['term']]
         else:
             f = bi[tuple(l['term'].split())]
-        hits.append([l['term'], f, 1e6 * f / sum(uni.values())])
+        hits.append([l['term'], f, 1e6 * f / total])
+    return hits
+
+
+def write_frequency(uni, bi, sub, total=None, terms_file=TERMS_FILE):
+    """Write the frequency of each term in terms_file to a csv file for sub."""
+    hits = term_frequencies(uni, bi, total, terms_file)
     df = pd.DataFrame(hits, columns=['term', 'frequency', 'frequency.per.million'])
     df.to_csv('%s_frequencies.csv' % sub)
 
 
+def unique_valid_bodies(comments, seen=None):
+    """Yield the bodies of the comments that aren't from bots or removed, skipping bodies that start the same way as
+    one already seen. seen is a body set from body_dedup.make_body_set (by default, one for BODY_DEDUP); its stats
+    say how many bodies were skipped.
+    """
+    if seen is None:
+        seen = make_body_set(BODY_DEDUP, BLOOM_CAPACITY, BLOOM_ERROR_RATE)  # to avoid repeats
+    for j, valid in check_comments(comments):
+        txt = j['body']
+        if valid and seen.add(txt):
+            yield txt
+
+
+def inputs_hash(comments_file, terms_file, max_words, tokenizer):
+    """Return a hash of what the frequencies of a subreddit are counted from: the comments file, the contents of
+    terms_file, max_words, tokenizer and how repeated bodies are found (BODY_DEDUP, BLOOM_CAPACITY and
+    BLOOM_ERROR_RATE).
+
+    The comments file can be too big to read just to hash it, so only its path, size and modification time are
+    hashed: a file rewritten with the same size and modification time looks unchanged (count it again with force).
+    """
+    stat = os.stat(comments_file)
+    with open(terms_file, 'rb') as f:
+        terms = hashlib.sha256(f.read()).hexdigest()
+    inputs = {'comments_file': os.path.abspath(comments_file), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+              'terms': terms, 'max_words': max_words, 'tokenizer': tokenizer, 'body_dedup': BODY_DEDUP,
+              'bloom_capacity': BLOOM_CAPACITY, 'bloom_error_rate': BLOOM_ERROR_RATE}
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def collect_frequencies(subreddits=subs, comments_file=COMMENTS_FILE, output_dir=FREQUENCY_DIR, max_words=MAX_WORDS,
+                        terms_file=TERMS_FILE, tokenizer='nltk', n_processes=N_PROCESSES, force=False):
+    """Count the words in the comments of each subreddit (read from comments_file % subreddit), and write the
+    frequency of each term to output_dir/<subreddit>_frequencies.csv. tokenizer is 'nltk' (nltk.word_tokenize) or
+    'fast' (fast_tokenizer.py).
+
+    What was counted is kept in output_dir/MANIFEST_FILE, one entry per subreddit: the total number of words, the
+    bodies counted and skipped as repeats, how long it took and a hash of the inputs (see inputs_hash). A subreddit
+    whose inputs haven't changed since its entry was written is skipped, unless force is True.
+
+    Returns the manifest.
+    """
+    if tokenizer not in ('nltk', 'fast'):
+        raise ValueError(f'Unknown tokenizer: {tokenizer}')
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_file = os.path.join(output_dir, MANIFEST_FILE)
+    manifest = read_manifest(manifest_file) or {'subreddits': {}}
+    for sub in subreddits:
+        file = comments_file % sub
+        frequencies_file = os.path.join(output_dir, '%s_frequencies.csv' % sub)
+        digest = inputs_hash(file, terms_file, max_words, tokenizer)
+        previous = manifest['subreddits'].get(sub)
+        if not force and previous is not None and previous['inputs_hash'] == digest and \
+                os.path.exists(frequencies_file):
+            print(sub, 'is unchanged, skipping')
+            continue
+
+        start_time = time.perf_counter()
+        counter = FrequencyCounter(terms_file)
+        seen = make_body_set(BODY_DEDUP, BLOOM_CAPACITY, BLOOM_ERROR_RATE)
+        bodies = unique_valid_bodies(read_comments(file), seen)
+        count_frequencies(bodies, counter, fast_tokenize if tokenizer == 'fast' else wtok, max_words, sub,
+                          n_processes, seen)
+        write_frequency(counter.uni, counter.bi, frequencies_file[:-len('_frequencies.csv')], counter.total,
+                        terms_file)
+        seconds = time.perf_counter() - start_time
+        dedup = seen.stats()
+        manifest['subreddits'][sub] = {
+            'comments_file': file, 'frequencies_file': frequencies_file, 'total_words': counter.total,
+            'max_words': max_words, 'tokenizer': tokenizer, 'unique_bodies': dedup['added'],
+            'repeated_bodies': dedup['repeated'], 'unigrams': len(counter.uni), 'bigrams': len(counter.bi),
+            'seconds': seconds, 'inputs_hash': digest}
+        write_manifest(manifest_file, manifest)
+        print(sub, counter.total, '(%.0f words/s, %d unigrams, %d bigrams, peak RSS %.0f MB)'
+              % (counter.total / seconds, len(counter.uni), len(counter.bi), peak_rss_mb()))
+        print('    %d repeated bodies skipped, %d unique, %.1f MB to remember them, false positive rate %.2g'
+              % (dedup['repeated'], dedup['added'], dedup['memory_bytes'] / 1e6, dedup['false_positive_rate']))
+    return manifest
+
+
+def read_total_words(output_dir=FREQUENCY_DIR):
+    """Return the total number of words counted for each subreddit in the manifest collect_frequencies wrote to
+    output_dir, or an empty dictionary if there isn't one.
+    """
+    manifest = read_manifest(os.path.join(output_dir, MANIFEST_FILE))
+    if manifest is None:
+        return {}
+    return {sub: entry['total_words'] for sub, entry in manifest['subreddits'].items()}
+
+
 if __name__ == "__main__":
-    for sub in subs:
-        seen_body = set()  # to avoid repeats
-        uni, bi = Counter(), Counter()  # track unigram and bigram frequencies
-        prev_n_processed = 0  # track n words processed; not strictly necessary
-        for l in open('../scripts/reddit_tools/%s_comment.json' % sub):
-            j = json.loads(l)
-            txt = j['body']
-            if valid_author(j['author']) and valid_text(j['body'], j['subreddit']) and txt[:100] not in seen_body:
-                seen_body.add(txt[:100])
-                txt_tok = wtok(txt)
-                uni.update(txt_tok)
-                bi.update([(txt_tok[i], txt_tok[i + 1]) for i in range(len(txt_tok) - 1)])
-
-            # for breaking at 1e7 words and printing every 1e6; not strictly necessary
-            n_words_processed = sum(uni.values())
-            if n_words_processed >= 1e7:
-                break
-            if n_words_processed // int(1e6) > prev_n_processed // int(1e6):
-                print(sub, n_words_processed // int(1e6), 'million')
-            prev_n_processed = n_words_processed
-        write_frequency(uni, bi, sub)
-        print(sub, sum(uni.values()))
+    parser = argparse.ArgumentParser(description='Write the frequency of each term in terms.csv per million words of '
+                                                 'each subreddit, and a manifest of the words counted.')
+    parser.add_argument('--subreddits', nargs='+', default=subs)
+    parser.add_argument('--comments-file', default=COMMENTS_FILE,
+                        help='the json file of comments of each subreddit, with %%s for the subreddit')
+    parser.add_argument('--output-dir', default=FREQUENCY_DIR)
+    parser.add_argument('--max-words', type=float, default=MAX_WORDS,
+                        help='stop counting a subreddit after this many words (e.g. 1e8)')
+    parser.add_argument('--terms-file', default=TERMS_FILE)
+    parser.add_argument('--tokenizer', choices=['nltk', 'fast'], default='fast' if FAST_TOKENIZER else 'nltk')
+    parser.add_argument('--processes', type=int, default=N_PROCESSES)
+    parser.add_argument('--force', action='store_true', help='count subreddits whose inputs are unchanged too')
+    args = parser.parse_args()
+
+    collect_frequencies(args.subreddits, args.comments_file, args.output_dir, int(args.max_words), args.terms_file,
+                        args.tokenizer, args.processes, args.force)
 
 # entitledparents 1 million
 # entitledparents 2 million
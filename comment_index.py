@@ -0,0 +1,125 @@
+"""A compact index of comment ids, used to drop comments that were already written by an earlier scrape, a resumed
+run or a dump import, and to skip repeated comments during extraction.
+
+Reddit comment ids are base-36 numbers (e.g. "i0bcl06"), so each id is stored as a 64-bit integer: in memory in a
+sorted array (binary search lookups) plus a small set of the ids added since the array was last rebuilt, and on
+disk as 8 bytes per id, appended as new ids are added. That's about 12 bytes per id in memory, rather than the 60-70 of
+a set of ints. The comments themselves are never held in memory.
+
+Ids that can't be stored this way (not base-36, or longer than 64 bits) are skipped with a message: they're never in
+the index, so those comments are always kept.
+"""
+
+import bisect
+import os
+import sys
+import threading
+from array import array
+
+import numpy as np
+
+# The number of new ids kept in memory before they are appended to the index file.
+FLUSH_EVERY = 10000
+
+# New ids are kept in a set until there are more than 1/MERGE_FRACTION as many as in the sorted array (and at least
+# MIN_MERGE), and then merged into it.
+MERGE_FRACTION = 16
+MIN_MERGE = 2 ** 16
+
+
+def decode_id(comment_id):
+    """Return the comment id (with or without its "t1_" prefix) as an integer."""
+    if not isinstance(comment_id, str):
+        raise ValueError(f'Comment id is not a string: {comment_id!r}')
+    if comment_id.startswith('t1_'):
+        comment_id = comment_id[3:]
+    value = int(comment_id, 36)
+    if value >= 2 ** 64:
+        raise ValueError(f'Comment id is too long: {comment_id}')
+    return value
+
+
+class CommentIdIndex:
+    """A set of comment ids. When filename is given, the ids in it are loaded, and new ids are appended to it (the
+    file is created if it doesn't exist yet). Safe to share between threads.
+    """
+
+    def __init__(self, filename=None):
+        self.filename = filename
+        self.sorted_ids = array('Q')
+        self.new_ids = set()
+        self.pending = array('Q')
+        self.lock = threading.Lock()
+        if filename is not None and os.path.exists(filename):
+            with open(filename, 'rb+') as f:
+                size = f.seek(0, os.SEEK_END)
+                end = size - size % 8
+                if end < size:
+                    f.truncate(end)  # the last id was only partly written
+            self.sorted_ids.frombytes(np.unique(np.fromfile(filename, dtype=np.uint64, count=end // 8)).tobytes())
+
+    def __len__(self):
+        return len(self.sorted_ids) + len(self.new_ids)
+
+    def __contains__(self, comment_id):
+        value = self._decode(comment_id)
+        return value is not None and self._contains(value)
+
+    def _contains(self, value):
+        if value in self.new_ids:
+            return True
+        i = bisect.bisect_left(self.sorted_ids, value)
+        return i < len(self.sorted_ids) and self.sorted_ids[i] == value
+
+    @staticmethod
+    def _decode(comment_id):
+        try:
+            return decode_id(comment_id)
+        except ValueError as e:
+            print(f'Skipping a comment id that can\'t be indexed: {e}', file=sys.stderr)
+            return None
+
+    def add(self, comment_id):
+        """Add comment_id, and return True if it wasn't in the index yet (or can't be indexed)."""
+        value = self._decode(comment_id)
+        if value is None:
+            return True
+        with self.lock:
+            if self._contains(value):
+                return False
+            self.new_ids.add(value)
+            if len(self.new_ids) >= max(MIN_MERGE, len(self.sorted_ids) // MERGE_FRACTION):
+                self._merge()
+            if self.filename is not None:
+                self.pending.append(value)
+                if len(self.pending) >= FLUSH_EVERY:
+                    self._flush()
+        return True
+
+    def _merge(self):
+        # the new ids aren't in the sorted ones yet, so they only need to be put in their places
+        sorted_ids = np.frombuffer(self.sorted_ids, dtype=np.uint64)
+        new_ids = np.sort(np.fromiter(self.new_ids, dtype=np.uint64, count=len(self.new_ids)))
+        merged = np.insert(sorted_ids, np.searchsorted(sorted_ids, new_ids), new_ids)
+        self.sorted_ids = array('Q')
+        self.sorted_ids.frombytes(merged.tobytes())
+        self.new_ids = set()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        if self.filename is not None and self.pending:
+            with open(self.filename, 'ab') as f:
+                self.pending.tofile(f)
+            self.pending = array('Q')
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
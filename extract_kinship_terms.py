@@ -6,15 +6,62 @@ NOTE: extracts for specific/mixed/generic (instead of specific/other). Other scr
 """
 
 import regex
+import hashlib
+import io
 import json
 import csv
 import re
 import os
+import shutil
+import sys
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from body_dedup import body_hash, make_body_set
+from comment_index import CommentIdIndex
+from jsonl_io import is_compressed, last_line_end, open_jsonl
+from kinship_trie import WHITESPACE, KinshipTrie, fold_table, parse_query, query_alphabet
+from mention_store import CSV_COLUMNS, MentionStoreWriter, store_directories
 
 TERMS_FILE = 'terms.csv'
 
 OUTPUT_DIR = 'data/'
 
+# When True, a comment that appears more than once in a json file (e.g. from overlapping scrapes or dump imports)
+# is only extracted the first time.
+DEDUPE_IDS = True
+
+# When 'hash' or 'bloom', a comment whose body starts the same way as one already extracted from the json file is
+# skipped, like collect_data.py does (see body_dedup.py). None keeps every comment.
+DEDUPE_BODIES = None
+
+# The number of processes write_csv_from_json extracts with. With more than 1, the json file is split into
+# CHUNKS_PER_PROCESS * N_PROCESSES chunks of lines that are extracted in parallel (compressed files are always
+# extracted in one process, since they can't be split without reading them).
+N_PROCESSES = 1
+CHUNKS_PER_PROCESS = 4
+
+# When True, write_csv_from_json only extracts the comments added to a json file since it last ran, and appends them
+# to the csv file. Where it got to is kept in a manifest next to the csv file (e.g. data/kinship_terms_csv/
+# Parenting.comment.kinship_terms.manifest.json), along with a hash of the terms; if the terms change, the csv file is
+# rebuilt.
+INCREMENTAL = False
+
+# When True, comments that don't contain any term (checked with a quick substring search) skip the full matcher.
+PREFILTER = True
+
+# How KinshipMatcher finds terms: 'regex' runs the query from get_terms as a regex, and 'trie' finds the same matches
+# with a trie of the terms (see kinship_trie.py).
+MATCHER_ENGINE = 'regex'
+
+# 'csv' writes one csv file per json file, with a row per kinship term (repeating the comment); 'parquet' writes a
+# comments table and a mentions table instead (see mention_store.py). The analysis scripts read either.
+OUTPUT_FORMAT = 'csv'
+
+CSV_FIELDNAMES = CSV_COLUMNS
+
 PARENTING_COMMENT_FILTER = 'Your content may have been automatically removed through auto-moderation or ' \
                            'manually removed by a human moderator.'
 ASKSCIENCE_COMMENT_FILTER = 'Thank you for your submission! ' \
@@ -25,69 +72,445 @@ MIXED_DETERMINERS = {'your', 'his', 'her', 'their', 'our', 'ur'}
 GENERIC_DETERMINERS = {'a', 'the', 'another', 'other', 'no', 'some', 'that', 'these', 'this', 'those'}
 
 
+# Comments are checked with valid_comments this many at a time as they are read.
+FILTER_BATCH_SIZE = 1024
+# The number of authors whose valid_author verdicts are remembered; most comments are by authors seen recently.
+AUTHOR_CACHE_SIZE = 2 ** 16
+
+BOT_AUTHOR_PATTERN = re.compile(r"[Bb][Oo][Tt]$")
+REMOVED_BODIES = {None, '', '[removed]', '[deleted]'}
+
+
 def none_or_empty(text):
     return text is None or len(text) == 0 or text == "[removed]" or text == '[deleted]'
 
 
-def valid_text(text, subreddit):
-    # Right now this checks if the comment is none or empty, but in the future
-    # we might want to include other checks.
-    if none_or_empty(text):
-        return False
-    if PARENTING_COMMENT_FILTER in text and subreddit.lower() == 'parenting':
+@lru_cache(maxsize=None)
+def moderation_phrases(subreddit):
+    """Return the phrases that mark moderation comments in subreddit."""
+    if subreddit.lower() == 'parenting':
         # The phrase PARENTING_COMMENT_FILTER is common in r/Parenting moderation posts,
         # which often include kinship terms.
-        return False
-    if (ASKSCIENCE_COMMENT_FILTER in text or 'sister sub' in text) and subreddit.lower() == 'askscience':
+        return PARENTING_COMMENT_FILTER,
+    if subreddit.lower() == 'askscience':
         # the phrase "sister sub" is often used in r/AskScience, referring to an associated subreddit,
         # but it has been used a couple times in other contexts (ex. 'sister subspecies'). The moderation comments
         # seem to far outweigh the non-moderation comments, though.
+        return ASKSCIENCE_COMMENT_FILTER, 'sister sub'
+    return ()
+
+
+def valid_text(text, subreddit):
+    # Right now this checks if the comment is none or empty, or a moderation comment, but in the future
+    # we might want to include other checks.
+    if none_or_empty(text):
         return False
-    return True
+    return not any(phrase in text for phrase in moderation_phrases(subreddit))
 
 
+@lru_cache(maxsize=AUTHOR_CACHE_SIZE)
 def valid_author(author):
     # This helps us exclude comments from bots and users that deleted
     # their accounts.
     if author == "[deleted]":
         return False
-    if len(re.findall(r"[Bb][Oo][Tt]$", author)) > 0:
+    if BOT_AUTHOR_PATTERN.search(author):
         return False
-    if len(re.findall(r"automoderato", author.lower())) > 0:
+    if "automoderato" in author.lower():
         return False
     return True
 
 
-def write_csv_from_json(file: str, query: str):
+def valid_comments(authors, bodies, subreddits):
+    """Return a boolean array with whether each comment passes valid_author and valid_text, given lists of the
+    comments' authors, bodies and subreddits. Each author and subreddit is only checked once, and only the bodies of
+    comments from subreddits with moderation phrases are searched for them.
+    """
+    n = len(bodies)
+    authors_valid = {author: valid_author(author) for author in set(authors)}
+    mask = np.fromiter(map(authors_valid.__getitem__, authors), dtype=bool, count=n)
+    mask &= np.fromiter((body not in REMOVED_BODIES for body in bodies), dtype=bool, count=n)
+    phrases = {subreddit: moderation_phrases(subreddit) for subreddit in set(subreddits)}
+    for i in np.flatnonzero(mask):
+        if any(phrase in bodies[i] for phrase in phrases[subreddits[i]]):
+            mask[i] = False
+    return mask
+
+
+def check_comments(comments, batch_size=FILTER_BATCH_SIZE):
+    """Yield (comment, whether it passes valid_author and valid_text) for the comment dictionaries in comments,
+    checking batch_size comments at a time with valid_comments.
+    """
+    comments = iter(comments)
+    batch = list(islice(comments, batch_size))
+    while batch:
+        yield from zip(batch, valid_comments([c['author'] for c in batch], [c['body'] for c in batch],
+                                             [c['subreddit'] for c in batch]))
+        batch = list(islice(comments, batch_size))
+
+
+class ExtractionStats:
+    """Counts of what write_csv_from_json read and wrote, how long it took, and the peak memory use."""
+
+    def __init__(self):
+        self.comments = 0
+        self.rows = 0
+        self.bytes = 0  # bytes of the (decompressed) json file read
+        self.prefiltered = 0  # comments checked by the prefilter
+        self.candidates = 0  # comments the prefilter passed on to the matcher
+        self.body_dedup = None  # the stats of the body set, when comments with repeated bodies are skipped
+        self.seconds = 0.0
+        self.peak_rss_mb = 0.0
+
+    @property
+    def prefilter_hit_rate(self):
+        return self.candidates / self.prefiltered if self.prefiltered else float('nan')
+
+    def __str__(self):
+        rate = self.comments / self.seconds if self.seconds else 0.0
+        text = f'{self.comments} comments ({rate:.0f}/s), {self.rows} rows, {self.seconds:.1f}s, ' \
+               f'peak RSS {self.peak_rss_mb:.0f} MB'
+        if self.prefiltered:
+            text += f', prefilter passed {self.candidates}/{self.prefiltered} ({self.prefilter_hit_rate:.1%})'
+        if self.body_dedup is not None:
+            text += f", {self.body_dedup['repeated']} repeated bodies skipped " \
+                    f"({self.body_dedup['memory_bytes'] / 1e6:.1f} MB to remember them)"
+        return text
+
+
+def peak_rss_mb():
+    """Return the peak resident memory of this process or any of its finished child processes in MB, or nan where
+    the resource module isn't available (Windows).
+    """
+    try:
+        import resource
+    except ImportError:
+        return float('nan')
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10  # bytes on macOS, KB elsewhere
+
+
+def read_comments(file, stats=None, start=0, complete_lines_only=False):
+    """Yield the comments in the json file one at a time, so the file is never held in memory. Counts them, and the
+    bytes read, in stats (an ExtractionStats) when given.
+
+    start is the byte offset in the (decompressed) file to start reading from. When complete_lines_only is True, a
+    last line without a newline (which may still be being written) is left unread.
+    """
+    with open_jsonl(file, 'rb') as f:
+        if is_compressed(file):
+            skip(f, start)
+        else:
+            f.seek(start)
+        for line in f:
+            if complete_lines_only and not line.endswith(b'\n'):
+                break
+            if stats is not None:
+                stats.comments += 1
+                stats.bytes += len(line)
+            yield json.loads(line)
+
+
+def skip(f, n_bytes):
+    """Read and drop n_bytes bytes from f, for files that can't seek."""
+    while n_bytes > 0:
+        data = f.read(min(n_bytes, 2 ** 20))
+        if not data:
+            break
+        n_bytes -= len(data)
+
+
+def drop_repeated_ids(comments, id_index):
+    """Yield the comments with an id that isn't in id_index yet, adding the ids as they go by."""
+    for data in comments:
+        if 'id' in data and not id_index.add(data['id']):
+            continue
+        yield data
+
+
+def write_csv_from_json(file: str, query, dedupe_ids: bool = DEDUPE_IDS, n_processes: int = N_PROCESSES,
+                        prefilter: bool = PREFILTER, incremental: bool = INCREMENTAL,
+                        output_format: str = OUTPUT_FORMAT, dedupe_bodies=DEDUPE_BODIES):
     """After filtering out bot comments and deleted author comments, write Reddit comments containing
     kinship terms listed in TERMS_FILE in a csv file containing other information such as whether it is considered
-     'specific' or whether it is singular.
+     'specific' or whether it is singular. file can be gzip (.json.gz) or zstd (.json.zst) compressed.
+
+    query is a KinshipMatcher, or a regex query string from get_terms.
+
+    When dedupe_ids is True, comments with an id that was already seen in file are skipped.
+
+    When dedupe_bodies is 'hash' or 'bloom', valid comments whose body starts the same way as an earlier one in file
+    are skipped, with a body set of that mode from body_dedup.py. This can't be combined with incremental, since the
+    body set isn't kept between runs.
+
+    With n_processes > 1, chunks of an uncompressed file are extracted in parallel; the csv file is the same as with
+    one process. Otherwise comments are read, extracted and written one at a time.
+
+    When prefilter is True, comments without any term are found with a quick substring search and skipped.
+
+    When incremental is True, only the comments after the byte offset in the manifest from the last incremental run
+    are extracted, and their rows are appended to the csv file. The csv file is rebuilt if there is no manifest, or
+    if the terms, dedupe_ids, output_format or file are different from the last run.
+
+    With output_format 'parquet', the rows are written to a comments table and a mentions table next to where the csv
+    file would be, instead of the csv file.
+
+    Returns an ExtractionStats.
     """
+    if output_format not in ('csv', 'parquet'):
+        raise ValueError(f'Unknown output format: {output_format}')
+    if dedupe_bodies is not None and incremental:
+        raise ValueError('dedupe_bodies can only be used without incremental')
+    start_time = time.perf_counter()
+    stats = ExtractionStats()
+    matcher = query if isinstance(query, KinshipMatcher) else get_matcher(query)
     output = file[:file.index('.json')] + '.csv'
     if '/kinship_term_json' in output:   # not a test file
         output = output.replace('kinship_term_json', 'kinship_terms_csv')
+    base = output[:-len('.csv')]
+    manifest_file = base + '.manifest.json'
+    id_index_file = base + '.comment_ids'
+
+    start = 0
+    manifest = {'input': file, 'terms_hash': terms_hash(matcher.query), 'dedupe_ids': dedupe_ids,
+                'output_format': output_format}
+    previous = read_manifest(manifest_file) if incremental else None
+    if previous is None or not can_continue(previous, manifest, output, id_index_file):
+        previous = None
+        for old_file in [manifest_file, id_index_file]:
+            if os.path.exists(old_file):
+                os.remove(old_file)
+    else:
+        if dedupe_ids:
+            # drop any ids added after the manifest (by a run that was interrupted)
+            with open(id_index_file, 'rb+') as f:
+                f.truncate(previous['id_index_size'])
+        start = previous['offset']
+    if output_format == 'csv':
+        writer = CsvOutput(output, previous)
+    else:
+        writer = ParquetOutput(base, previous)
+
+    if dedupe_ids:
+        id_index = CommentIdIndex(id_index_file if incremental else None)
+    else:
+        id_index = None
+    seen = None if dedupe_bodies is None else make_body_set(dedupe_bodies)
+    if n_processes > 1 and not is_compressed(file):
+        end = last_line_end(file) if incremental else os.path.getsize(file)
+        chunks = find_chunks(file, n_processes * CHUNKS_PER_PROCESS, start, end)
+        with ProcessPoolExecutor(max_workers=n_processes) as executor:
+            results = executor.map(extract_chunk, [file] * len(chunks), [chunk_start for chunk_start, _ in chunks],
+                                   [chunk_end for _, chunk_end in chunks], [matcher.query] * len(chunks),
+                                   [matcher.engine] * len(chunks), [prefilter] * len(chunks),
+                                   [output_format == 'csv'] * len(chunks), [seen is not None] * len(chunks))
+            for chunk in results:
+                # chunks come back in the order of the file, so ids and bodies are deduplicated just like in one
+                # process
+                for comment_id, rows, n_rows, prefiltered, candidates, hashed_body in chunk:
+                    stats.comments += 1
+                    if id_index is not None and comment_id is not None and not id_index.add(comment_id):
+                        continue
+                    if hashed_body is not None and not seen.add_hash(hashed_body):
+                        continue
+                    writer.write_extracted(rows)
+                    stats.rows += n_rows
+                    stats.prefiltered += prefiltered
+                    stats.candidates += candidates
+        stats.bytes = end - start
+    else:
+        comments = read_comments(file, stats, start, complete_lines_only=incremental)
+        if id_index is not None:
+            comments = drop_repeated_ids(comments, id_index)
+        for data, valid in check_comments(comments):
+            if valid and seen is not None and not seen.add(data['body']):
+                continue
+            rows = comment_rows(data, matcher, prefilter, stats, valid)
+            writer.write_comment(rows)
+            stats.rows += len(rows)
+
+    writer.close()
+    if id_index is not None:
+        id_index.close()
+    if seen is not None:
+        stats.body_dedup = seen.stats()
+    if incremental:
+        manifest.update({'offset': start + stats.bytes, 'input_size': os.path.getsize(file),
+                         'id_index_size': os.path.getsize(id_index_file) if dedupe_ids else 0})
+        manifest.update(writer.state())
+        write_manifest(manifest_file, manifest)
+    stats.seconds = time.perf_counter() - start_time
+    stats.peak_rss_mb = peak_rss_mb()
+    return stats
+
+
+class CsvOutput:
+    """Where write_csv_from_json writes rows for output_format 'csv'. With previous (the manifest of the last
+    incremental run), rows are appended to the csv file; otherwise it is rewritten.
+    """
+
+    def __init__(self, output, previous=None):
+        self.output = output
+        if previous is None:
+            for directory in store_directories(output[:-len('.csv')]):
+                if os.path.exists(directory):  # so the analysis scripts don't read an old store instead
+                    shutil.rmtree(directory)
+            self.data_file = open(output, 'w', encoding="utf-8", newline='')
+            self.csv_writer = csv.DictWriter(self.data_file, fieldnames=CSV_FIELDNAMES)
+            self.csv_writer.writeheader()
+        else:
+            # drop anything written after the manifest (by a run that was interrupted)
+            with open(output, 'rb+') as f:
+                f.truncate(previous['csv_size'])
+            self.data_file = open(output, 'a', encoding="utf-8", newline='')
+            self.csv_writer = csv.DictWriter(self.data_file, fieldnames=CSV_FIELDNAMES)
+
+    def write_comment(self, rows):
+        self.csv_writer.writerows(rows)
+
+    def write_extracted(self, rows):
+        """Write rows from extract_chunk, already formatted as csv."""
+        self.data_file.write(rows)
+
+    def close(self):
+        self.data_file.close()
+
+    def state(self):
+        return {'csv_size': os.path.getsize(self.output)}
+
+    @staticmethod
+    def can_continue(previous, output):
+        return os.path.exists(output) and os.path.getsize(output) >= previous.get('csv_size', float('inf'))
+
 
-    data_file = open(output, 'w', encoding="utf-8", newline='')
-    csv_writer = csv.DictWriter(data_file, fieldnames=['kinship_term', 'specific', 'singular', 'index', 'author',
-                                                       'body', 'created_utc', 'id', 'subreddit', 'determiner'])
-    csv_writer.writeheader()
+class ParquetOutput(MentionStoreWriter):
+    """Where write_csv_from_json writes rows for output_format 'parquet'."""
 
-    with open(file, encoding="utf-8") as f:
-        for line in f.readlines():
-            data = json.loads(line)
+    def __init__(self, base, previous=None):
+        super().__init__(base, None if previous is None else previous['parts'])
 
-            # Check to make sure the text hasn't been removed, and that
-            # the comment author isn't a bot (or doesn't post only moderation posts).
-            is_valid_body = valid_text(data['body'], data['subreddit'])
-            is_valid_author = valid_author(data['author'])
-            if is_valid_body and is_valid_author:
-                additional_info = extract_from_comment(data['body'], query)
-                for info in additional_info:
-                    info.pop('text')
-                    info.update(data)
-                    csv_writer.writerow(info)
+    def write_extracted(self, rows):
+        self.write_comment(rows)
 
-    data_file.close()
+    def state(self):
+        return {'parts': self.n_parts()}
+
+    @staticmethod
+    def can_continue(previous, output):
+        base = output[:-len('.csv')]
+        return all(os.path.isdir(directory) for directory in store_directories(base)) and 'parts' in previous
+
+
+def terms_hash(query):
+    """Return a hash of the query from get_terms, which changes whenever the terms in TERMS_FILE do."""
+    return hashlib.sha256(query.encode('utf-8')).hexdigest()
+
+
+def read_manifest(manifest_file):
+    """Return the manifest written by the last incremental write_csv_from_json, or None if there isn't one."""
+    if not os.path.exists(manifest_file):
+        return None
+    with open(manifest_file) as f:
+        try:
+            return json.load(f)
+        except ValueError:
+            return None
+
+
+def write_manifest(manifest_file, manifest):
+    tmp_file = manifest_file + '.tmp'
+    with open(tmp_file, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_file, manifest_file)  # so an interrupted run never leaves half a manifest
+
+
+def can_continue(previous, manifest, output, id_index_file):
+    """Return True if an incremental run can append to the csv file from the last run, described by previous."""
+    if any(previous.get(key) != value for key, value in manifest.items()):
+        return False  # a different input file, different terms or a different dedupe_ids
+    if not os.path.exists(manifest['input']) or os.path.getsize(manifest['input']) < previous['input_size']:
+        return False  # the json file was replaced
+    output_class = CsvOutput if manifest['output_format'] == 'csv' else ParquetOutput
+    if not output_class.can_continue(previous, output):
+        return False
+    if manifest['dedupe_ids'] and (not os.path.exists(id_index_file) or
+                                   os.path.getsize(id_index_file) < previous['id_index_size']):
+        return False
+    return True
+
+
+def comment_rows(data, matcher, prefilter=PREFILTER, stats=None, valid=None):
+    """Return the csv rows for the kinship terms in the comment data, or no rows if the comment is filtered out.
+    Counts the comments checked and passed by the prefilter in stats (an ExtractionStats) when given. valid is
+    whether the comment passes valid_text and valid_author, if already known (from check_comments).
+    """
+    if valid is None:
+        # Check to make sure the text hasn't been removed, and that
+        # the comment author isn't a bot (or doesn't post only moderation posts).
+        valid = valid_text(data['body'], data['subreddit']) and valid_author(data['author'])
+    rows = []
+    if valid:
+        if prefilter:
+            if stats is not None:
+                stats.prefiltered += 1
+            if not matcher.might_contain_terms(data['body']):
+                return rows
+            if stats is not None:
+                stats.candidates += 1
+        for info in matcher.extract(data['body']):
+            info.pop('text')
+            info.update(data)
+            rows.append(info)
+    return rows
+
+
+def find_chunks(file, n_chunks, start=0, end=None):
+    """Split bytes start to end (by default, the whole file) of file into at most n_chunks (start, end) byte ranges
+    of whole lines. start and end must be at the start of a line.
+    """
+    if end is None:
+        end = os.path.getsize(file)
+    boundaries = [start]
+    with open(file, 'rb') as f:
+        for i in range(1, n_chunks):
+            f.seek(max(start + (end - start) * i // n_chunks, boundaries[-1]))
+            f.readline()  # move to the start of the next line
+            boundaries.append(min(f.tell(), end))
+    boundaries.append(end)
+    return [(chunk_start, chunk_end) for chunk_start, chunk_end in zip(boundaries, boundaries[1:])
+            if chunk_start < chunk_end]
+
+
+def extract_chunk(file, start, end, query, engine=MATCHER_ENGINE, prefilter=PREFILTER, format_csv=True,
+                  hash_bodies=False):
+    """Extract the comments in bytes start to end of file, for write_csv_from_json. Returns an (id, rows, number of
+    rows, checked by the prefilter, passed by the prefilter, body hash) tuple for every comment, in order; the id is
+    None for comments without one. The rows are formatted as csv when format_csv is True, and a list of dictionaries
+    otherwise. The body hash is body_dedup.body_hash of the body for valid comments when hash_bodies is True, and None
+    otherwise.
+    """
+    matcher = get_matcher(query, engine)
+    with open(file, 'rb') as f:
+        f.seek(start)
+        text = f.read(end - start).decode('utf-8')
+
+    buffer = io.StringIO(newline='')
+    csv_writer = csv.DictWriter(buffer, fieldnames=CSV_FIELDNAMES)
+    results = []
+    lines = io.StringIO(text, newline=None)  # split lines the same way open_jsonl does
+    for data, valid in check_comments(json.loads(line) for line in lines):
+        stats = ExtractionStats()
+        rows = comment_rows(data, matcher, prefilter, stats, valid)
+        n_rows = len(rows)
+        hashed_body = body_hash(data['body']) if hash_bodies and valid else None
+        if format_csv:
+            csv_writer.writerows(rows)
+            rows = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        results.append((data.get('id'), rows, n_rows, stats.prefiltered, stats.candidates, hashed_body))
+    return results
 
 
 def get_terms(file):
@@ -134,34 +557,95 @@ def get_terms(file):
     return '|'.join(terms)
 
 
-def extract_from_comment(sentence, query):
-    """Creates a list of dictionaries for the desired kinship terms found in sentence. Terms should be a regex
-    query string.
+class KinshipMatcher:
+    """Finds the kinship terms in comments. The term pattern (or trie, with engine='trie') is built once, when the
+    matcher is created, and the determiner patterns once, when this module is imported, so extracting from a comment
+    doesn't build or look up any patterns.
     """
-    results = []
-    matches = regex.finditer(query, sentence, regex.IGNORECASE)
-    for search_result in matches:
-        # take plural because largest substring that matters
-        term_found = search_result.group("kinship_pl")
-        if term_found is None:
-            # wife, wives, s/o won't have a plural substring because either plural is not a superset of the singular,
-            # or plural form was not included in TERMS_FILE
-            term_found = search_result.group("kinship_term")
-            first, _ = search_result.span("kinship_term")
-        else:
-            first, _ = search_result.span("kinship_pl")
-        term_found = term_found.lower()
 
-        if term_found == 'wives':  # s/o and wife are singular anyway
-            singular = 'wife'
+    def __init__(self, terms_file: str = TERMS_FILE, query: str = None, engine: str = MATCHER_ENGINE):
+        """query, a regex query string from get_terms, is used instead of reading terms_file when given."""
+        self.query = get_terms(terms_file) if query is None else query
+        self.engine = engine
+        if engine == 'regex':
+            self.term_pattern = regex.compile(self.query, regex.IGNORECASE)
+        elif engine == 'trie':
+            self.trie = KinshipTrie(self.query)
         else:
-            singular = search_result.group("kinship_term").lower()
+            raise ValueError(f'Unknown matcher engine: {engine}')
+        self.stems, self.unsafe_characters = get_prefilter(self.query)
+
+    def might_contain_terms(self, comment: str):
+        """Return False if comment certainly has no kinship terms, without running the matcher: every term contains
+        one of self.stems. Comments with characters that str.lower() doesn't map to the letter they match (e.g.
+        "ſ", which matches "s") are always passed on.
+        """
+        if not comment.isascii() and any(character in comment for character in self.unsafe_characters):
+            return True
+        text = comment.lower()
+        return any(stem in text for stem in self.stems)
+
+    def find_terms(self, comment: str):
+        """Yield (start, end of the plural, end of the singular) for every kinship term found in comment."""
+        if self.engine == 'trie':
+            yield from self.trie.find(comment)
+            return
+        for search_result in self.term_pattern.finditer(comment):
+            if search_result.group("kinship_pl") is None:
+                # wife, wives, s/o won't have a plural substring because either plural is not a superset of the
+                # singular, or plural form was not included in TERMS_FILE
+                first, last = search_result.span("kinship_term")
+                yield first, last, last
+            else:
+                # take plural because largest substring that matters
+                first, last = search_result.span("kinship_pl")
+                yield first, last, search_result.end("kinship_term")
+
+    def extract(self, comment: str):
+        """Creates a list of dictionaries for the desired kinship terms found in comment."""
+        results = []
+        for first, plural_end, singular_end in self.find_terms(comment):
+            term_found = comment[first:plural_end].lower()
+
+            if term_found == 'wives':  # s/o and wife are singular anyway
+                singular = 'wife'
+            else:
+                singular = comment[first:singular_end].lower()
+
+            singularity = determine_singularity(term_found, singular)
+            specific, determiner = determine_determiner(first, comment)
+            results.append({'text': comment, 'kinship_term': singular,
+                            'singular': singularity, 'specific': specific, 'index': first, 'determiner': determiner})
+        return results
+
+
+def get_prefilter(query: str):
+    """Return the lowercase stems for KinshipMatcher.might_contain_terms (the terms in query that don't contain a
+    shorter term), and the characters the regex matches with a letter of a term that str.lower() doesn't map to it.
+    """
+    alternatives = parse_query(query)
+    stems = []
+    for term in sorted({term for term, _ in alternatives}, key=len):
+        if not any(stem in term for stem in stems):
+            stems.append(term)
 
-        singularity = determine_singularity(term_found, singular)
-        specific, determiner = determine_determiner(first, sentence)
-        results.append({'text': sentence, 'kinship_term': singular,
-                        'singular': singularity, 'specific': specific, 'index': first, 'determiner': determiner})
-    return results
+    table = fold_table(query_alphabet(alternatives))
+    unsafe_characters = ''.join(sorted(chr(character) for character, letter in table.items()
+                                       if letter not in (WHITESPACE, '\x01') and chr(character).lower() != letter))
+    return stems, unsafe_characters
+
+
+@lru_cache(maxsize=None)
+def get_matcher(query: str, engine: str = MATCHER_ENGINE):
+    """Return a KinshipMatcher for query, creating it the first time query is seen."""
+    return KinshipMatcher(query=query, engine=engine)
+
+
+def extract_from_comment(sentence, query):
+    """Creates a list of dictionaries for the desired kinship terms found in sentence. Terms should be a regex
+    query string.
+    """
+    return get_matcher(query).extract(sentence)
 
 
 def determine_singularity(term_found: str, singular: str):
@@ -174,6 +658,32 @@ def determine_singularity(term_found: str, singular: str):
     return True
 
 
+def construct_determiner_patterns():
+    """Build one pattern matching any determiner (followed by a single whitespace character) that ends the text it
+    is searched in, with one named group per determiner, plus a pattern per determiner for determine_determiner's
+    repeated-determiner check. Groups are listed in order of precedence: specific, then mixed, then generic.
+    """
+    groups = []
+    for category, determiners in [('specific', SPECIFIC_DETERMINERS), ('mixed', MIXED_DETERMINERS),
+                                  ('generic', GENERIC_DETERMINERS)]:
+        for determiner in sorted(determiners):
+            if determiner == '\'s':
+                alternative = regex.escape(determiner)
+            else:  # whiteline (ex. ' ' or '\n') or the start of the comment must precede the determiner
+                alternative = r'(?:^|(?<=\s))' + regex.escape(determiner)
+            groups.append((category, determiner, alternative))
+
+    pattern = regex.compile('(?:' + '|'.join(f'(?P<det{i}>{alternative})' for i, (_, _, alternative)
+                                             in enumerate(groups)) + r')\s\Z', regex.IGNORECASE)
+    repeat_patterns = [regex.compile(alternative + r'\s\Z', regex.IGNORECASE) for _, _, alternative in groups]
+    return pattern, [(category, determiner) for category, determiner, _ in groups], repeat_patterns
+
+
+DETERMINER_PATTERN, DETERMINER_GROUPS, REPEATED_DETERMINER_PATTERNS = construct_determiner_patterns()
+# The longest determiner plus the whitespace after it; only this much text before a term is searched.
+DETERMINER_WINDOW = max(len(determiner) for _, determiner in DETERMINER_GROUPS) + 1
+
+
 def determine_determiner(first: int, sentence: str):
     """Using determiners, identify whether this is a specific, mixed, or generic usage of
     the kinship term in question.
@@ -186,40 +696,37 @@ def determine_determiner(first: int, sentence: str):
         - word at start of string (no det)
         - det incl. in prev. word (no det)
         - term word incl. inside other word (misspelled maybe?, ex. the cat flew over thebrother)
-    """
-    for determiner in SPECIFIC_DETERMINERS:  # my or 's
-        if determiner == '\'s':
-            query_str = f'(?P<det>{determiner})\s'
-        else:  # determiner == 'my'
-            query_str = f'(^|\s)(?P<det>{determiner})\s'
-
-        for match in regex.finditer(query_str, sentence, regex.IGNORECASE):
-            # whiteline (ex. ' ' or '\n') may precede determiner, and a space must succeed it
-            start, end = match.span()
-            if end == first:  # if determiner + ' ' takes place immediately before term in question
-                return 'specific', sentence[start:end].strip()
-
-    for determiner in MIXED_DETERMINERS:
-        for match in regex.finditer(f'(^|\s)(?P<det>{determiner})\s', sentence, regex.IGNORECASE):
-            # whiteline (ex. ' ' or '\n') may precede determiner, and a space must succeed it
-            start, end = match.span()
-            if end == first:  # if determiner + ' ' takes place immediately before term in question
-                return 'mixed', sentence[start:end].strip()
 
-    for determiner in GENERIC_DETERMINERS:  # additional for-loop to save generic determiners
-        for match in regex.finditer(f'(^|\s)(?P<det>{determiner})\s', sentence, regex.IGNORECASE):
-            # whiteline (ex. ' ' or '\n') may precede determiner, and a space must succeed it
-            start, end = match.span()
-            if end == first:  # if determiner + ' ' takes place immediately before term in question
-                return 'generic', sentence[start:end].strip()
-
-    return 'generic', ''  # when no determiner preceding word
+    Only the text just before first is searched, so the cost doesn't grow with the length of the comment.
+    """
+    match = DETERMINER_PATTERN.search(sentence, max(0, first - DETERMINER_WINDOW), first)
+    if match is None:
+        return 'generic', ''  # when no determiner preceding word
+    i = int(match.lastgroup[len('det'):])
+    category, determiner = DETERMINER_GROUPS[i]
+
+    if determiner != '\'s':
+        # Determiners used to be found by scanning the whole comment for non-overlapping matches of
+        # "(^|\s)determiner\s", so in a run like "the the the dad" every other "the" shared its leading whitespace
+        # with the previous match and was never found. Keep those results by counting the repeats before this one.
+        repeats = 0
+        start = match.start()
+        while start > 0:
+            previous = REPEATED_DETERMINER_PATTERNS[i].search(sentence, max(0, start - DETERMINER_WINDOW), start)
+            if previous is None:
+                break
+            repeats += 1
+            start = previous.start()
+        if repeats % 2 == 1:
+            return 'generic', ''
+
+    return category, sentence[match.start():first].strip()
 
 
 if __name__ == "__main__":
     subreddits = ["AskReddit", "askscience", "Parenting", "entitledparents"]
 
-    terms = get_terms(TERMS_FILE)
+    matcher = KinshipMatcher(TERMS_FILE)
 
     if not os.path.exists(f"{OUTPUT_DIR}/kinship_terms_csv"):
         os.mkdir(f"{OUTPUT_DIR}/kinship_terms_csv")
@@ -227,5 +734,5 @@ if __name__ == "__main__":
     for subreddit in subreddits:
         # this will write a new csv for each subreddit
         filename = f'data/kinship_term_json/{subreddit}.comment.kinship_terms.json'
-        write_csv_from_json(filename, terms)
-        print(filename + ' was csv\'d!')
+        stats = write_csv_from_json(filename, matcher)
+        print(filename + ' was csv\'d!', stats)
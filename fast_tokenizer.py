@@ -0,0 +1,128 @@
+"""A faster stand-in for nltk.word_tokenize, for counting word frequencies in collect_data.py.
+
+word_tokenize splits the text into sentences with Punkt, then runs about 40 regex substitutions over each sentence
+(the Treebank rules). tokenize instead finds the tokens with one precompiled regex, and only looks again at the few
+tokens with an apostrophe or a final period. It follows the same rules for what gets split off a word:
+    - punctuation like ?!;()[]{}"$%&*, and commas and colons not followed by a digit;
+    - ellipses and double dashes;
+    - clitics: "mom's" is "mom", "'s", "don't" is "do", "n't", "moms'" is "moms", "'";
+    - a few contractions: "cannot" is "can", "not", "gonna" is "gon", "na";
+    - the period at the end of a sentence: "my mom." is "my", "mom", "." and "Mr. Smith" is "Mr.", "Smith".
+Sentence ends follow Punkt without a trained model: a word ending in a period ends a sentence, unless it's in
+ABBREVIATIONS, an initial ("J.") or a number followed by a lower case word. Where the trained English model knows
+better (other abbreviations, or ellipses and abbreviations that do end a sentence), the tokens differ; so do quotes at
+the start of a line. benchmark_tokenizer.py measures how often.
+"""
+
+import re
+
+# Words whose final period doesn't end a sentence (lower case, without the period).
+ABBREVIATIONS = {'mr', 'mrs', 'ms', 'dr', 'vs', 'etc', 'e.g', 'i.e', 'jr', 'sr', 'st', 'u.s'}
+
+# Split off wherever they are.
+PUNCTUATION = r'?!;@#$%&*()\[\]{}<>«»“”‘’„‒-―'
+
+TOKEN_PATTERN = re.compile(rf'''
+    \.{{2,}}                                    # ellipses
+  | --
+  | `+
+  | (?P<quote>"|'')
+  | [{PUNCTUATION}]
+  | [:,](?!\d)
+  | (?:[^\s{PUNCTUATION}`"'.:,-]|[:,](?=\d)|\.(?!\.)|-(?!-)|'(?!'))+   # words
+''', re.VERBOSE)
+
+# The characters that can follow a period that ends a sentence (Punkt's "non-word" characters).
+NON_WORD = r''')";}\]*:@'({\[!?'''
+AFTER_SENTENCE_END = set(')";}]*:@\'({[!?')
+QUOTE_OPENERS = set(' ([{<')
+SENTENCE_ENDS = {'.', '?', '!'}
+
+NUMBER_PATTERN = re.compile(r'-?[.,]?\d[\d,.-]*\.?$')
+INITIAL_PATTERN = re.compile(r'[^\W\d]\.$')
+# A later period, ? or ! in the same word, where Punkt would end the sentence instead.
+LATER_SENTENCE_END_PATTERN = re.compile(rf'\S*?[.?!](?=[{NON_WORD}]|\s+\S)')
+# The next word after a period, or in the punctuation group if it's one of the marks that Punkt's ortho heuristic
+# says can't start a sentence (a lone ;:,.!? but not an ellipsis).
+NEXT_WORD_PATTERN = re.compile(rf'\s*(?:(?P<punctuation>[;:,]|[.!?](?=\s|$|[{NON_WORD}]))|(\S))')
+LEADING_APOSTROPHE_PATTERN = re.compile(r"'(?!(?:re|ve|ll|m|t|s|d|n)\b)(?=\w)", re.IGNORECASE)
+# Split off the end of a word, in this order, unless they're the whole word or come after an apostrophe.
+CLITICS = [("'s", "'S", "'m", "'M", "'d", "'D", "'"), ("'ll", "'LL", "'re", "'RE", "'ve", "'VE", "n't", "N'T")]
+CONTRACTION_PATTERN = re.compile(r"(?:can(?=not\b)|d(?='ye\b)|gim(?=me\b)|gon(?=na\b)|got(?=ta\b)|lem(?=me\b)"
+                                 r"|more(?='n\b)|wan(?=na$))", re.IGNORECASE)
+CONTRACTION_STARTS = {'can', "d'y", 'gim', 'gon', 'got', 'lem', 'mor', 'wan'}
+
+
+def tokenize(text):
+    """Return the tokens of text, like nltk.word_tokenize."""
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text):
+        token = match.group()
+        if match.group('quote') is not None:
+            start = match.start()
+            if start == 0 or text[start - 1] in QUOTE_OPENERS or \
+                    (text[start - 1].isspace() and tokens and tokens[-1] in SENTENCE_ENDS):
+                tokens.append('``')  # an opening quote
+            else:
+                tokens.append("''")
+        elif "'" in token or token[-1] == '.' or token[:3].lower() in CONTRACTION_STARTS:
+            split_word(token, text, match.end(), tokens)
+        else:
+            tokens.append(token)
+    return tokens
+
+
+def split_word(token, text, end, tokens):
+    """Append the tokens of the word token, which ends at end in text, to tokens."""
+    period = token.find(".'")
+    if period > 0 and token[period - 1] != '.':
+        # a sentence can end inside the word, before a quote
+        period_end = end - len(token) + period + 1
+        if ends_sentence(token[:period + 1], text, period_end):
+            split_word(token[:period + 1], text, period_end, tokens)
+            split_word(token[period + 1:], text, end, tokens)
+            return
+
+    if token[0] == "'" and LEADING_APOSTROPHE_PATTERN.match(token):
+        tokens.append("'")
+        token = token[1:]
+
+    after = []
+    if len(token) > 1 and token[-1] == '.' and token[-2] != '.' and ends_sentence(token, text, end):
+        token = token[:-1]
+        after.append('.')
+    for clitics in CLITICS:
+        clitic = next((clitic for clitic in clitics if token.endswith(clitic)), None)
+        if clitic is not None and len(token) > len(clitic) and token[-len(clitic) - 1] != "'":
+            token = token[:-len(clitic)]
+            after.insert(0, clitic)
+
+    match = CONTRACTION_PATTERN.match(token)
+    if match is not None:
+        tokens.extend([token[:match.end()], token[match.end():]])
+    else:
+        tokens.append(token)
+    tokens.extend(after)
+
+
+def ends_sentence(token, text, end):
+    """Return True if the period at the end of token (ending at end in text) ends a sentence."""
+    if end < len(text) and not text[end].isspace() and text[end] not in AFTER_SENTENCE_END:
+        return False
+    if LATER_SENTENCE_END_PATTERN.match(text, end):
+        return False
+    word = token[:-1].lower()
+    if word in ABBREVIATIONS or word.split('-')[-1] in ABBREVIATIONS:
+        return False
+    is_initial = INITIAL_PATTERN.match(token) is not None
+    if is_initial or NUMBER_PATTERN.match(token):
+        next_word = NEXT_WORD_PATTERN.match(text, end)
+        if next_word is None:  # the end of the text
+            return True
+        # like Punkt with no training data: initials and numbers don't end a sentence when the next word is lower
+        # case or punctuation, and initials don't when it's upper case either
+        if next_word.group('punctuation') is not None or next_word.group(2).islower():
+            return False
+        if is_initial and next_word.group(2).isupper():
+            return False
+    return True
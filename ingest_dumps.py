@@ -0,0 +1,163 @@
+"""Builds the same files as scrape_data.py (one json file per subreddit in data/kinship_terms_json), but from
+monthly Reddit comment dump files (e.g. RC_2022-06.zst) instead of the pushshift API.
+
+Each dump file is stream-decompressed and filtered line by line by its own process, so memory use per process does
+not grow with the size of the dump. A comment is kept if its subreddit is in SUBREDDITS and its body contains one of
+the terms from construct_query(). Only the fields in FIELDS are kept.
+
+Unlike scrape_data.py, comments are written oldest first (the order of the dumps), so these files can't be continued
+with scrape_data.py's resume: read_resume_point refuses files that aren't newest first.
+"""
+
+import glob
+import io
+import json
+import os
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import zstandard
+
+from comment_index import CommentIdIndex
+from jsonl_io import compressed_filename, open_jsonl
+from scrape_data import (COMPRESSION, FIELDS, OUTPUT_DIR, SUBREDDITS, TERMS_FILE, USE_ID_INDEX, construct_query,
+                         id_index_filename)
+
+# Where the monthly comment dumps are stored.
+DUMP_FILES = 'data/dumps/RC_*.zst'
+
+# The number of dump files read at the same time.
+N_PROCESSES = 4
+
+# The dumps are compressed with a long window, which the decompressor has to be told to allow.
+MAX_WINDOW_SIZE = 2 ** 31
+
+
+def construct_term_pattern(terms_file=TERMS_FILE):
+    """Turn the query from construct_query() into a regex that matches the same comments as the API search:
+    any of the terms (or quoted phrases) as whole words, ignoring case.
+    """
+    terms = [term.strip('"') for term in construct_query(terms_file).split('|')]
+    alternatives = '|'.join(re.escape(term) for term in sorted(terms, key=len, reverse=True))
+    return re.compile(r'\b(?:' + alternatives + r')\b', re.IGNORECASE)
+
+
+def construct_subreddit_pattern(subreddits):
+    """Regex used to skip lines from other subreddits before parsing their json."""
+    alternatives = '|'.join(re.escape(sub) for sub in subreddits)
+    return re.compile(r'"subreddit":\s*"(?:' + alternatives + r')"', re.IGNORECASE)
+
+
+def read_dump(filename):
+    """Yield the lines of a .zst dump file one at a time, without decompressing the whole file."""
+    with open(filename, 'rb') as f:
+        reader = zstandard.ZstdDecompressor(max_window_size=MAX_WINDOW_SIZE).stream_reader(f)
+        for line in io.TextIOWrapper(reader, encoding='utf-8'):
+            yield line
+
+
+def ingest_dump(filename, part_dir, subreddits=SUBREDDITS, fields=FIELDS, terms_file=TERMS_FILE,
+                compression=COMPRESSION):
+    """Write the comments in filename that are from subreddits and contain a kinship term to
+    part_dir/<subreddit>.json (compressed if compression is 'gzip' or 'zstd'). Returns a dictionary mapping each
+    subreddit to the number of comments written.
+    """
+    term_pattern = construct_term_pattern(terms_file)
+    subreddit_pattern = construct_subreddit_pattern(subreddits)
+    subreddit_names = {sub.lower(): sub for sub in subreddits}
+
+    if not os.path.exists(part_dir):
+        os.makedirs(part_dir)
+    files = {sub: open_jsonl(compressed_filename(f'{part_dir}/{sub}.json', compression), 'w') for sub in subreddits}
+    counts = {sub: 0 for sub in subreddits}
+    try:
+        for line in read_dump(filename):
+            if subreddit_pattern.search(line) is None:
+                continue
+            comment = json.loads(line)
+            sub = subreddit_names.get((comment.get('subreddit') or '').lower())
+            if sub is None or term_pattern.search(comment.get('body') or '') is None:
+                continue
+
+            element = {field: comment[field] for field in fields if field in comment}
+            if 'created_utc' in element:
+                element['created_utc'] = int(element['created_utc'])  # a string in some older dumps
+            files[sub].write(json.dumps(element) + '\n')
+            counts[sub] += 1
+    finally:
+        for f in files.values():
+            f.close()
+    return counts
+
+
+def ingest_dumps(filenames, output_dir=OUTPUT_DIR, subreddits=SUBREDDITS, n_processes=N_PROCESSES,
+                 compression=COMPRESSION, use_id_index=USE_ID_INDEX, **kwargs):
+    """Run ingest_dump on each dump file in its own process, then concatenate the results into
+    output_dir/<subreddit>.comment.kinship_terms.json in the order of the (sorted) dump file names.
+    Returns a dictionary mapping each subreddit to the number of comments written.
+
+    When use_id_index is True, comments whose id is in output_dir/<subreddit>.comment_ids (see USE_ID_INDEX in
+    scrape_data.py) or that appear in more than one dump are written only once.
+    """
+    filenames = sorted(filenames)
+    output_filenames = {
+        sub: compressed_filename(output_dir + '/' + sub + '.comment.kinship_terms.json', compression)
+        for sub in subreddits
+    }
+    for output_filename in output_filenames.values():
+        if os.path.exists(output_filename):
+            # This prevents accidentally over-writing existing files.
+            raise ValueError('Output filename already exists: ' + output_filename)
+
+    parts_dir = output_dir + '/dump_parts'
+    part_dirs = [f'{parts_dir}/{os.path.basename(filename)}' for filename in filenames]
+    totals = {sub: 0 for sub in subreddits}
+    with ProcessPoolExecutor(max_workers=n_processes) as executor:
+        futures = [executor.submit(ingest_dump, filename, part_dir, subreddits, compression=compression, **kwargs)
+                   for filename, part_dir in zip(filenames, part_dirs)]
+        for filename, future in zip(filenames, futures):
+            counts = future.result()
+            print(filename + ':', counts)
+            for sub in subreddits:
+                totals[sub] += counts[sub]
+
+    for sub in subreddits:
+        part_files = [compressed_filename(f'{part_dir}/{sub}.json', compression) for part_dir in part_dirs]
+        if use_id_index:
+            with CommentIdIndex(id_index_filename(output_dir, sub)) as id_index:
+                totals[sub] = concatenate_new_comments(part_files, output_filenames[sub], id_index)
+        else:
+            # gzip members and zstd frames can be concatenated as they are
+            with open(output_filenames[sub], 'wb') as fout:
+                for part_file in part_files:
+                    with open(part_file, 'rb') as f:
+                        shutil.copyfileobj(f, fout)
+    shutil.rmtree(parts_dir)
+    return totals
+
+
+def concatenate_new_comments(part_files, output_filename, id_index):
+    """Concatenate part_files into output_filename, leaving out comments whose id is in id_index, and adding the
+    ids of the ones written to it. Returns the number of comments written.
+    """
+    count = 0
+    with open_jsonl(output_filename, 'w') as fout:
+        for part_file in part_files:
+            with open_jsonl(part_file) as f:
+                for line in f:
+                    comment_id = json.loads(line).get('id')
+                    if comment_id is not None:
+                        if comment_id in id_index:
+                            continue
+                        id_index.add(comment_id)
+                    fout.write(line)
+                    count += 1
+    return count
+
+
+if __name__ == "__main__":
+    if not os.path.exists(OUTPUT_DIR):
+        os.mkdir(OUTPUT_DIR)
+
+    print(ingest_dumps(glob.glob(DUMP_FILES)))
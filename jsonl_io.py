@@ -0,0 +1,94 @@
+"""Reading and writing the scraped comment files (one json object per line), optionally compressed.
+
+The compression is chosen by the file name: files ending in .gz are gzip-compressed and files ending in .zst are
+zstd-compressed; anything else is plain text. Readers don't need to know which one they are given.
+"""
+
+import gzip
+import io
+import os
+
+COMPRESSION_SUFFIXES = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
+
+# gzip.open defaults to the slowest level (9), which barely compresses comments better than 6.
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# How much of an uncompressed file is read at a time when reading it backwards from the end.
+TAIL_BLOCK_SIZE = 2 ** 16
+
+
+def compressed_filename(filename, compression):
+    """Return filename with the suffix for compression (None, 'gzip' or 'zstd') added."""
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(f'Unknown compression: {compression}')
+    return filename + COMPRESSION_SUFFIXES[compression]
+
+
+def is_compressed(filename):
+    return filename.endswith('.gz') or filename.endswith('.zst')
+
+
+def open_jsonl(filename, mode='r'):
+    """Open filename as text for reading ('r'), writing ('w') or appending ('a'), compressing or decompressing it
+    as needed. Appending to a compressed file adds a new gzip member or zstd frame, which readers read through.
+    'rb' opens the (decompressed) file for reading bytes instead of text.
+    """
+    if mode not in ('r', 'w', 'a', 'rb'):
+        raise ValueError(f'Unsupported mode: {mode}')
+    binary = mode == 'rb'
+    mode = mode[0]
+
+    if filename.endswith('.gz'):
+        if binary:
+            return gzip.open(filename, 'rb')
+        return gzip.open(filename, mode + 't', compresslevel=GZIP_LEVEL, encoding='utf-8')
+
+    if filename.endswith('.zst'):
+        import zstandard  # only needed for .zst files
+
+        f = open(filename, mode + 'b')
+        if mode == 'r':
+            stream = zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True, closefd=True)
+            if binary:
+                return io.BufferedReader(stream)
+        else:
+            stream = zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(f, closefd=True)
+        return io.TextIOWrapper(stream, encoding='utf-8')
+
+    if binary:
+        return open(filename, 'rb')
+    return open(filename, mode, encoding='utf-8')
+
+
+def last_line_end(file):
+    """Return the byte offset just after the last newline in the uncompressed file (0 if there is none)."""
+    with open(file, 'rb') as f:
+        end = f.seek(0, os.SEEK_END)
+        while end > 0:
+            block_start = max(0, end - TAIL_BLOCK_SIZE)
+            f.seek(block_start)
+            newline = f.read(end - block_start).rfind(b'\n')
+            if newline != -1:
+                return block_start + newline + 1
+            end = block_start
+    return 0
+
+
+def reversed_lines(file, end):
+    """Yield the non-empty lines (as bytes, without the newline) of the uncompressed file before byte offset end, last
+    first, reading only as much of the file as the lines taken.
+    """
+    with open(file, 'rb') as f:
+        rest = b''  # the start of a line that continues in the next block
+        while end > 0:
+            block_start = max(0, end - TAIL_BLOCK_SIZE)
+            f.seek(block_start)
+            lines = (f.read(end - block_start) + rest).split(b'\n')
+            rest = lines.pop(0)
+            end = block_start
+            for line in reversed(lines):
+                if line:
+                    yield line
+        if rest:
+            yield rest
@@ -0,0 +1,149 @@
+"""A trie-based alternative to running the query from extract_kinship_terms.get_terms as a regex.
+
+The query is a list of alternatives like
+    (^|\s)(?P<kinship_pl>(?P<kinship_term>mom)s?)($|[\s\.,;:\?!\)])
+run with regex.finditer and IGNORECASE. KinshipTrie finds the same matches: it builds a trie of the terms, and walks
+it once from the start of the comment and from every position after whitespace, so a comment is read once no matter
+how many terms there are. It keeps the quirks of the regex:
+    - the whitespace before a term and the character after it are part of the match, so in "mom dad" only "mom" is
+      found (the space before "dad" was used up by "mom");
+    - where two alternatives match at the same place, the earlier one in terms.csv wins;
+    - letters are compared with the regex module's case-insensitive matching (e.g. "ſ" matches "s"), and whitespace
+      is what the regex module counts as \s.
+"""
+
+import sys
+from functools import lru_cache
+
+import regex
+
+ALTERNATIVE_PATTERN = regex.compile(
+    r'\(\^\|\\s\)(?:\(\?P<kinship_pl>\(\?P<kinship_term>(?P<plural_term>[^()]+)\)(?P<suffix>s\?|\(ren\)\?)\)'
+    r'|\(\?P<kinship_term>(?P<term>[^()]+)\))\(\$\|\[\\s\\\.,;:\\\?!\\\)\]\)')
+
+# Stands in for every whitespace character in the folded comment.
+WHITESPACE = '\x00'
+# The characters that can end a term, other than whitespace and the end of the comment.
+END_CHARACTERS = '.,;:?!)'
+
+
+@lru_cache(maxsize=None)
+def all_characters():
+    return ''.join(chr(i) for i in range(sys.maxunicode + 1) if not 0xd800 <= i < 0xe000)
+
+
+@lru_cache(maxsize=None)
+def fold_table(alphabet):
+    """Return a str.translate table mapping every character the regex module matches case-insensitively with a
+    character of alphabet to that character, every whitespace character to WHITESPACE, and WHITESPACE itself to a
+    character that matches nothing.
+    """
+    table = {ord(WHITESPACE): '\x01'}
+    for character in regex.findall(r'\s', all_characters()):
+        table[ord(character)] = WHITESPACE
+    for letter in alphabet:
+        if letter == ' ':  # a space in a term only matches a space, which is whitespace in the comment
+            continue
+        for character in regex.findall(regex.escape(letter), all_characters(), regex.IGNORECASE):
+            table[ord(character)] = letter
+    return table
+
+
+def parse_query(query):
+    """Return the (term, plural suffix) pairs in query, in order. The suffix is 's', 'ren' or '' (for wife, wives and
+    s/o, which have no kinship_pl group).
+    """
+    alternatives = []
+    for i, alternative in enumerate(query.split('|(^|\\s)')):
+        match = ALTERNATIVE_PATTERN.fullmatch(alternative if i == 0 else '(^|\\s)' + alternative)
+        if match is None:
+            raise ValueError(f'Not a term from get_terms: {alternative}')
+        if match.group('term') is not None:
+            term, suffix = match.group('term'), ''
+        else:
+            term, suffix = match.group('plural_term'), 's' if match.group('suffix') == 's?' else 'ren'
+        if regex.escape(term, special_only=True, literal_spaces=True) != term:
+            raise ValueError(f'Only plain terms are supported: {term}')
+        alternatives.append((term.lower(), suffix))
+    return alternatives
+
+
+def query_alphabet(alternatives):
+    """Return the characters in the (term, plural suffix) pairs from parse_query, for fold_table."""
+    return ''.join(sorted(set(''.join(term + suffix for term, suffix in alternatives))))
+
+
+class KinshipTrie:
+    """Finds the kinship terms of a get_terms query in comments without running the query as a regex."""
+
+    def __init__(self, query):
+        self.alternatives = parse_query(query)
+        self.table = fold_table(query_alphabet(self.alternatives))
+        self.root = {}
+        for i, (term, suffix) in enumerate(self.alternatives):
+            node = self.root
+            for character in term.translate(self.table):
+                node = node.setdefault(character, {})
+            node.setdefault(None, []).append(i)  # None marks the end of a term
+        # where a term has a space, the comment must have a space (not any whitespace) there
+        self.spaces = [[j for j, character in enumerate(term) if character == ' '] for term, _ in self.alternatives]
+
+    def find(self, comment):
+        """Yield (start, end of the plural, end of the singular) for every term in comment, like the kinship_pl and
+        kinship_term groups of the query (the plural is the singular for terms without a plural group).
+        """
+        folded = comment.translate(self.table)
+        position = 0
+        if folded and folded[0] != WHITESPACE:
+            match = self.match_at(comment, folded, 0)
+            if match is not None:
+                yield match[:3]
+                position = match[3]
+        whitespace = folded.find(WHITESPACE, position)
+        while whitespace != -1:
+            match = self.match_at(comment, folded, whitespace + 1)
+            if match is not None:
+                yield match[:3]
+                position = match[3]
+            else:
+                position = whitespace + 1
+            whitespace = folded.find(WHITESPACE, position)
+
+    def match_at(self, comment, folded, start):
+        """Return (start, end of the plural, end of the singular, end of the match) for the first alternative that
+        matches at start, or None.
+        """
+        best = None
+        node = self.root
+        end = start
+        while end < len(folded):
+            node = node.get(folded[end])
+            if node is None:
+                break
+            end += 1
+            for i in node.get(None, ()):
+                if best is not None and best[0] < i:
+                    continue
+                if any(comment[start + j] != ' ' for j in self.spaces[i]):
+                    continue
+                match = self.match_suffix(folded, end, self.alternatives[i][1])
+                if match is not None:
+                    best = (i, match[0], end, match[1])
+        if best is None:
+            return None
+        return (start,) + best[1:]
+
+    @staticmethod
+    def match_suffix(folded, end, suffix):
+        """Return (end of the plural, end of the match) for a term ending at end, or None if the term isn't followed
+        by the end of the comment, whitespace or one of END_CHARACTERS. Like the regex, the plural suffix is tried
+        first.
+        """
+        for plural_end in ([end + len(suffix), end] if suffix else [end]):
+            if plural_end > end and folded[end:plural_end] != suffix:
+                continue
+            if plural_end == len(folded):
+                return plural_end, plural_end
+            if folded[plural_end] == WHITESPACE or folded[plural_end] in END_CHARACTERS:
+                return plural_end, plural_end + 1
+        return None
@@ -0,0 +1,155 @@
+"""A normalized, columnar alternative to the csv files written by extract_kinship_terms.py.
+
+The csv files repeat the whole comment (body included) on every row, once per kinship term found in it. Instead, the
+store for e.g. data/kinship_terms_csv/Parenting.comment.kinship_terms.csv is two Parquet tables:
+    Parenting.comment.kinship_terms.comments.parquet/  id, author, subreddit, created_utc, body (one row per comment
+                                                       with at least one kinship term)
+    Parenting.comment.kinship_terms.mentions.parquet/  id, index, kinship_term, specific, singular, determiner (one row
+                                                       per kinship term)
+Each is a directory of part files, so incremental extraction can add a part instead of rewriting the table.
+
+load_kinship_terms reads either format, and only the columns asked for; scripts that don't need the bodies never
+read them.
+"""
+
+import os
+import shutil
+
+import pandas as pd
+
+# The columns of the csv files, in order.
+CSV_COLUMNS = ['kinship_term', 'specific', 'singular', 'index', 'author', 'body', 'created_utc', 'id', 'subreddit',
+               'determiner']
+
+COMMENT_COLUMNS = ['id', 'author', 'subreddit', 'created_utc', 'body']
+MENTION_COLUMNS = ['id', 'index', 'kinship_term', 'specific', 'singular', 'determiner']
+
+# The number of mentions buffered before they (and their comments) are written as a row group.
+ROW_GROUP_SIZE = 100000
+
+
+def store_directories(base):
+    """Return the comments and mentions directories of the store for base (the csv file name without .csv)."""
+    return base + '.comments.parquet', base + '.mentions.parquet'
+
+
+def part_files(directory):
+    if not os.path.isdir(directory):
+        return []
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith('.parquet'))
+
+
+def schemas():
+    import pyarrow as pa  # only needed for the Parquet store
+
+    comments = pa.schema([('id', pa.string()), ('author', pa.string()), ('subreddit', pa.string()),
+                          ('created_utc', pa.int64()), ('body', pa.string())])
+    mentions = pa.schema([('id', pa.string()), ('index', pa.int64()), ('kinship_term', pa.string()),
+                          ('specific', pa.string()), ('singular', pa.bool_()), ('determiner', pa.string())])
+    return comments, mentions
+
+
+class MentionStoreWriter:
+    """Writes extracted rows to the store for base. With previous_parts = None, the store is rebuilt; otherwise,
+    parts after the first previous_parts (left by an interrupted run) are removed and a new part is added.
+    """
+
+    def __init__(self, base, previous_parts=None):
+        self.directories = store_directories(base)
+        if previous_parts is None:
+            for directory in self.directories:
+                if os.path.exists(directory):
+                    shutil.rmtree(directory)
+                os.makedirs(directory)
+            self.part = 0
+        else:
+            for directory in self.directories:
+                for file in part_files(directory)[previous_parts:]:
+                    os.remove(file)
+            self.part = previous_parts
+        self.schemas = schemas()
+        self.comments = {column: [] for column in COMMENT_COLUMNS}
+        self.mentions = {column: [] for column in MENTION_COLUMNS}
+        self.writers = None
+
+    def write_comment(self, rows):
+        """Add the rows extracted from one comment (as written to the csv file)."""
+        if not rows:
+            return
+        data = rows[0]
+        for column in COMMENT_COLUMNS:
+            value = data.get(column)
+            self.comments[column].append(int(value) if column == 'created_utc' and value is not None else value)
+        for row in rows:
+            for column in MENTION_COLUMNS:
+                self.mentions[column].append(row.get(column))
+        if len(self.mentions['id']) >= ROW_GROUP_SIZE:
+            self.flush()
+
+    def flush(self):
+        if not self.mentions['id']:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self.writers is None:
+            name = f'part-{self.part:05d}.parquet'
+            self.writers = [pq.ParquetWriter(os.path.join(directory, name), schema)
+                            for directory, schema in zip(self.directories, self.schemas)]
+        for writer, columns, schema in zip(self.writers, [self.comments, self.mentions], self.schemas):
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+            for values in columns.values():
+                values.clear()
+
+    def close(self):
+        self.flush()
+        if self.writers is not None:
+            for writer in self.writers:
+                writer.close()
+            self.part += 1
+
+    def n_parts(self):
+        return self.part
+
+
+def has_store(file):
+    """Return True if there is a Parquet store for the csv file name file."""
+    return all(os.path.isdir(directory) for directory in store_directories(file[:-len('.csv')]))
+
+
+def read_table(directory, columns, schema):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    tables = [pq.read_table(file, columns=columns) for file in part_files(directory)]
+    if not tables:
+        return schema.empty_table().select(columns).to_pandas()
+    return pa.concat_tables(tables).to_pandas()
+
+
+def load_kinship_terms(file, columns=None):
+    """Return the rows extracted to the csv file name file (one per kinship term) as a dataframe with only columns
+    (by default, all of them). If there is a Parquet store for file, it is read instead of the csv file, and the
+    comments table is only read when a column from it (other than id) is needed. Rows without a determiner have ''
+    from either.
+    """
+    if not has_store(file):
+        df = pd.read_csv(file, usecols=columns)
+        if 'determiner' in df:
+            df['determiner'] = df['determiner'].fillna('')  # an empty determiner, as in the Parquet store
+        return df if columns is None else df[columns]
+
+    if columns is None:
+        columns = CSV_COLUMNS
+    comment_schema, mention_schema = schemas()
+    comments_directory, mentions_directory = store_directories(file[:-len('.csv')])
+    comment_columns = [column for column in columns if column in COMMENT_COLUMNS and column not in MENTION_COLUMNS]
+    mention_columns = [column for column in columns if column in MENTION_COLUMNS]
+    if comment_columns and 'id' not in mention_columns:
+        mention_columns.append('id')
+
+    df = read_table(mentions_directory, mention_columns, mention_schema)
+    if comment_columns:
+        comments = read_table(comments_directory, ['id'] + comment_columns, comment_schema)
+        df = df.merge(comments.drop_duplicates('id'), on='id', how='left')
+    return df[columns]
@@ -0,0 +1,213 @@
+"""A local stand-in for the pushshift comment search endpoint (/reddit/search/comment/), used to test and benchmark
+scrape_data.py without the live API.
+
+It serves synthetic comments and supports the parameters scrape_data.py uses: subreddit, sort, before, after, size,
+fields, metadata and q. It can also add latency to every response and answer a given fraction of requests with a 429
+or a 5xx error.
+
+Run it on its own with:
+    python mock_pushshift.py --port 8000
+and set PUSHSHIFT_ENDPOINT in scrape_data.py to http://127.0.0.1:8000/reddit/search/comment/
+"""
+
+import argparse
+import bisect
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from scrape_data import SUBREDDITS
+
+ENDPOINT_PATH = '/reddit/search/comment/'
+
+# pushshift never returns more than this many comments per request
+MAX_SIZE = 100
+
+# the newest synthetic comment is from this time, and the others go back in time from there
+NEWEST_DATE = 1672531200  # 2023-01-01
+
+TEMPLATES = [
+    'my {term} and I went to the store',
+    'I asked your {term} about it yesterday',
+    'the {term} was there, and so were {other}.',
+    '{term}s are hard to understand sometimes',
+    'Honestly this is a great question',
+    'source? I would love to read more about that',
+    'that is not how any of this works',
+]
+TERMS = ['mom', 'dad', 'sister', 'brother', 'wife', 'husband', 'kid', 'parent', 'son', 'daughter']
+OTHERS = ['my friends', 'the neighbours', 'a few people']
+AUTHORS = ['throwaway123', 'AutoModerator', 'parent_of_three', 'helpful_bot', '[deleted]', 'curious_cat']
+
+
+def make_comments(subreddit, n_comments, seed=0):
+    """Return n_comments synthetic comments for subreddit, newest first."""
+    rng = random.Random(f'{seed}-{subreddit}')
+    comments = []
+    created_utc = NEWEST_DATE
+    for i in range(n_comments):
+        body = rng.choice(TEMPLATES).format(term=rng.choice(TERMS), other=rng.choice(OTHERS))
+        comments.append({
+            'body': body,
+            'author': rng.choice(AUTHORS),
+            'subreddit': subreddit,
+            'created_utc': created_utc,
+            'id': f'{subreddit.lower()[:3]}{i:x}',
+            'score': rng.randint(-5, 100),
+        })
+        created_utc -= rng.randint(0, 30)  # several comments can have the same created_utc
+    return comments
+
+
+def construct_q_pattern(q):
+    """Regex for a pushshift q parameter: terms (or quoted phrases) joined with |, matched as whole words."""
+    terms = [term.strip().strip('"') for term in q.split('|') if term.strip()]
+    return re.compile(r'\b(?:' + '|'.join(re.escape(term) for term in terms) + r')\b', re.IGNORECASE)
+
+
+class MockPushshift:
+    """Serves synthetic comments for subreddits on 127.0.0.1:port (port 0 picks a free port).
+
+    latency is the number of seconds each response is delayed, error_rate_429 and error_rate_5xx are the fractions
+    of requests answered with those errors, and retry_after is sent as the Retry-After header of 429 responses
+    (no header when it is None).
+    """
+
+    def __init__(self, subreddits=SUBREDDITS, n_comments=10000, latency=0.0, error_rate_429=0.0,
+                 error_rate_5xx=0.0, retry_after=None, port=0, seed=0):
+        self.comments = {sub.lower(): make_comments(sub, n_comments, seed) for sub in subreddits}
+        self.latency = latency
+        self.error_rate_429 = error_rate_429
+        self.error_rate_5xx = error_rate_5xx
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.matching = {}  # (subreddit, q) -> (comments matching q, their negated created_utc for bisect)
+        self.reset_stats()
+
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                mock.handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def endpoint(self):
+        return f'http://127.0.0.1:{self.server.server_address[1]}{ENDPOINT_PATH}'
+
+    def reset_stats(self):
+        self.stats = {'requests': 0, '429': 0, '5xx': 0, 'comments': 0, 'latencies': []}
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def get_matching(self, subreddit, q):
+        key = (subreddit.lower(), q)
+        with self.lock:
+            if key not in self.matching:
+                comments = self.comments.get(subreddit.lower(), [])
+                if q:
+                    pattern = construct_q_pattern(q)
+                    comments = [c for c in comments if pattern.search(c['body'])]
+                self.matching[key] = (comments, [-c['created_utc'] for c in comments])
+            return self.matching[key]
+
+    def search(self, params):
+        """Return the json response for the query parameters params."""
+        comments, keys = self.get_matching(params.get('subreddit', ''), params.get('q', ''))
+        # comments are newest first, so keys (the negated dates) are increasing
+        start, end = 0, len(comments)
+        if 'before' in params:
+            start = bisect.bisect_right(keys, -int(params['before']))
+        if 'after' in params:
+            end = bisect.bisect_left(keys, -int(params['after']))
+        selected = comments[start:max(start, end)]
+        if params.get('sort', 'desc') == 'asc':
+            selected = selected[::-1]
+
+        output = {'data': selected[:min(int(params.get('size', 25)), MAX_SIZE)]}
+        if 'fields' in params:
+            fields = params['fields'].split(',')
+            output['data'] = [{f: c[f] for f in fields if f in c} for c in output['data']]
+        if params.get('metadata') == 'true':
+            output['metadata'] = {'total_results': len(selected)}
+        return output
+
+    def handle(self, request):
+        start = time.perf_counter()
+        with self.lock:
+            self.stats['requests'] += 1
+            roll = self.rng.random()
+        if self.latency:
+            time.sleep(self.latency)
+
+        n_returned = 0
+        if urlparse(request.path).path != ENDPOINT_PATH:
+            status, body = 404, b''
+        elif roll < self.error_rate_429:
+            status, body = 429, b''
+        elif roll < self.error_rate_429 + self.error_rate_5xx:
+            status, body = 500 + int(roll * 1000) % 4, b''  # 500 to 503
+        else:
+            params = {key: values[0] for key, values in parse_qs(urlparse(request.path).query).items()}
+            output = self.search(params)
+            status, body = 200, json.dumps(output).encode()
+            n_returned = len(output['data'])
+
+        request.send_response(status)
+        if status == 429 and self.retry_after is not None:
+            request.send_header('Retry-After', str(self.retry_after))
+        request.send_header('Content-Type', 'application/json')
+        request.send_header('Content-Length', str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+        with self.lock:
+            if status == 429:
+                self.stats['429'] += 1
+            elif status >= 500:
+                self.stats['5xx'] += 1
+            self.stats['comments'] += n_returned
+            self.stats['latencies'].append(time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--n-comments', type=int, default=10000, help='comments per subreddit')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    parser.add_argument('--error-rate-429', type=float, default=0.0)
+    parser.add_argument('--error-rate-5xx', type=float, default=0.0)
+    parser.add_argument('--retry-after', type=float, default=None)
+    args = parser.parse_args()
+
+    mock = MockPushshift(n_comments=args.n_comments, latency=args.latency, error_rate_429=args.error_rate_429,
+                         error_rate_5xx=args.error_rate_5xx, retry_after=args.retry_after, port=args.port)
+    print('Serving on ' + mock.endpoint)
+    try:
+        mock.server.serve_forever()
+    except KeyboardInterrupt:
+        mock.server.server_close()
@@ -5,6 +5,7 @@ import matplotlib.pyplot as plt  # library for plotting
 import collections  # library for the dictionary to keep track of kinship term counts
 from matplotlib.colors import ListedColormap
 import numpy as np
+from mention_store import load_kinship_terms
 
 
 OUTPUT_DIR = f"images/part_1_bar"
@@ -53,19 +54,18 @@ def aggregate_counts(file: str, group: dict, gender_neutral: set):
     if '/kinship_terms_csv' in output:   # this is not a test file
         output = output.replace('kinship_terms_csv', 'aggregated_data')
 
-    # count data
-    with open(file, encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            for key in group:
-                if row['kinship_term'] in group[key]:
-                    gr = key
-                    break
-            specific = "specific" if row["specific"].lower() == "specific" else "other"
-            dict_of_terms[(gr, str(row['kinship_term'] not in gender_neutral).lower(), specific,
-                           row['singular'].lower())] += 1
-            # add one for the total count as well
-            dict_of_terms[(gr, str(row['kinship_term'] not in gender_neutral).lower(), 'n/a', 'n/a')] += 1
+    # count data (only the columns needed, so the comment bodies are never read)
+    rows = load_kinship_terms(file, columns=['kinship_term', 'specific', 'singular'])
+    for row in rows.itertuples(index=False):
+        for key in group:
+            if row.kinship_term in group[key]:
+                gr = key
+                break
+        specific = "specific" if row.specific.lower() == "specific" else "other"
+        dict_of_terms[(gr, str(row.kinship_term not in gender_neutral).lower(), specific,
+                       str(row.singular).lower())] += 1
+        # add one for the total count as well
+        dict_of_terms[(gr, str(row.kinship_term not in gender_neutral).lower(), 'n/a', 'n/a')] += 1
 
     # output to new csv file
     with open(output, 'w', encoding="utf-8", newline='') as csv_writer:
@@ -1,12 +1,14 @@
 import pandas as pd
 from scipy.stats import chi2_contingency
+from collect_data import FREQUENCY_DIR, read_total_words
 
 
 kin_terms_data = pd.read_csv("terms.csv")
 ONE_MILLION = 1000000
 
 
-# Copied from output in collect_data.py
+# Copied from output in collect_data.py, for subreddits that aren't in the manifest collect_data.py writes to
+# FREQUENCY_DIR (e.g. frequencies counted before it wrote one)
 TOTAL_WORDS = {
     "askscience": 10000086,
     "askreddit": 10000015,
@@ -17,6 +19,13 @@ TOTAL_WORDS = {
 OUTPUT_CONTINGENCY_TABLE_SUMMARY = False
 
 
+def load_total_words(frequency_dir=FREQUENCY_DIR):
+    """Return the total number of words counted for each subreddit, from the manifest in frequency_dir where there
+    is one, and from TOTAL_WORDS otherwise.
+    """
+    return {**TOTAL_WORDS, **read_total_words(frequency_dir)}
+
+
 def get_n_kinship_terms(subreddit_path, kinship_groups):
     data = pd.read_csv(subreddit_path, index_col=0)
     data = data.merge(kin_terms_data, on="term")
@@ -24,14 +33,14 @@ def get_n_kinship_terms(subreddit_path, kinship_groups):
     return data["frequency"].sum()
 
 
-def run_test(subreddit1, subreddit2, kinship_groups):
-    n_kinship_subreddit1 = get_n_kinship_terms(f"data/part_1_need_probabilities/{subreddit1}_frequencies.csv",
+def run_test(subreddit1, subreddit2, kinship_groups, total_words=TOTAL_WORDS):
+    n_kinship_subreddit1 = get_n_kinship_terms(f"{FREQUENCY_DIR}/{subreddit1}_frequencies.csv",
                                                kinship_groups=kinship_groups)
-    n_kinship_subreddit2 = get_n_kinship_terms(f"data/part_1_need_probabilities/{subreddit2}_frequencies.csv",
+    n_kinship_subreddit2 = get_n_kinship_terms(f"{FREQUENCY_DIR}/{subreddit2}_frequencies.csv",
                                                kinship_groups=kinship_groups)
     contingency_table = [
-        [n_kinship_subreddit1, TOTAL_WORDS[subreddit1] - n_kinship_subreddit1],
-        [n_kinship_subreddit2, TOTAL_WORDS[subreddit2] - n_kinship_subreddit2]
+        [n_kinship_subreddit1, total_words[subreddit1] - n_kinship_subreddit1],
+        [n_kinship_subreddit2, total_words[subreddit2] - n_kinship_subreddit2]
     ]
 
     if OUTPUT_CONTINGENCY_TABLE_SUMMARY:
@@ -46,22 +55,24 @@ def run_test(subreddit1, subreddit2, kinship_groups):
         statistic, p_value, degrees_freedom, expected_counts = chi2_contingency(contingency_table)
         print(f"\tstatistic={statistic}; p={p_value:.8f}\n")
 
-        kinship_subreddit1_pmw = (n_kinship_subreddit1 / TOTAL_WORDS[subreddit1]) * ONE_MILLION
-        kinship_subreddit2_pmw = (n_kinship_subreddit2 / TOTAL_WORDS[subreddit2]) * ONE_MILLION
-        print(f"\t{subreddit1}: {n_kinship_subreddit1} kinship terms of {TOTAL_WORDS[subreddit1]} total ({kinship_subreddit1_pmw:.2f} per million words)")
-        print(f"\t{subreddit2}: {n_kinship_subreddit2} kinship terms of {TOTAL_WORDS[subreddit2]} total ({kinship_subreddit2_pmw:.2f} per million words)\n")
+        kinship_subreddit1_pmw = (n_kinship_subreddit1 / total_words[subreddit1]) * ONE_MILLION
+        kinship_subreddit2_pmw = (n_kinship_subreddit2 / total_words[subreddit2]) * ONE_MILLION
+        print(f"\t{subreddit1}: {n_kinship_subreddit1} kinship terms of {total_words[subreddit1]} total ({kinship_subreddit1_pmw:.2f} per million words)")
+        print(f"\t{subreddit2}: {n_kinship_subreddit2} kinship terms of {total_words[subreddit2]} total ({kinship_subreddit2_pmw:.2f} per million words)\n")
 
 
+if __name__ == "__main__":
+    total_words = load_total_words()
 
-### Tests for AskReddit vs. AskScience ###
-run_test("askreddit", "askscience", kinship_groups=["child"])
-run_test("askreddit", "askscience", kinship_groups=["parent"])
-run_test("askreddit", "askscience", kinship_groups=["partner"])
-run_test("askreddit", "askscience", kinship_groups=["sibling"])
+    ### Tests for AskReddit vs. AskScience ###
+    run_test("askreddit", "askscience", kinship_groups=["child"], total_words=total_words)
+    run_test("askreddit", "askscience", kinship_groups=["parent"], total_words=total_words)
+    run_test("askreddit", "askscience", kinship_groups=["partner"], total_words=total_words)
+    run_test("askreddit", "askscience", kinship_groups=["sibling"], total_words=total_words)
 
-### Test for parenting vs entitledparents ###
-run_test("parenting", "entitledparents", kinship_groups=["child"])
-run_test("parenting", "entitledparents", kinship_groups=["parent"])
+    ### Test for parenting vs entitledparents ###
+    run_test("parenting", "entitledparents", kinship_groups=["child"], total_words=total_words)
+    run_test("parenting", "entitledparents", kinship_groups=["parent"], total_words=total_words)
 
 
 # askreddit vs. askscience for kinship_groups=['child']
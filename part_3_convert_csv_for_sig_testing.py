@@ -3,6 +3,7 @@ import pandas as pd
 import os
 from scipy.stats import entropy
 from part_2_barplots import create_groups
+from mention_store import load_kinship_terms
 
 
 SIGNIFICANCE_TESTING_DATA_DIR = "data/p_gendered_feminine_regression"
@@ -12,6 +13,9 @@ SUBREDDIT_PAIR_TO_CONTRAST = {
     ("parenting", "entitledparents"): "parenting"
 }
 
+# The columns of the extracted kinship terms used for significance testing (the comment bodies aren't needed)
+SIG_TEST_COLUMNS = ['id', 'index', 'kinship_term', 'subreddit']
+
 
 def create_df_from_subreddits(subreddit_files: list[str], p_gendered_feminine_files: list[str]):
     """Attach the values in subreddit_files to a pandas dataframe."""
@@ -19,7 +23,7 @@ def create_df_from_subreddits(subreddit_files: list[str], p_gendered_feminine_fi
     # Load the examples
     df = pd.DataFrame()
     for subreddit_file in subreddit_files:
-        dataframe = pd.read_csv(subreddit_file)
+        dataframe = load_kinship_terms(subreddit_file, SIG_TEST_COLUMNS)
 
         # Reset the index so they don't conflict
         dataframe.reset_index(drop=True, inplace=True)
@@ -2,6 +2,7 @@ from __future__ import annotations
 import pandas as pd
 import os
 from part_1_barplots import create_groups
+from mention_store import load_kinship_terms
 
 
 SIGNIFICANCE_TESTING_DATA_DIR = "data/referential_pragmatic_regression"
@@ -12,14 +13,17 @@ SUBREDDIT_PAIR_TO_CONTRAST = {
     ("parenting", "entitledparents"): "parenting"
 }
 
+# The columns of the extracted kinship terms used for significance testing (the comment bodies aren't needed)
+SIG_TEST_COLUMNS = ['kinship_term', 'specific', 'singular', 'subreddit']
 
-def create_df_from_subreddits(subreddit_files: list[str], kin_terms: set):
+
+def create_df_from_subreddits(subreddit_files: list[str], kin_terms: set, columns: list[str] = None):
     """Attach the values in subreddit_files to a pandas dataframe.
-    Dataframe will only contain rows whose kinship term is in kin_terms.
+    Dataframe will only contain rows whose kinship term is in kin_terms, and only columns (by default, all of them).
     """
     df = pd.DataFrame()
     for subreddit_file in subreddit_files:
-        dataframe = pd.read_csv(subreddit_file)
+        dataframe = load_kinship_terms(subreddit_file, columns)
 
         if "lgbt_baseline" in subreddit_file:
             dataframe["subreddit"] = "lgbt_baseline"
@@ -70,7 +74,7 @@ def convert_generic_subreddit_pair(subreddits, groups, gender_neutral):
     for subreddit in subreddits:
         subreddit_files.append(f'data/kinship_terms_csv/{subreddit}.comment.kinship_terms.csv')
 
-    df = create_df_from_subreddits(subreddit_files, kin_terms)
+    df = create_df_from_subreddits(subreddit_files, kin_terms, SIG_TEST_COLUMNS)
     df = convert_df_to_ints(df, gender_neutral, conversion_dict)
     path_name = '_'.join(subreddits)
     
@@ -1,10 +1,17 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import heapq
 import json
+import random
+import shutil
 import sys
+import threading
 import time
 import requests
 import os
 import csv
+from comment_index import CommentIdIndex
+from jsonl_io import compressed_filename, is_compressed, last_line_end, open_jsonl, reversed_lines
 
 
 # This script can be used to scrape words/phrases (in QUERY) from
@@ -28,6 +35,17 @@ MAX_RETRIEVED_ELEMENTS = 100
 # takes up less disk space.
 FIELDS = ["body", "author", "subreddit", "created_utc", "id"]
 
+# Failed requests are retried after a random wait of up to
+# min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt) seconds (or as long as a 429
+# response's Retry-After header asks, if that is longer). A page that still
+# fails after MAX_RETRIES retries stops the scrape with an error.
+BACKOFF_BASE = 1
+BACKOFF_CAP = 60
+MAX_RETRIES = 10
+
+# Seconds to wait for the API to answer before treating a request as failed.
+REQUEST_TIMEOUT = 60
+
 
 ########### These are the fields you likely want to change ###########
 
@@ -47,39 +65,274 @@ SUBREDDITS = ["AskReddit", "askscience", "Parenting", "entitledparents"]
 # When MAX_POSTS is None, all comments from a subreddit are scraped.
 MAX_POSTS = 100000
 
+# When True, an existing output file is continued from its oldest comment instead
+# of raising an error, e.g. after a crash or an interrupted run.
+RESUME = False
+
+# How much of an output file is read at a time when counting the comments already in it.
+COUNT_BLOCK_SIZE = 2 ** 20
+
+# The number of time windows a subreddit is split into by retrieve_reddit_data_sharded.
+# Each window is scraped by its own worker.
+N_WINDOWS = 8
+
+# Subreddits that are scraped with retrieve_reddit_data_sharded instead (one at a time,
+# since each already uses N_WINDOWS workers).
+SHARDED_SUBREDDITS = []
+
+# The earliest date scraped by retrieve_reddit_data_sharded (the day reddit started).
+START_DATE = int((datetime(2005, 6, 23) - datetime(1970, 1, 1)).total_seconds())
+
+# How to compress the output files: None (plain json lines), 'gzip' (.json.gz)
+# or 'zstd' (.json.zst). Compressed files are several times smaller, and
+# extract_kinship_terms.py and collect_data.py read them the same way.
+COMPRESSION = None
+
+# When True, the ids of all comments written for a subreddit are kept in
+# OUTPUT_DIR/<subreddit>.comment_ids, and comments whose id is already there
+# (from an earlier run, a resumed run or a dump import) are not written again.
+# Delete that file together with the json file if you want to scrape again
+# from scratch.
+USE_ID_INDEX = False
+
+# The number of subreddits to scrape at the same time. When this is 1, the
+# subreddits are scraped one after another.
+N_WORKERS = 4
+
+# The number of requests per second allowed across all workers. All workers
+# share one rate limiter, so adding workers doesn't add load on the API.
+REQUESTS_PER_SECOND = 1
+
+
+class RateLimiter:
+    """A token bucket shared by every thread that queries the API.
+
+    Tokens are added at rate per second, up to burst. Each request takes one token.
+    When the API answers with a 429, backoff() empties the bucket and pauses every
+    thread (not just the one that got the 429) until the wait is over.
+    """
+
+    def __init__(self, rate=REQUESTS_PER_SECOND, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request is allowed. Returns the number of seconds waited."""
+        start = time.monotonic()
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                else:
+                    self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return now - start
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def backoff(self, seconds):
+        """Pause all requests for the given number of seconds."""
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+            self.updated = self.blocked_until
+            self.tokens = 0
+
+
+def get_retry_after(response):
+    """Return how many seconds a 429 response asks us to wait, or 0 if it doesn't say."""
+    try:
+        return float(response.headers['Retry-After'])
+    except (KeyError, TypeError, ValueError):
+        return 0
+
+
+def backoff_delay(attempt, base=None, cap=None):
+    """Seconds to wait before retry number attempt + 1: capped exponential backoff with full jitter,
+    so that workers that failed at the same time don't all retry at the same time. base and cap
+    default to BACKOFF_BASE and BACKOFF_CAP.
+    """
+    base = BACKOFF_BASE if base is None else base
+    cap = BACKOFF_CAP if cap is None else cap
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class ScrapeStats:
+    """Counters for one scraping run, shared (and safe to update) across threads.
+
+    requests and bytes count every response received, retries counts failed attempts,
+    sleep_seconds is time spent backing off after failures, and throttle_seconds is time
+    spent waiting for the rate limiter. latencies holds the duration of every request.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.bytes = 0
+        self.retries = 0
+        self.sleep_seconds = 0.0
+        self.throttle_seconds = 0.0
+        self.latencies = []
+        self.lock = threading.Lock()
+
+    def add(self, requests=0, bytes=0, retries=0, sleep_seconds=0.0, throttle_seconds=0.0, latency=None):
+        with self.lock:
+            self.requests += requests
+            self.bytes += bytes
+            self.retries += retries
+            self.sleep_seconds += sleep_seconds
+            self.throttle_seconds += throttle_seconds
+            if latency is not None:
+                self.latencies.append(latency)
+
+    def __str__(self):
+        return (f'{self.requests} requests, {self.bytes / 1e6:.1f} MB, {self.retries} retries, '
+                f'{self.sleep_seconds:.1f}s backing off, {self.throttle_seconds:.1f}s rate limited')
+
+
+def make_session(pool_size=N_WORKERS):
+    """Return a requests.Session that keeps up to pool_size connections open, so that
+    consecutive requests (from up to pool_size threads) reuse connections instead of
+    opening a new one (and doing a new TLS handshake) every time.
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def fetch_page(session, query, rate_limiter=None, stats=None, max_retries=MAX_RETRIES):
+    """Return the json response to query, retrying with backoff_delay on exceptions, bad
+    responses and 429s. Raises a RuntimeError if the page still fails after max_retries retries.
+    """
+    if stats is None:
+        stats = ScrapeStats()
+
+    for attempt in range(max_retries + 1):
+        if rate_limiter is not None:
+            stats.add(throttle_seconds=rate_limiter.acquire())
+        start = time.perf_counter()
+        try:
+            r = session.get(query, timeout=REQUEST_TIMEOUT)
+            stats.add(requests=1, bytes=len(r.content), latency=time.perf_counter() - start)
+            if r.status_code == 200:
+                return r.json()
+            print('bad response code:', r.status_code)
+        except (requests.RequestException, ValueError) as e:
+            # ValueError: the response wasn't valid json
+            print('exception thrown...' + str(e))
+            r = None
+
+        if attempt == max_retries:
+            break
+        delay = backoff_delay(attempt)
+        if r is not None and r.status_code == 429:
+            delay = max(delay, get_retry_after(r))
+            if rate_limiter is not None:
+                # everyone sharing the rate limiter waits, not just this thread
+                rate_limiter.backoff(delay)
+        stats.add(retries=1, sleep_seconds=delay)
+        time.sleep(delay)
+
+    raise RuntimeError(f'Request failed after {max_retries} retries: {query}')
+
 
 def retrieve_reddit_data(
         sub,
         output_dir=OUTPUT_DIR,
         fields=FIELDS,
-        max_posts=MAX_POSTS):
-    output_filename = output_dir + '/' + sub + '.comment.kinship_terms.json'
+        max_posts=MAX_POSTS,
+        endpoint=PUSHSHIFT_ENDPOINT,
+        terms_file=TERMS_FILE,
+        rate_limiter=None,
+        resume=RESUME,
+        after=None,
+        before=None,
+        output_filename=None,
+        session=None,
+        stats=None,
+        compression=COMPRESSION,
+        use_id_index=USE_ID_INDEX):
+    """Scrape comments containing the terms in terms_file from sub, and write them to
+    output_dir/<sub>.comment.kinship_terms.json (one json object per line, compressed if
+    compression is 'gzip' or 'zstd'), or to output_filename if it is given.
+
+    Only comments created after `after` and before `before` (both timestamps, both exclusive)
+    are scraped; by default that is everything up to now.
+
+    When rate_limiter is given, every request waits for it first, and 429 responses pause
+    everyone using it. When resume is True and the output file already exists, scraping
+    continues from the oldest comment in it and new comments are appended; comments whose
+    id is already in the file are skipped; a file that already has max_posts comments is left
+    as it is, without any requests. Returns the number of comments in the file.
+
+    Requests go through session (a new pooled session when None) and are counted in stats
+    (a ScrapeStats, printed at the end when this call created it). When use_id_index is True,
+    comments already in output_dir/<sub>.comment_ids are skipped too (see USE_ID_INDEX).
+    """
+    print_stats = stats is None
+    if session is None:
+        session = make_session()
+    if stats is None:
+        stats = ScrapeStats()
+
+    if output_filename is None:
+        output_filename = compressed_filename(output_dir + '/' + sub + '.comment.kinship_terms.json', compression)
+
+    if before is None:
+        today = datetime.utcnow()
+        before_date = int((today - datetime(1970, 1, 1)).total_seconds())
+    else:
+        before_date = before
+
+    seen_ids = set()
+    previous_count = 0  # number of comments from earlier runs
+    mode = 'w'
     if os.path.exists(output_filename):
-        # This prevents accidentally over-writing existing files.
-        raise ValueError('Output filename already exists: ' + output_filename)
-
-    today = datetime.utcnow()
-    before_date = int((today - datetime(1970, 1, 1)).total_seconds())
+        if not resume:
+            # This prevents accidentally over-writing existing files.
+            raise ValueError('Output filename already exists: ' + output_filename)
+        previous_count, seen_ids, oldest_date = read_resume_point(output_filename)
+        if max_posts is not None and previous_count >= max_posts:
+            print(sub + ': already has ' + str(previous_count) + ' comments')
+            return previous_count
+        if oldest_date is not None:
+            # Comments are scraped newest first, so we continue from the oldest one we have.
+            # The +1 re-requests the rest of that second in case the crash happened partway
+            # through it; the ones we already have are skipped using seen_ids.
+            before_date = oldest_date + 1
+        mode = 'a'
+        print(sub + ': resuming from ' + str(previous_count) + ' comments')
+
+    id_index = CommentIdIndex(id_index_filename(output_dir, sub)) if use_id_index else None
 
     fields = ",".join(fields)
 
-    terms = construct_query()
+    terms = construct_query(terms_file)
 
-    count = 0   # number of comments looked at
+    count = previous_count  # number of comments looked at
     done = False
     total_results_count = None  # total number of comments that can be scraped from this subreddit
 
-    with open(output_filename, 'w') as fout:
+    with open_jsonl(output_filename, mode) as fout:
 
         while not done:
 
-            query = PUSHSHIFT_ENDPOINT + \
+            query = endpoint + \
                 '?sort=desc' + \
                 '&subreddit=' + sub + \
                 '&size=' + str(MAX_RETRIEVED_ELEMENTS) + \
                 '&before=' + str(before_date) + \
                 '&fields=' + str(fields) + \
                 '&q=' + terms
+            if after is not None:
+                query += '&after=' + str(after)
 
             # We set metadata=true for the first query, so we know the
             # total number of results we could scrape. In later queries we don't
@@ -88,22 +341,7 @@ def retrieve_reddit_data(
                 query += "&metadata=true"
 
             sys.stdout.flush()
-            try:
-                r = requests.get(query)
-            except Exception as e:
-                print('exception thrown...' + str(e))
-                time.sleep(5)
-                continue
-
-            if r.status_code != 200:
-                print('bad response code:', r.status_code)
-                if r.status_code == 429:
-                    time.sleep(5)
-                    continue
-                continue  # retry
-
-            # record a submission/comment only if it's not empty
-            json_output = r.json()
+            json_output = fetch_page(session, query, rate_limiter, stats)
 
             # check size of results of query
             returned_size = len(json_output['data'])
@@ -112,15 +350,21 @@ def retrieve_reddit_data(
                 if 'created_utc' in element.keys():
                     before_date = element['created_utc']
 
+                if 'id' in element:
+                    if element['id'] in seen_ids or (id_index is not None and element['id'] in id_index):
+                        continue
+                    seen_ids.add(element['id'])
+
                 # write comments regardless of whether it is valid or not
                 count += 1
-                json.dump(element, fout)
-                fout.write('\n')
+                fout.write(json.dumps(element) + '\n')
+                if id_index is not None and 'id' in element:
+                    id_index.add(element['id'])
 
             # Use metadata to determine how many results to scrape (only on
             # the first query).
             if total_results_count is None:
-                total_results_count = json_output["metadata"]["total_results"]
+                total_results_count = json_output["metadata"]["total_results"] + previous_count
                 if max_posts is None or max_posts > total_results_count:
                     max_posts = total_results_count
 
@@ -128,19 +372,250 @@ def retrieve_reddit_data(
             if count >= max_posts or returned_size == 0:
                 done = True
 
-            percentage = ((count / max_posts) * 100)
-            print('Processed ' + str(count) + ' of ' + str(max_posts) + ' comments ' +
+            percentage = ((count / max_posts) * 100) if max_posts > 0 else 100.0
+            print(sub + ': processed ' + str(count) + ' of ' + str(max_posts) + ' comments ' +
                   str(percentage) + '%; reached ' + str(datetime.utcfromtimestamp(before_date)))
+
+    if id_index is not None:
+        id_index.close()
+    if print_stats:
+        print(sub + ': ' + str(stats))
+    return count
+
+
+def id_index_filename(output_dir, sub):
+    """Where the ids of the comments written for sub are kept when USE_ID_INDEX is True."""
+    return output_dir + '/' + sub + '.comment_ids'
+
+
+def read_resume_point(filename):
+    """Return the number of comments in filename, the ids of the comments from the oldest second
+    in it and that second's created_utc (None if there are no comments).
+
+    Comments are written newest first, so the oldest ones are at the end: only that tail of the
+    file is parsed. If the last line was only partly written (e.g. the scraper was killed while
+    writing it), it is cut off so that new comments can be appended after it. A file that is
+    oldest first (like the ones from ingest_dumps.py) raises a ValueError instead, since
+    continuing from its end would scrape everything after its newest comment again.
+    """
+    if is_compressed(filename):
+        return read_compressed_resume_point(filename)
+
+    end = last_line_end(filename)
+    ids, oldest_date = set(), None
+    for line in reversed_lines(filename, end):
+        element = json.loads(line)
+        if 'created_utc' not in element:
+            continue
+        if oldest_date is None:
+            oldest_date = element['created_utc']
+        elif element['created_utc'] != oldest_date:
+            break
+        if 'id' in element:
+            ids.add(element['id'])
+
+    with open(filename, 'rb+') as f:
+        first_line = f.readline()
+        if first_line.endswith(b'\n'):
+            check_newest_first(filename, json.loads(first_line).get('created_utc'), oldest_date)
+        if end < f.seek(0, os.SEEK_END):
+            f.truncate(end)
+        f.seek(0)
+        n_comments = sum(block.count(b'\n') for block in iter(lambda: f.read(COUNT_BLOCK_SIZE), b''))
+    return n_comments, ids, oldest_date
+
+
+def read_compressed_resume_point(filename):
+    """read_resume_point for compressed files. These can't be cut off in place, and a damaged
+    end isn't always detected while reading, so the complete lines are always copied to a new
+    file that replaces the old one.
+    """
+    n_comments, ids, newest_date, oldest_date = 0, set(), None, None
+    root, suffix = os.path.splitext(filename)
+    temp_filename = root + '.tmp' + suffix  # keeps the suffix that selects the compression
+    with open_jsonl(temp_filename, 'w') as fout:
+        try:
+            with open_jsonl(filename) as f:
+                for line in f:
+                    if not line.endswith('\n'):
+                        break
+                    element = json.loads(line)
+                    if 'created_utc' in element and element['created_utc'] != oldest_date:
+                        ids, oldest_date = set(), element['created_utc']
+                        if newest_date is None:
+                            newest_date = oldest_date
+                    if 'id' in element:
+                        ids.add(element['id'])
+                    n_comments += 1
+                    fout.write(line)
+        except Exception:
+            # the compressed stream ends early (EOFError from gzip, ZstdError from zstandard)
+            # or the last line was cut off partway (ValueError from json)
+            pass
+    try:
+        check_newest_first(filename, newest_date, oldest_date)
+    except ValueError:
+        os.remove(temp_filename)
+        raise
+    os.replace(temp_filename, filename)
+    return n_comments, ids, oldest_date
+
+
+def check_newest_first(filename, first_date, last_date):
+    """Raise a ValueError if the created_utc of the first comment in filename is older than that
+    of the last one.
+    """
+    if first_date is not None and last_date is not None and first_date < last_date:
+        raise ValueError('Comments in ' + filename + ' are oldest first (e.g. from ingest_dumps.py), '
+                         'so it can\'t be resumed')
+
+
+def retrieve_reddit_data_concurrently(
+        subreddits,
+        n_workers=N_WORKERS,
+        requests_per_second=REQUESTS_PER_SECOND,
+        **kwargs):
+    """Scrape several subreddits at once, each in its own thread and writing its own file.
+
+    All threads share one RateLimiter, so the API sees at most requests_per_second requests
+    no matter how many workers there are, and one pooled session. kwargs are passed on to
+    retrieve_reddit_data. Returns a dictionary mapping each subreddit to the number of
+    comments written.
+    """
+    rate_limiter = RateLimiter(requests_per_second)
+    session = kwargs.pop('session', None) or make_session(n_workers)
+    print_stats = 'stats' not in kwargs
+    stats = kwargs.pop('stats', None) or ScrapeStats()
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        futures = {
+            sub: executor.submit(retrieve_reddit_data, sub, rate_limiter=rate_limiter, session=session,
+                                 stats=stats, **kwargs)
+            for sub in subreddits
+        }
+    if print_stats:
+        print(str(stats))
+    return {sub: future.result() for sub, future in futures.items()}
+
+
+def retrieve_reddit_data_sharded(
+        sub,
+        n_windows=N_WINDOWS,
+        start_date=START_DATE,
+        end_date=None,
+        output_dir=OUTPUT_DIR,
+        max_posts=MAX_POSTS,
+        requests_per_second=REQUESTS_PER_SECOND,
+        compression=COMPRESSION,
+        use_id_index=USE_ID_INDEX,
+        **kwargs):
+    """Scrape one subreddit by splitting [start_date, end_date) into n_windows equal time
+    windows and scraping each window in its own thread, instead of walking back from the
+    newest comment one page at a time.
+
+    Each window gets an equal share of max_posts, and is written to its own file in
+    output_dir/<sub>.comment.kinship_terms.json.shards (windows are resumed from there if
+    the run is interrupted). When all windows are done, they are merged into
+    output_dir/<sub>.comment.kinship_terms.json, newest first like retrieve_reddit_data,
+    without duplicate ids and with at most max_posts comments. Returns the number of comments
+    written.
+
+    Note that windows with fewer comments than their share don't pass the rest of their
+    share on to other windows, so for small subreddits this can return fewer than max_posts
+    comments even if more exist.
+
+    When use_id_index is True, comments already in output_dir/<sub>.comment_ids are left out
+    when the windows are merged.
+
+    Windows are always resumed, so a resume argument is ignored. The merge is written to a
+    temporary file that only replaces output_filename once it's complete, so an interrupted
+    merge is simply redone by the next run.
+    """
+    kwargs.pop('resume', None)
+    output_filename = compressed_filename(output_dir + '/' + sub + '.comment.kinship_terms.json', compression)
+    if os.path.exists(output_filename):
+        # This prevents accidentally over-writing existing files.
+        raise ValueError('Output filename already exists: ' + output_filename)
+
+    if end_date is None:
+        end_date = int((datetime.utcnow() - datetime(1970, 1, 1)).total_seconds())
+    edges = [start_date + (end_date - start_date) * i // n_windows for i in range(n_windows + 1)]
+    window_max_posts = None if max_posts is None else -(-max_posts // n_windows)  # rounded up
+
+    shard_dir = output_filename + '.shards'
+    if not os.path.exists(shard_dir):
+        os.mkdir(shard_dir)
+    shard_files = [compressed_filename(f'{shard_dir}/{i}.json', compression) for i in range(n_windows)]
+
+    rate_limiter = RateLimiter(requests_per_second)
+    session = kwargs.pop('session', None) or make_session(n_windows)
+    print_stats = 'stats' not in kwargs
+    stats = kwargs.pop('stats', None) or ScrapeStats()
+    with ThreadPoolExecutor(max_workers=n_windows) as executor:
+        futures = [
+            # after and before are exclusive, so window i covers [edges[i], edges[i + 1])
+            executor.submit(retrieve_reddit_data, sub, max_posts=window_max_posts, rate_limiter=rate_limiter,
+                            resume=True, after=edges[i] - 1, before=edges[i + 1],
+                            output_filename=shard_files[i], session=session, stats=stats, use_id_index=False,
+                            **kwargs)
+            for i in range(n_windows)
+        ]
+        for future in futures:
+            future.result()
+    if print_stats:
+        print(sub + ': ' + str(stats))
+
+    root, suffix = os.path.splitext(output_filename)
+    temp_filename = root + '.tmp' + suffix  # keeps the suffix that selects the compression
+    if use_id_index:
+        with CommentIdIndex(id_index_filename(output_dir, sub)) as id_index:
+            count = merge_shards(shard_files, temp_filename, max_posts, id_index)
+            os.replace(temp_filename, output_filename)
+            # only now that the merge is in place, so an interrupted one doesn't leave its ids behind
+            with open_jsonl(output_filename) as f:
+                for line in f:
+                    element = json.loads(line)
+                    if 'id' in element:
+                        id_index.add(element['id'])
+    else:
+        count = merge_shards(shard_files, temp_filename, max_posts)
+        os.replace(temp_filename, output_filename)
+    shutil.rmtree(shard_dir)
     return count
 
 
-def construct_query():
+def merge_shards(shard_files, output_filename, max_posts=None, id_index=None):
+    """Merge files written by retrieve_reddit_data (each sorted newest first) into
+    output_filename, newest first, skipping repeated ids (and ids in id_index) and stopping
+    after max_posts comments. Returns the number of comments written.
+    """
+    def read_shard(filename):
+        with open_jsonl(filename) as f:
+            for line in f:
+                element = json.loads(line)
+                yield -element.get('created_utc', 0), element
+
+    seen_ids = set()
+    count = 0
+    with open_jsonl(output_filename, 'w') as fout:
+        for _, element in heapq.merge(*[read_shard(f) for f in shard_files], key=lambda item: item[0]):
+            if max_posts is not None and count >= max_posts:
+                break
+            if 'id' in element:
+                if element['id'] in seen_ids or (id_index is not None and element['id'] in id_index):
+                    continue
+                seen_ids.add(element['id'])
+            count += 1
+            fout.write(json.dumps(element) + '\n')
+    return count
+
+
+def construct_query(terms_file=TERMS_FILE):
     """These are the search terms we want to look for. We can look for multiple
     search terms by joining them with "|" (e.g., "dog|cat" would search for all
     usages of "dog" or "cat"). To scrape both singular and plural, you may need
     to list both forms (e.g., "dog|dogs").
     """
-    terms_file = open(TERMS_FILE, 'r')
+    terms_file = open(terms_file, 'r')
     reader = csv.DictReader(terms_file)
     terms = ''
     for row in reader:
@@ -157,5 +632,12 @@ if __name__ == "__main__":
     if not os.path.exists(OUTPUT_DIR):
         os.mkdir(OUTPUT_DIR)
 
-    for subreddit in SUBREDDITS:
-        retrieve_reddit_data(subreddit)
+    for subreddit in SHARDED_SUBREDDITS:
+        retrieve_reddit_data_sharded(subreddit)
+
+    subreddits = [subreddit for subreddit in SUBREDDITS if subreddit not in SHARDED_SUBREDDITS]
+    if N_WORKERS > 1:
+        retrieve_reddit_data_concurrently(subreddits)
+    else:
+        for subreddit in subreddits:
+            retrieve_reddit_data(subreddit)
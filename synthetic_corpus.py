@@ -0,0 +1,135 @@
+"""Writes a reproducible synthetic corpus of Reddit comments, in the json format scrape_data.py writes (one comment
+per line with the fields in scrape_data.FIELDS), for benchmarking extract_kinship_terms.py and collect_data.py.
+
+Unlike the fixed sentences in mock_pushshift.py, comments are made of random sentences of filler words:
+    - the number of words in a comment is log-normal, like the lengths of real comments (most are a sentence or two,
+      a few are several paragraphs);
+    - each sentence has a kinship term from terms.csv with probability term_density, after one of the determiners
+      extract_kinship_terms.py looks for (or none), sometimes capitalized or followed by punctuation;
+    - a fraction of comments are from bots or deleted authors, or have removed bodies, so they are filtered out.
+The same arguments always give the same comments.
+
+Example:
+    python synthetic_corpus.py data/synthetic/Parenting_comment.json --n-comments 100000 --term-density 0.2
+"""
+
+import argparse
+import csv
+import json
+import math
+import random
+
+from extract_kinship_terms import GENERIC_DETERMINERS, MIXED_DETERMINERS, SPECIFIC_DETERMINERS, TERMS_FILE
+from jsonl_io import open_jsonl
+
+NEWEST_DATE = 1672531200  # 2023-01-01
+
+# The median number of words in a comment, and the sigma of the log-normal distribution of the number of words.
+MEDIAN_WORDS = 25
+WORDS_SIGMA = 1.0
+MAX_WORDS = 2000
+SENTENCE_WORDS = (4, 18)
+
+FILLER_WORDS = ['the', 'a', 'and', 'to', 'of', 'I', 'it', 'that', 'is', 'was', 'for', 'this', 'with', 'but', 'not',
+                'think', 'really', 'just', 'like', 'know', 'would', 'people', 'time', 'thing', 'question', 'school',
+                'work', 'day', 'year', 'house', 'said', 'asked', 'went', 'told', 'always', 'never', 'about', 'because',
+                'great', 'source', 'answer', 'reason', 'person', 'other', 'something', 'anyone', 'honestly', 'pretty']
+PUNCTUATION = ['.', '.', '.', '!', '?', ',']
+DETERMINERS = sorted(SPECIFIC_DETERMINERS | MIXED_DETERMINERS | GENERIC_DETERMINERS) + [''] * 4
+
+AUTHORS = ['throwaway123', 'parent_of_three', 'curious_cat', 'quiet_reader', 'Grandpa_Joe', 'night_owl']
+BOT_AUTHORS = ['helpful_bot', 'AutoModerator', 'RemindMeBot']
+DELETED_AUTHOR = '[deleted]'
+REMOVED_BODIES = ['[removed]', '[deleted]']
+
+
+def read_terms(terms_file=TERMS_FILE):
+    with open(terms_file, encoding='utf-8') as f:
+        return [row['term'].strip() for row in csv.DictReader(f)]
+
+
+def make_sentence(rng, terms, term_density):
+    words = [rng.choice(FILLER_WORDS) for _ in range(rng.randint(*SENTENCE_WORDS))]
+    if rng.random() < term_density:
+        term = rng.choice(terms)
+        if rng.random() < 0.1:
+            term = term.capitalize()
+        determiner = rng.choice(DETERMINERS)
+        if determiner == "'s":
+            phrase = rng.choice(AUTHORS) + "'s " + term
+        else:
+            phrase = (determiner + ' ' + term).strip()
+        if rng.random() < 0.2:
+            phrase += rng.choice(PUNCTUATION)
+        words.insert(rng.randint(0, len(words)), phrase)
+    words[0] = words[0].capitalize()
+    return ' '.join(words) + rng.choice(PUNCTUATION[:4])
+
+
+def make_body(rng, terms, term_density):
+    n_words = min(MAX_WORDS, max(1, round(rng.lognormvariate(math.log(MEDIAN_WORDS), WORDS_SIGMA))))
+    sentences = []
+    while n_words > 0:
+        sentence = make_sentence(rng, terms, term_density)
+        sentences.append(sentence)
+        n_words -= sentence.count(' ') + 1
+    return ' '.join(sentences)
+
+
+def make_corpus(n_comments, subreddit='Parenting', term_density=0.2, bot_rate=0.03, deleted_rate=0.05,
+                removed_rate=0.05, terms_file=TERMS_FILE, seed=0):
+    """Yield n_comments synthetic comments for subreddit, newest first. term_density is the probability that a
+    sentence has a kinship term, and bot_rate, deleted_rate and removed_rate the fractions of comments from bots,
+    from deleted authors and with removed bodies.
+    """
+    rng = random.Random(f'{seed}-{subreddit}')
+    terms = read_terms(terms_file)
+    created_utc = NEWEST_DATE
+    for i in range(n_comments):
+        roll = rng.random()
+        if roll < bot_rate:
+            author = rng.choice(BOT_AUTHORS)
+        elif roll < bot_rate + deleted_rate:
+            author = DELETED_AUTHOR
+        else:
+            author = rng.choice(AUTHORS)
+        if rng.random() < removed_rate:
+            body = rng.choice(REMOVED_BODIES)
+        else:
+            body = make_body(rng, terms, term_density)
+        yield {'body': body, 'author': author, 'subreddit': subreddit, 'created_utc': created_utc,
+               'id': format(i + 36 ** 5, 'x')}
+        created_utc -= rng.randint(0, 30)
+
+
+def write_corpus(file, n_comments, **kwargs):
+    """Write the comments from make_corpus (with the keyword arguments kwargs) to file, one json object per line.
+    file can be gzip (.json.gz) or zstd (.json.zst) compressed. Returns the number of bytes of json written.
+    """
+    n_bytes = 0
+    with open_jsonl(file, 'w') as f:
+        for comment in make_corpus(n_comments, **kwargs):
+            line = json.dumps(comment) + '\n'
+            n_bytes += len(line.encode('utf-8'))
+            f.write(line)
+    return n_bytes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('file')
+    parser.add_argument('--n-comments', type=int, default=100000)
+    parser.add_argument('--subreddit', default='Parenting')
+    parser.add_argument('--term-density', type=float, default=0.2,
+                        help='the probability that a sentence has a kinship term')
+    parser.add_argument('--bot-rate', type=float, default=0.03)
+    parser.add_argument('--deleted-rate', type=float, default=0.05)
+    parser.add_argument('--removed-rate', type=float, default=0.05)
+    parser.add_argument('--terms-file', default=TERMS_FILE)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    n_bytes = write_corpus(args.file, args.n_comments, subreddit=args.subreddit, term_density=args.term_density,
+                           bot_rate=args.bot_rate, deleted_rate=args.deleted_rate, removed_rate=args.removed_rate,
+                           terms_file=args.terms_file, seed=args.seed)
+    print(f'Wrote {args.n_comments} comments ({n_bytes / 1e6:.1f} MB) to {args.file}')
@@ -0,0 +1,54 @@
+import pytest
+from body_dedup import PREFIX_LENGTH, BodyBloomFilter, BodyHashSet, body_hash, make_body_set
+
+
+# To run these tests from the commandline, navigate to the directory
+# this file is stored in, and run the command "pytest".
+
+
+def test_body_hash():
+    assert body_hash('my mom') == body_hash('my mom')
+    assert 0 <= body_hash('my mom') < 2 ** 64
+    assert body_hash('my mom') != body_hash('my dad')
+    assert body_hash('x' * PREFIX_LENGTH + 'a') == body_hash('x' * PREFIX_LENGTH + 'b')
+    assert body_hash('My  mom\n') != body_hash('my mom')
+    assert body_hash('My  mom\n', normalize=True) == body_hash('my mom', normalize=True)
+
+
+@pytest.mark.parametrize('body_set', [BodyHashSet(), BodyBloomFilter(1000, 1e-3)])
+def test_body_set(body_set):
+    assert body_set.add('my mom')
+    assert not body_set.add('my mom')
+    assert body_set.add('my dad')
+    assert 'my dad' in body_set
+    assert 'my sister' not in body_set
+    assert len(body_set) == 2
+    stats = body_set.stats()
+    assert (stats['added'], stats['repeated']) == (2, 1)
+    assert stats['memory_bytes'] > 0
+    assert 0 < stats['false_positive_rate'] < 1e-3
+
+
+def test_bloom_filter_false_positive_rate():
+    bloom = BodyBloomFilter(10000, 0.01)
+    assert bloom.memory_bytes() < 10000 * 10 / 8 + 8  # about 9.6 bits per body
+    new = sum(bloom.add(f'body {i}') for i in range(10000))
+    assert new > 10000 * 0.99
+    false_positives = sum(f'other body {i}' in bloom for i in range(10000))
+    assert false_positives < 10000 * 0.02
+    assert 0.005 < bloom.false_positive_rate() < 0.02
+    assert bloom.n_set == sum(bin(byte).count('1') for byte in bloom.bits)
+
+
+def test_make_body_set():
+    assert isinstance(make_body_set('hash'), BodyHashSet)
+    bloom = make_body_set('bloom', capacity=100, error_rate=0.1, normalize=True)
+    assert isinstance(bloom, BodyBloomFilter) and bloom.normalize
+    with pytest.raises(ValueError):
+        make_body_set('prefix')
+    with pytest.raises(ValueError):
+        make_body_set('bloom', error_rate=0)
+
+
+if __name__ == '__main__':
+    pytest.main(['test_body_dedup.py', '-v'])
@@ -0,0 +1,45 @@
+import sys
+
+import calculate_p_gendered_feminine
+import pandas as pd
+import pytest
+
+
+# To run these tests from the commandline, navigate to the directory
+# this file is stored in, and run the command "pytest".
+
+
+FIELDNAMES = ['subreddit', 'kinship_term', 'id', 'index', 'group_term_prob']
+
+
+def test_import_does_not_load_model():
+    assert 'transformers' not in sys.modules
+    assert 'torch' not in sys.modules
+    assert calculate_p_gendered_feminine.get_model.cache_info().currsize == 0
+
+
+def test_mask_body():
+    row = {'body': 'I asked my mom about it', 'kinship_term': 'mom', 'index': 11}
+    assert calculate_p_gendered_feminine.mask_body(row) == 'I asked my [MASK] about it'
+
+
+def test_get_plural_dict():
+    plural_dict, full_groups = calculate_p_gendered_feminine.get_plural_dict('../terms.csv')
+    assert plural_dict['mom'] == 'moms'
+    assert plural_dict['s/o'] == 's/o'
+    assert {'mom', 'moms'} <= full_groups['parent']
+
+
+def test_convert_csv_to_plot_points(tmp_path):
+    output_file = str(tmp_path / 'output.csv')
+    calculate_p_gendered_feminine.convert_csv_to_plot_points(
+        'test_convert_csv_to_plot_points_input.csv', gender_neutral={'kid', 'child'}, masculine={'son'},
+        kinship_set={'kid', 'child', 'daughter', 'son'}, fieldnames=FIELDNAMES, output_file=output_file)
+    actual = pd.read_csv(output_file)
+    expected = pd.read_csv('test_convert_csv_to_plot_points_output.csv')
+    assert list(actual.columns) == ['subreddit', 'id', 'index', 'p_gendered', 'p_feminine']
+    pd.testing.assert_frame_equal(actual[list(expected.columns)], expected, check_dtype=False)
+
+
+if __name__ == '__main__':
+    pytest.main(['test_calculate_p_gendered_feminine.py', '-v'])
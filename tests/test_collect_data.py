@@ -0,0 +1,131 @@
+import json
+import os
+from collections import Counter
+
+import body_dedup
+import collect_data
+import extract_kinship_terms
+import pandas as pd
+import pytest
+import synthetic_corpus
+
+
+# To run these tests from the commandline, navigate to the directory
+# this file is stored in, and run the command "pytest".
+
+
+def test_unique_valid_bodies(tmp_path):
+    comments = [{"body": "my mom", "author": "someone", "subreddit": "test"},
+                {"body": "ask the bot", "author": "helper_bot", "subreddit": "test"},
+                {"body": "[removed]", "author": "someone", "subreddit": "test"},
+                {"body": "my mom", "author": "someone_else", "subreddit": "test"},
+                {"body": "my dad", "author": "someone", "subreddit": "test"}]
+    file = str(tmp_path / 'test_comment.json')
+    with open(file, 'w') as f:
+        f.write(''.join(json.dumps(c) + '\n' for c in comments))
+    bodies = collect_data.unique_valid_bodies(extract_kinship_terms.read_comments(file))
+    assert next(bodies) == 'my mom'
+    assert list(bodies) == ['my dad']
+
+
+def test_count_frequencies(tmp_path):
+    bodies = [c['body'] + ' my significant other, significant others' for c in
+              synthetic_corpus.make_corpus(300, removed_rate=0.0, terms_file='../terms.csv')]
+    # the counts before FrequencyCounter: every bigram, and the total summed after every comment
+    uni, bi = Counter(), Counter()
+    for txt in bodies:
+        txt_tok = txt.split()
+        uni.update(txt_tok)
+        bi.update([(txt_tok[i], txt_tok[i + 1]) for i in range(len(txt_tok) - 1)])
+        if sum(uni.values()) >= 5000:
+            break
+
+    counter = collect_data.FrequencyCounter('../terms.csv')
+    collect_data.count_frequencies(bodies, counter, tokenize=str.split, max_words=5000)
+    assert counter.uni == uni
+    assert counter.total == sum(uni.values())
+    assert counter.bi == Counter({key: n for key, n in bi.items() if key[0] == 'significant'})
+    assert counter.bi[('significant', 'other,')] > 0
+
+    expected, actual = str(tmp_path / 'expected'), str(tmp_path / 'actual')
+    collect_data.write_frequency(uni, bi, expected, terms_file='../terms.csv')
+    collect_data.write_frequency(counter.uni, counter.bi, actual, counter.total, terms_file='../terms.csv')
+    with open(expected + '_frequencies.csv') as f, open(actual + '_frequencies.csv') as g:
+        assert f.read() == g.read()
+
+
+@pytest.mark.parametrize('max_words', [5000, 10 ** 6])
+def test_count_frequencies_processes(max_words):
+    bodies = [c['body'] for c in synthetic_corpus.make_corpus(300, removed_rate=0.0, terms_file='../terms.csv')]
+    counter = collect_data.FrequencyCounter('../terms.csv')
+    collect_data.count_frequencies(bodies, counter, tokenize=str.split, max_words=max_words)
+    parallel = collect_data.FrequencyCounter('../terms.csv')
+    collect_data.count_frequencies_parallel(iter(bodies), parallel, str.split, max_words, 'test', n_processes=2,
+                                            chunk_size=7)
+    assert (parallel.uni, parallel.bi, parallel.total) == (counter.uni, counter.bi, counter.total)
+    if max_words == 5000:
+        assert counter.total >= max_words  # stopped in the middle of a chunk
+    else:
+        assert counter.total == sum(len(txt.split()) for txt in bodies)
+
+
+@pytest.mark.parametrize('max_words', [5000, 10 ** 6])
+def test_count_frequencies_processes_dedup_stats(max_words):
+    comments = list(synthetic_corpus.make_corpus(300, removed_rate=0.0, terms_file='../terms.csv'))
+    comments = [c for i, c in enumerate(comments) for _ in range(1 + i % 3)]  # with repeated bodies
+    seen = body_dedup.make_body_set('hash')
+    counter = collect_data.FrequencyCounter('../terms.csv')
+    collect_data.count_frequencies(collect_data.unique_valid_bodies(comments, seen), counter, str.split, max_words)
+    parallel_seen = body_dedup.make_body_set('hash')
+    parallel = collect_data.FrequencyCounter('../terms.csv')
+    collect_data.count_frequencies_parallel(collect_data.unique_valid_bodies(comments, parallel_seen), parallel,
+                                            str.split, max_words, 'test', n_processes=2, chunk_size=7,
+                                            seen=parallel_seen)
+    assert parallel.total == counter.total
+    assert (parallel_seen.added, parallel_seen.repeated) == (seen.added, seen.repeated)
+    assert seen.repeated > 0
+
+
+def test_collect_frequencies(tmp_path):
+    comments_file = str(tmp_path / '%s_comment.json')
+    for sub in ['parenting', 'askscience']:
+        synthetic_corpus.write_corpus(comments_file % sub, 200, subreddit=sub, terms_file='../terms.csv')
+    output_dir = str(tmp_path / 'frequencies')
+    kwargs = dict(comments_file=comments_file, output_dir=output_dir, terms_file='../terms.csv', tokenizer='fast')
+
+    manifest = collect_data.collect_frequencies(['parenting', 'askscience'], max_words=2000, **kwargs)
+    entry = manifest['subreddits']['parenting']
+    assert 2000 <= entry['total_words'] < 2500
+    assert entry['unique_bodies'] > 0 and entry['repeated_bodies'] >= 0
+    assert entry['seconds'] > 0
+    frequencies = pd.read_csv(entry['frequencies_file'], index_col=0)
+    assert frequencies['frequency'].sum() > 0
+    assert collect_data.read_total_words(output_dir) == {sub: e['total_words'] for sub, e in
+                                                         manifest['subreddits'].items()}
+
+    # unchanged inputs are skipped; a new word budget is counted again
+    modified = os.path.getmtime(entry['frequencies_file'])
+    assert collect_data.collect_frequencies(['parenting', 'askscience'], max_words=2000, **kwargs) == manifest
+    assert os.path.getmtime(entry['frequencies_file']) == modified
+    manifest = collect_data.collect_frequencies(['parenting'], max_words=10 ** 6, **kwargs)
+    assert manifest['subreddits']['parenting']['total_words'] > entry['total_words']
+    assert manifest['subreddits']['askscience']['max_words'] == 2000
+    with pytest.raises(ValueError):
+        collect_data.collect_frequencies(['parenting'], tokenizer='spaces', comments_file=comments_file,
+                                         output_dir=output_dir)
+
+
+def test_inputs_hash(tmp_path, monkeypatch):
+    comments_file = str(tmp_path / 'parenting_comment.json')
+    synthetic_corpus.write_corpus(comments_file, 10, terms_file='../terms.csv')
+    digest = collect_data.inputs_hash(comments_file, '../terms.csv', 2000, 'fast')
+    assert collect_data.inputs_hash(comments_file, '../terms.csv', 2000, 'fast') == digest
+    assert collect_data.inputs_hash(comments_file, '../terms.csv', 2000, 'nltk') != digest
+    for name, value in [('BODY_DEDUP', 'bloom'), ('BLOOM_CAPACITY', 10 ** 6), ('BLOOM_ERROR_RATE', 1e-3)]:
+        with monkeypatch.context() as m:
+            m.setattr(collect_data, name, value)
+            assert collect_data.inputs_hash(comments_file, '../terms.csv', 2000, 'fast') != digest
+
+
+if __name__ == '__main__':
+    pytest.main(['test_collect_data.py', '-v'])
@@ -0,0 +1,68 @@
+import pytest
+import comment_index
+from comment_index import CommentIdIndex, decode_id
+
+
+# To run these tests from the commandline, navigate to the directory
+# this file is stored in, and run the command "pytest".
+
+
+def test_decode_id():
+    assert decode_id('i0bcl06') == int('i0bcl06', 36)
+    assert decode_id('t1_i0bcl06') == decode_id('i0bcl06')
+    assert decode_id('I0BCL06') == decode_id('i0bcl06')
+    with pytest.raises(ValueError):
+        decode_id('zzzzzzzzzzzzzz')
+    with pytest.raises(ValueError):
+        decode_id('not-base-36')
+
+
+def test_comment_id_index():
+    index = CommentIdIndex()
+    assert index.add('abc')
+    assert not index.add('abc')
+    assert 'abc' in index
+    assert 'abd' not in index
+    assert len(index) == 1
+
+
+def test_comment_id_index_bad_ids(capsys):
+    index = CommentIdIndex()
+    for comment_id in ['zzzzzzzzzzzzzz', 'not-base-36', None]:
+        assert index.add(comment_id)
+        assert comment_id not in index
+    assert len(index) == 0
+    assert "can't be indexed" in capsys.readouterr().err
+
+
+def test_comment_id_index_merge(monkeypatch):
+    monkeypatch.setattr(comment_index, 'MIN_MERGE', 3)
+    index = CommentIdIndex()
+    ids = [format(i, 'x') for i in range(0, 1000, 7)] + ['parenting1', 'parenting2', '3w5e11264sgsf', '3w5e11264sgse']
+    assert all(index.add(comment_id) for comment_id in ids)
+    assert len(index.sorted_ids) > len(index.new_ids)
+    assert not any(index.add(comment_id) for comment_id in ids)
+    assert all(comment_id in index for comment_id in ids)
+    assert 'zz' not in index
+    assert len(index) == len(ids)
+
+
+def test_comment_id_index_file(tmp_path):
+    filename = str(tmp_path / 'test.comment_ids')
+    with CommentIdIndex(filename) as index:
+        for comment_id in ['a', 'b', 'c']:
+            index.add(comment_id)
+    with CommentIdIndex(filename) as index:
+        assert 'b' in index
+        assert index.add('d')
+        assert not index.add('a')
+
+    with open(filename, 'ab') as f:
+        f.write(b'\x01\x02\x03')  # an id that was only partly written
+    index = CommentIdIndex(filename)
+    assert len(index) == 4
+    assert (tmp_path / 'test.comment_ids').stat().st_size == 4 * 8
+
+
+if __name__ == '__main__':
+    pytest.main(['test_comment_index.py', '-v'])
@@ -1,16 +1,23 @@
+import csv
+import json
+import random
+
 import extract_kinship_terms
 import pytest
+import regex
+from jsonl_io import open_jsonl
 
 
 # To run these tests from the commandline, navigate to the directory
 # this file is stored in, and run the command "pytest".
 
 terms = extract_kinship_terms.get_terms("../terms.csv")
+matcher = extract_kinship_terms.KinshipMatcher("../terms.csv")
 
 
 def test_extract_from_comment_one_kinship_term_singular_my():
     sentence = "my sister loves that book"
-    actual = extract_kinship_terms.extract_from_comment(sentence, terms)
+    actual = matcher.extract(sentence)
     expected = [{
         "text": sentence,
         "kinship_term": "sister",
@@ -24,7 +31,7 @@ def test_extract_from_comment_one_kinship_term_singular_my():
 
 def test_extract_from_comment_one_kinship_term_singular_not_my():
     sentence = "she's a mom, you know -- she's psychic"
-    actual = extract_kinship_terms.extract_from_comment(sentence, terms)
+    actual = matcher.extract(sentence)
     expected = [{
         "text": sentence,
         "kinship_term": "mom",
@@ -38,7 +45,7 @@ def test_extract_from_comment_one_kinship_term_singular_not_my():
 
 def test_extract_from_comment_one_kinship_term_plural_not_my():
     sentence = "it's important to get along well with your siblings"
-    actual = extract_kinship_terms.extract_from_comment(sentence, terms)
+    actual = matcher.extract(sentence)
     expected = [{
         "text": sentence,
         "kinship_term": "sibling",
@@ -52,7 +59,7 @@ def test_extract_from_comment_one_kinship_term_plural_not_my():
 
 def test_extract_from_comment_one_kinship_term_plural_my():
     sentence = "I never really got along well wtih my siblings"
-    actual = extract_kinship_terms.extract_from_comment(sentence, terms)
+    actual = matcher.extract(sentence)
     expected = [{
         "text": sentence,
         "kinship_term": "sibling",
@@ -66,7 +73,7 @@ def test_extract_from_comment_one_kinship_term_plural_my():
 
 def test_extract_from_comment_nonstandard_plural():
     sentence = "I don't have any children"
-    actual = extract_kinship_terms.extract_from_comment(sentence, terms)
+    actual = matcher.extract(sentence)
     expected = [{
         "text": sentence,
         "kinship_term": "child",
@@ -80,7 +87,7 @@ def test_extract_from_comment_nonstandard_plural():
 
 def test_extract_from_comment_multiple_kinship_terms():
     sentence = "are you close with your mom and dad?"
-    actual = extract_kinship_terms.extract_from_comment(sentence, terms)
+    actual = matcher.extract(sentence)
     expected = [{
         "text": sentence,
         "kinship_term": "mom",
@@ -102,7 +109,7 @@ def test_extract_from_comment_multiple_kinship_terms():
 
 def test_extract_from_comment_same_kinship_term_different_contexts():
     sentence = "are you close with your mom? my mom and i are really close"
-    actual = extract_kinship_terms.extract_from_comment(sentence, terms)
+    actual = matcher.extract(sentence)
     expected = [{
         "text": sentence,
         "kinship_term": "mom",
@@ -124,7 +131,7 @@ def test_extract_from_comment_same_kinship_term_different_contexts():
 
 def test_extract_from_comment_same_kinship_term_same_context():
     sentence = "have you met my brother? my brother loves that book"
-    actual = extract_kinship_terms.extract_from_comment(sentence, terms)
+    actual = matcher.extract(sentence)
     expected = [{
         "text": sentence,
         "kinship_term": "brother",
@@ -154,7 +161,7 @@ def test_extract_from_comment_adjacent_word():
         "index": 21,
         "determiner": ""  # word between "a" and "brother"; regex would not capture
     }]
-    actual = extract_kinship_terms.extract_from_comment(sentence, terms)
+    actual = matcher.extract(sentence)
     assert actual == expected
 
 
@@ -168,7 +175,7 @@ def test_extract_from_comment_wife():
         "index": 19,
         "determiner": ""
     }]
-    actual = extract_kinship_terms.extract_from_comment(sentence, terms)
+    actual = matcher.extract(sentence)
     assert actual == expected
 
 
@@ -182,7 +189,7 @@ def test_extract_from_comment_wives():
         "index": 5,
         "determiner": ""
     }]
-    actual = extract_kinship_terms.extract_from_comment(sentence, terms)
+    actual = matcher.extract(sentence)
     assert actual == expected
 
 
@@ -196,7 +203,7 @@ def test_extract_from_comment_so():
         "index": 16,
         "determiner": "my"
     }]
-    actual = extract_kinship_terms.extract_from_comment(sentence, terms)
+    actual = matcher.extract(sentence)
     assert actual == expected
 
 
@@ -210,14 +217,14 @@ def test_extract_from_comment_possessive():
         "index": 7,
         "determiner": "\'s"
     }]
-    actual = extract_kinship_terms.extract_from_comment(sentence, terms)
+    actual = matcher.extract(sentence)
     assert actual == expected
 
 
 def test_extract_from_comment_other_words():
     sentence = 'springfield was visited for parenting purposes'
     expected = []
-    actual = extract_kinship_terms.extract_from_comment(sentence, terms)
+    actual = matcher.extract(sentence)
     assert actual == expected
 
 
@@ -231,7 +238,7 @@ def test_extract_from_comment_new_line():
         "index": 14,
         "determiner": ""
     }]
-    actual = extract_kinship_terms.extract_from_comment(sentence, terms)
+    actual = matcher.extract(sentence)
     assert actual == expected
 
 
@@ -246,10 +253,302 @@ tall mom"""
         "index": 14,
         "determiner": ""
     }]
-    actual = extract_kinship_terms.extract_from_comment(sentence, terms)
+    actual = matcher.extract(sentence)
     assert actual == expected
 
 
+def test_extract_from_comment_query():
+    # extract_from_comment still takes the query string from get_terms
+    sentence = "are you close with your mom? my mom and i are really close"
+    assert extract_kinship_terms.extract_from_comment(sentence, terms) == matcher.extract(sentence)
+    assert extract_kinship_terms.get_matcher(terms) is extract_kinship_terms.get_matcher(terms)
+
+
+def reference_determine_determiner(first, sentence):
+    """determine_determiner as it was before it only looked at the text before first; used to check the results
+    haven't changed.
+    """
+    for category, determiners in [('specific', extract_kinship_terms.SPECIFIC_DETERMINERS),
+                                  ('mixed', extract_kinship_terms.MIXED_DETERMINERS),
+                                  ('generic', extract_kinship_terms.GENERIC_DETERMINERS)]:
+        for determiner in determiners:
+            if determiner == '\'s':
+                query_str = rf'(?P<det>{determiner})\s'
+            else:
+                query_str = rf'(^|\s)(?P<det>{determiner})\s'
+            for match in regex.finditer(query_str, sentence, regex.IGNORECASE):
+                start, end = match.span()
+                if end == first:
+                    return category, sentence[start:end].strip()
+    return 'generic', ''
+
+
+@pytest.mark.parametrize('sentence', [
+    "my mom", "My MOM", "the the dad", "the the the dad", "my my mom", "my my my mom", "xmy my mom",
+    "his\this\nhis son", "her  her sister", "jill's 's bf", "JILL'S gf", "another other brother", "anothermom",
+    "a mom", "THİS mom", "İn this ſon", "so ur dad's dad", "that's it, our kids' kids",
+])
+def test_determine_determiner_parity(sentence):
+    for first in range(len(sentence) + 1):
+        assert extract_kinship_terms.determine_determiner(first, sentence) == \
+               reference_determine_determiner(first, sentence), (first, sentence)
+
+
+def test_determine_determiner_parity_random():
+    rng = random.Random(0)
+    words = sorted(extract_kinship_terms.SPECIFIC_DETERMINERS | extract_kinship_terms.MIXED_DETERMINERS |
+                   extract_kinship_terms.GENERIC_DETERMINERS) + ['mom', 'dads', 'Jill\'s', 'MY', 'The', 'x', '']
+    whitespace = [' ', ' ', ' ', '  ', '\n', '\t', ' ', ',', '']
+    for _ in range(2000):
+        sentence = ''.join(rng.choice(words) + rng.choice(whitespace) for _ in range(rng.randint(1, 8)))
+        for first in range(len(sentence) + 1):
+            assert extract_kinship_terms.determine_determiner(first, sentence) == \
+                   reference_determine_determiner(first, sentence), (first, sentence)
+
+
+def test_write_csv_from_json_compressed(tmp_path):
+    comments = [{"body": "my mom and your dads", "author": "someone", "subreddit": "test", "created_utc": 1, "id": "a"},
+                {"body": "ask the bot", "author": "helper_bot", "subreddit": "test", "created_utc": 2, "id": "b"},
+                {"body": "my grandma bakes \u00e9clairs", "author": "x", "subreddit": "test", "created_utc": 3, "id": "c"}]
+    outputs = []
+    for suffix in ['', '.gz', '.zst']:
+        file = str(tmp_path / f'test{suffix.replace(".", "_")}.json{suffix}')
+        with open_jsonl(file, 'w') as f:
+            f.write(''.join(json.dumps(c) + '\n' for c in comments))
+        extract_kinship_terms.write_csv_from_json(file, matcher)
+        with open(file[:file.index('.json')] + '.csv', encoding='utf-8') as f:
+            outputs.append(f.read())
+    assert outputs[0].count('\n') == 4  # header, mom, dad, grandma
+    assert outputs[0] == outputs[1] == outputs[2]
+
+
+def test_write_csv_from_json_dedupe_ids(tmp_path):
+    comment = {"body": "my mom", "author": "someone", "subreddit": "test", "created_utc": 1, "id": "a"}
+    file = str(tmp_path / 'test.json')
+    with open(file, 'w') as f:
+        f.write(json.dumps(comment) + '\n' + json.dumps(dict(comment, id='b')) + '\n' + json.dumps(comment) + '\n')
+    extract_kinship_terms.write_csv_from_json(file, matcher)
+    with open(str(tmp_path / 'test.csv')) as f:
+        assert f.read().count('\n') == 3  # header, a and b
+    extract_kinship_terms.write_csv_from_json(file, terms, dedupe_ids=False)
+    with open(str(tmp_path / 'test.csv')) as f:
+        assert f.read().count('\n') == 4
+
+
+def test_write_csv_from_json_processes(tmp_path):
+    bodies = ['my mom and your dads', 'ask the bot', 'the the dad', 'his\r\nsister', '[removed]', 'no terms here']
+    authors = ['someone', 'helper_bot', 'x']
+    comments = [{"body": bodies[i % len(bodies)], "author": authors[i % len(authors)], "subreddit": "test",
+                 "created_utc": i, "id": format(i % 150, 'x')} for i in range(200)]  # the last 50 are repeats
+    file = str(tmp_path / 'test.json')
+    with open(file, 'w', encoding='utf-8', newline='') as f:
+        f.write(''.join(json.dumps(c) + ('\r\n' if i % 7 == 0 else '\n') for i, c in enumerate(comments)))
+
+    outputs = []
+    for n_processes in [1, 3]:
+        for dedupe_ids in [True, False]:
+            extract_kinship_terms.write_csv_from_json(file, matcher, dedupe_ids=dedupe_ids, n_processes=n_processes)
+            with open(str(tmp_path / 'test.csv'), 'rb') as f:
+                outputs.append(f.read())
+    assert outputs[0] == outputs[2]
+    assert outputs[1] == outputs[3]
+    assert len(outputs[0]) < len(outputs[1])
+
+
+def test_write_csv_from_json_dedupe_bodies(tmp_path):
+    bodies = ['my mom and your dads', 'ask the bot', 'the the dad', 'my mom and your dads', 'no terms here']
+    authors = ['someone', 'helper_bot', 'someone_else']
+    comments = [{"body": bodies[i % len(bodies)], "author": authors[i % len(authors)], "subreddit": "test",
+                 "created_utc": i, "id": format(i, 'x')} for i in range(40)]
+    file = str(tmp_path / 'test.json')
+    with open(file, 'w') as f:
+        f.write(''.join(json.dumps(c) + '\n' for c in comments))
+
+    outputs = []
+    for n_processes, dedupe_bodies in [(1, None), (1, 'hash'), (2, 'hash'), (1, 'bloom')]:
+        stats = extract_kinship_terms.write_csv_from_json(file, matcher, n_processes=n_processes,
+                                                          dedupe_bodies=dedupe_bodies)
+        with open(str(tmp_path / 'test.csv')) as f:
+            outputs.append(list(csv.DictReader(f)))
+        if dedupe_bodies is not None:
+            assert stats.body_dedup['mode'] == dedupe_bodies
+            assert stats.body_dedup['added'] == 4  # every body but the repeated 'my mom and your dads'
+            assert 'repeated bodies skipped' in str(stats)
+    assert {row['body'] for row in outputs[0]} == {'my mom and your dads', 'the the dad'}
+    assert outputs[1] == outputs[2] == outputs[3]
+    assert [(row['body'], row['id']) for row in outputs[1]] == [('my mom and your dads', '0')] * 2 + \
+        [('the the dad', '2')]
+    with pytest.raises(ValueError):
+        extract_kinship_terms.write_csv_from_json(file, matcher, incremental=True, dedupe_bodies='hash')
+
+
+def test_read_comments_streams(tmp_path):
+    file = str(tmp_path / 'test.json')
+    with open(file, 'w') as f:
+        f.write('{"id": "a"}\n{"id": "b"}\nnot json\n')
+    stats = extract_kinship_terms.ExtractionStats()
+    comments = extract_kinship_terms.read_comments(file, stats)
+    assert [next(comments)['id'], next(comments)['id']] == ['a', 'b']  # the broken line hasn't been read yet
+    assert stats.comments == 2
+    with pytest.raises(json.JSONDecodeError):
+        next(comments)
+
+
+def test_write_csv_from_json_stats(tmp_path):
+    comment = {"body": "my mom and your dads", "author": "someone", "subreddit": "test", "created_utc": 1, "id": "a"}
+    file = str(tmp_path / 'test.json')
+    with open(file, 'w') as f:
+        f.write(json.dumps(comment) + '\n' + json.dumps(dict(comment, id='b', author='a_bot')) + '\n' +
+                json.dumps(comment) + '\n')
+    for n_processes in [1, 2]:
+        stats = extract_kinship_terms.write_csv_from_json(file, matcher, n_processes=n_processes)
+        assert (stats.comments, stats.rows) == (3, 2)
+        assert stats.peak_rss_mb > 0
+        assert '3 comments' in str(stats)
+
+
+def reference_valid_comment(author, body, subreddit):
+    """valid_author and valid_text as they were before valid_comments."""
+    if author == "[deleted]" or regex.findall(r"[Bb][Oo][Tt]$", author):
+        return False
+    if regex.findall("automoderato", author.lower()):
+        return False
+    if body is None or len(body) == 0 or body in ("[removed]", "[deleted]"):
+        return False
+    if extract_kinship_terms.PARENTING_COMMENT_FILTER in body and subreddit.lower() == 'parenting':
+        return False
+    if (extract_kinship_terms.ASKSCIENCE_COMMENT_FILTER in body or 'sister sub' in body) and \
+            subreddit.lower() == 'askscience':
+        return False
+    return True
+
+
+def test_valid_comments():
+    rng = random.Random(0)
+    authors = ['someone', '[deleted]', 'helper_bot', 'HelperBOT', 'bot_fan', 'AutoModerator', 'x']
+    bodies = [None, '', '[removed]', '[deleted]', 'my mom', 'a sister subreddit', 'my dad',
+              'my mom. ' + extract_kinship_terms.PARENTING_COMMENT_FILTER,
+              extract_kinship_terms.ASKSCIENCE_COMMENT_FILTER + ' my sister']
+    subreddits = ['Parenting', 'parenting', 'AskScience', 'askscience', 'AskReddit']
+    comments = [(rng.choice(authors), rng.choice(bodies), rng.choice(subreddits)) for _ in range(2000)]
+    mask = extract_kinship_terms.valid_comments(*map(list, zip(*comments)))
+    assert mask.tolist() == [reference_valid_comment(*comment) for comment in comments]
+    assert [extract_kinship_terms.valid_author(a) and extract_kinship_terms.valid_text(b, s)
+            for a, b, s in comments] == mask.tolist()
+
+    dictionaries = [{'author': a, 'body': b, 'subreddit': s} for a, b, s in comments]
+    checked = list(extract_kinship_terms.check_comments(dictionaries, batch_size=300))
+    assert [data for data, _ in checked] == dictionaries
+    assert [valid for _, valid in checked] == mask.tolist()
+
+
+def test_might_contain_terms():
+    assert matcher.might_contain_terms('My MOM')
+    assert matcher.might_contain_terms('ask your S/O')
+    assert matcher.might_contain_terms('ſons')  # matches "sons"
+    assert matcher.might_contain_terms('kİds')  # matches "kids", though 'İ'.lower() is 'i' and a combining dot
+    assert not matcher.might_contain_terms('this is a great question')
+    rng = random.Random(0)
+    words = ['mom', 'MOMS', 'Kid', 'ſon', 'kİd', 'Significant Other', 'S/O', 'wIVes', 'great', 'question', '']
+    for _ in range(2000):
+        sentence = ''.join(rng.choice(words) + rng.choice([' ', ', ', '\n', '']) for _ in range(rng.randint(1, 5)))
+        if matcher.extract(sentence):
+            assert matcher.might_contain_terms(sentence), sentence
+
+
+def test_write_csv_from_json_prefilter(tmp_path):
+    comments = [{"body": body, "author": "someone", "subreddit": "test", "created_utc": 1, "id": id}
+                for id, body in [('a', 'my mom'), ('b', 'great question'), ('c', 'a person with a reason'),
+                                 ('a', 'my mom')]]
+    file = str(tmp_path / 'test.json')
+    with open(file, 'w') as f:
+        f.write(''.join(json.dumps(c) + '\n' for c in comments))
+    outputs = []
+    for n_processes, prefilter in [(1, False), (1, True), (2, True)]:
+        stats = extract_kinship_terms.write_csv_from_json(file, matcher, n_processes=n_processes,
+                                                          prefilter=prefilter)
+        if prefilter:
+            assert (stats.prefiltered, stats.candidates) == (3, 2)  # "person" and "reason" contain "son"
+            assert 'prefilter passed 2/3' in str(stats)
+        else:
+            assert stats.prefiltered == 0
+        with open(str(tmp_path / 'test.csv'), 'rb') as f:
+            outputs.append(f.read())
+    assert outputs[0] == outputs[1] == outputs[2]
+
+
+@pytest.mark.parametrize('suffix,n_processes', [('', 1), ('', 2), ('.gz', 1), ('.zst', 1)])
+def test_write_csv_from_json_incremental(tmp_path, suffix, n_processes):
+    def comment(id, body):
+        return json.dumps({"body": body, "author": "x", "subreddit": "test", "created_utc": 1, "id": id}) + '\n'
+
+    def write_csv(file, **kwargs):
+        kwargs = dict(dict(n_processes=n_processes, incremental=True), **kwargs)
+        stats = extract_kinship_terms.write_csv_from_json(file, kwargs.pop('matcher', matcher), **kwargs)
+        with open(file[:file.index('.json')] + '.csv', 'rb') as f:
+            return stats, f.read()
+
+    file = str(tmp_path / f'test.json{suffix}')
+    full_file = str(tmp_path / f'full.json{suffix}')
+    with open_jsonl(file, 'w') as f:
+        f.write(comment('a', 'my mom') + comment('b', 'your dads'))
+    stats, first = write_csv(file)
+    assert stats.comments == 2
+
+    with open_jsonl(file, 'a') as f:
+        f.write(comment('a', 'my mom') + comment('c', 'the sisters'))
+    if not suffix:
+        with open(file, 'a') as f:
+            f.write(comment('d', 'my son')[:20])  # still being written
+    stats, second = write_csv(file)
+    assert stats.comments == 2
+    assert second.startswith(first)
+    with open_jsonl(full_file, 'w') as f:
+        f.write(comment('a', 'my mom') + comment('b', 'your dads') + comment('a', 'my mom') +
+                comment('c', 'the sisters'))
+    assert write_csv(full_file, incremental=False)[1] == second
+
+    if not suffix:
+        with open(file, 'a') as f:
+            f.write(comment('d', 'my son')[20:])
+        with open(str(tmp_path / 'test.csv'), 'a') as f:
+            f.write('left by an interrupted run\n')
+        stats, third = write_csv(file)
+        assert stats.comments == 1
+        with open(full_file, 'a') as f:
+            f.write(comment('d', 'my son'))
+        assert write_csv(full_file, incremental=False)[1] == third
+
+    stats, nothing_new = write_csv(file)
+    assert stats.comments == 0
+
+    # different terms rebuild the csv file
+    stats, rebuilt = write_csv(file, matcher=extract_kinship_terms.KinshipMatcher('terms_test.csv'))
+    assert stats.comments > 2
+    assert rebuilt == write_csv(file, matcher=extract_kinship_terms.KinshipMatcher('terms_test.csv'),
+                                incremental=False)[1]
+
+
+def test_find_chunks(tmp_path):
+    file = tmp_path / 'test.json'
+    file.write_bytes(b'{"a": 1}\n{"b": 22}\n\n{"c": 333}\n')
+    data = file.read_bytes()
+    for n_chunks in range(1, 10):
+        chunks = extract_kinship_terms.find_chunks(str(file), n_chunks)
+        assert len(chunks) <= n_chunks
+        assert b''.join(data[start:end] for start, end in chunks) == data
+        assert all(data[end - 1:end] == b'\n' for _, end in chunks)
+    assert b''.join(data[start:end] for start, end in extract_kinship_terms.find_chunks(str(file), 3, 9, 20)) == \
+           data[9:20]
+
+
+def test_last_line_end(tmp_path):
+    file = tmp_path / 'test.json'
+    for data, end in [(b'', 0), (b'{}', 0), (b'{}\n', 3), (b'{}\n{"a"', 3), (b'{}\n' * 30000 + b'{', 90000)]:
+        file.write_bytes(data)
+        assert extract_kinship_terms.last_line_end(str(file)) == end
+
+
 def test_get_terms():
     file = 'terms_test.csv'
     actual = extract_kinship_terms.get_terms(file)
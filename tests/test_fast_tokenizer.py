@@ -0,0 +1,74 @@
+import pytest
+import fast_tokenizer
+import synthetic_corpus
+from benchmark_tokenizer import run_report
+from nltk import word_tokenize
+
+
+# To run these tests from the commandline, navigate to the directory
+# this file is stored in, and run the command "pytest".
+
+
+def has_punkt():
+    try:
+        word_tokenize('Is it installed? Yes.')
+        return True
+    except LookupError:
+        return False
+
+
+# The comparisons with word_tokenize need the Punkt English model (nltk.download('punkt_tab')).
+requires_punkt = pytest.mark.skipif(not has_punkt(), reason='the nltk Punkt English model is not installed')
+
+
+EXAMPLES = [
+    "My mom's car. It's my dad's, isn't it?",
+    "I can't believe (honestly) that \"my mom\" said... no--never!",
+    "Mr. Smith went to the U.S. at 3 p.m. today.",
+    "'Hello' said my moms' friends: 3,000 people, 10:30 am; e.g. kids.",
+    "I cannot go. I'm gonna wanna gotta lemme gimme",
+    "Price is $3.88 (roughly) 50% & more*",
+    "He said \"hi\" and 'bye'",
+    "J. K. Rowling wrote it. 3. the list",
+    "wait...what? ok!! sure.\n\"Yes\" she said",
+    "“Curly” quotes ‘here’ and mom’s — dash",
+    "word.)next x.) Next",
+    "more'n d'ye 'tis 'twas",
+    "a.\n\"b\"",
+    "http://example.com/a.b?c=d&e=f",
+    "\"quote.\" Next",
+    "mom.'s children.! Child.!",
+    "he said: 'no.'",
+    "It cost $5. ... I. ... 3.5. ...",
+    "a -- b---c",
+]
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("My mom's car.", ['My', 'mom', "'s", 'car', '.']),
+    ("Mr. Smith can't go.", ['Mr.', 'Smith', 'ca', "n't", 'go', '.']),
+    ('She said "my son" is gonna visit', ['She', 'said', '``', 'my', 'son', "''", 'is', 'gon', 'na', 'visit']),
+    ('3,000 people at 10:30, e.g. kids...', ['3,000', 'people', 'at', '10:30', ',', 'e.g.', 'kids', '...']),
+])
+def test_tokenize(text, expected):
+    assert fast_tokenizer.tokenize(text) == expected
+
+
+@requires_punkt
+def test_tokenize_like_word_tokenize():
+    for text in EXAMPLES:
+        assert fast_tokenizer.tokenize(text) == word_tokenize(text), text
+
+
+@requires_punkt
+def test_run_report():
+    bodies = [c['body'] for c in synthetic_corpus.make_corpus(500, removed_rate=0.0, terms_file='../terms.csv')]
+    report = run_report(bodies, '../terms.csv', repeats=1)
+    assert report['agreement_rate'] > 0.99
+    assert abs(report['total_words_drift']) < 0.001
+    assert report['fast_total_words'] > 0
+    assert len(report['differences']) <= 10
+
+
+if __name__ == '__main__':
+    pytest.main(['test_fast_tokenizer.py', '-v'])
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+import zstandard
+import ingest_dumps
+from jsonl_io import open_jsonl
+
+
+# To run these tests from the commandline, navigate to the directory
+# this file is stored in, and run the command "pytest".
+
+SUBREDDITS = ['Parenting', 'askscience']
+
+
+def write_dump(path, comments):
+    data = ''.join(json.dumps(comment) + '\n' for comment in comments).encode()
+    path.write_bytes(zstandard.ZstdCompressor().compress(data))
+    return str(path)
+
+
+def comment(id, body, subreddit='Parenting', created_utc=1600000000):
+    return {'id': id, 'body': body, 'author': 'someone', 'subreddit': subreddit, 'created_utc': created_utc,
+            'score': 5, 'permalink': '/r/...'}
+
+
+def test_construct_term_pattern():
+    pattern = ingest_dumps.construct_term_pattern('../terms.csv')
+    assert pattern.search('My Mom is here')
+    assert pattern.search('my significant other, i mean')
+    assert pattern.search('ask your s/o')
+    assert pattern.search('sons and daughters')
+    assert not pattern.search('momentum')
+    assert not pattern.search('significant otherwise')
+
+
+def test_ingest_dumps(tmp_path):
+    dumps = [
+        write_dump(tmp_path / 'RC_2022-02.zst', [
+            comment('c1', 'my dad', created_utc='1643673600'),
+            comment('c2', 'my dad', subreddit='AskReddit'),
+            comment('c3', 'no kinship terms here', subreddit='askscience'),
+            # passes the subreddit pattern, but has no subreddit of its own
+            dict(comment('c4', 'my dad', subreddit=None), edited={'subreddit': 'Parenting'}),
+        ]),
+        write_dump(tmp_path / 'RC_2022-01.zst', [
+            comment('a1', 'my sister', subreddit='AskScience'),
+            comment('a2', 'their parents', subreddit='parenting'),
+        ]),
+    ]
+    counts = ingest_dumps.ingest_dumps(dumps, output_dir=str(tmp_path), subreddits=SUBREDDITS, n_processes=2,
+                                       terms_file='../terms.csv')
+    assert counts == {'Parenting': 2, 'askscience': 1}
+
+    with open(tmp_path / 'Parenting.comment.kinship_terms.json') as f:
+        parenting = [json.loads(line) for line in f]
+    assert [c['id'] for c in parenting] == ['a2', 'c1']  # in the order of the dump files
+    assert parenting[1] == {'body': 'my dad', 'author': 'someone', 'subreddit': 'Parenting',
+                            'created_utc': 1643673600, 'id': 'c1'}
+    assert not (tmp_path / 'dump_parts').exists()
+
+
+def test_ingest_dumps_id_index(tmp_path):
+    dumps = [
+        write_dump(tmp_path / 'RC_2022-01.zst', [comment('a1', 'my sister'), comment('a2', 'my brother')]),
+        write_dump(tmp_path / 'RC_2022-02.zst', [comment('a2', 'my brother'), comment('a3', 'my son')]),
+    ]
+    (tmp_path / 'Parenting.comment_ids').write_bytes(int('a1', 36).to_bytes(8, 'little'))  # from an earlier run
+    counts = ingest_dumps.ingest_dumps(dumps, output_dir=str(tmp_path), subreddits=['Parenting'],
+                                       terms_file='../terms.csv', use_id_index=True, compression='gzip')
+    assert counts == {'Parenting': 2}
+    with open_jsonl(str(tmp_path / 'Parenting.comment.kinship_terms.json.gz')) as f:
+        assert [json.loads(line)['id'] for line in f] == ['a2', 'a3']
+
+
+def test_ingest_dumps_existing_file(tmp_path):
+    (tmp_path / 'Parenting.comment.kinship_terms.json').write_text('')
+    with pytest.raises(ValueError):
+        ingest_dumps.ingest_dumps([], output_dir=str(tmp_path), subreddits=SUBREDDITS)
+
+
+if __name__ == '__main__':
+    pytest.main(['test_ingest_dumps.py', '-v'])
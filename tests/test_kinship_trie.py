@@ -0,0 +1,65 @@
+import random
+
+import extract_kinship_terms
+import kinship_trie
+import pytest
+
+
+# To run these tests from the commandline, navigate to the directory
+# this file is stored in, and run the command "pytest".
+
+terms = extract_kinship_terms.get_terms("../terms.csv")
+regex_matcher = extract_kinship_terms.KinshipMatcher(query=terms, engine='regex')
+trie_matcher = extract_kinship_terms.KinshipMatcher(query=terms, engine='trie')
+
+
+def test_parse_query():
+    alternatives = kinship_trie.parse_query(extract_kinship_terms.get_terms('terms_test.csv'))
+    assert alternatives == [('sister', 's'), ('significant other', 's'), ('child', 'ren'), ('wife', ''),
+                            ('wives', ''), ('s/o', '')]
+    with pytest.raises(ValueError):
+        kinship_trie.parse_query('(^|\\s)(?P<kinship_term>mo[mn])($|[\\s\\.,;:\\?!\\)])')
+    with pytest.raises(ValueError):
+        kinship_trie.parse_query('mom|dad')
+
+
+@pytest.mark.parametrize('sentence', [
+    "my mom dad", "Kids, childrens children.", "my significant other\tsignificant\tother significant others",
+    "ask your s/o!", "wives wife WIVES", "sons\n", "MOMS?x", "\nmom", " mom", "mom", "", "grandmother grandma's",
+    "ſons and Kids, İ said", "ıt's my sister\x1cbrother\x85dad mum", "mom\x00dad", "(mom) [dad] mom)",
+    "stepmom granddads grandchildrenn", "they've got a cute wife",
+])
+def test_trie_parity(sentence):
+    assert list(trie_matcher.find_terms(sentence)) == list(regex_matcher.find_terms(sentence))
+    assert trie_matcher.extract(sentence) == regex_matcher.extract(sentence)
+
+
+def test_trie_parity_random():
+    rng = random.Random(0)
+    words = ['mom', 'MOMS', 'kid', 'children', 'child', 'chil', 'wife', 'wives', 'wifes', 's/o', 's/os', 'significant',
+             'other', 'significant other', 'ſon', 'Kid', 'my', 'the', 'grandma', 'grandmother', 'x', '']
+    separators = [' ', ' ', '  ', '\n', '\t', '\x1c', ' ', '.', ',', ')', '(', "'", '-', '!', '?', '']
+    for _ in range(5000):
+        sentence = ''.join(rng.choice(words) + rng.choice(separators) for _ in range(rng.randint(1, 8)))
+        assert trie_matcher.extract(sentence) == regex_matcher.extract(sentence), sentence
+
+
+def test_write_csv_from_json_trie(tmp_path):
+    file = str(tmp_path / 'test.json')
+    with open(file, 'w') as f:
+        f.write('{"body": "my mom and your dads", "author": "x", "subreddit": "test", "created_utc": 1, "id": "a"}\n')
+    outputs = []
+    for matcher in [regex_matcher, trie_matcher]:
+        extract_kinship_terms.write_csv_from_json(file, matcher, n_processes=2)
+        with open(str(tmp_path / 'test.csv'), 'rb') as f:
+            outputs.append(f.read())
+    assert outputs[0] == outputs[1]
+
+
+def test_unknown_engine():
+    with pytest.raises(ValueError):
+        extract_kinship_terms.KinshipMatcher(query=terms, engine='automaton')
+
+
+if __name__ == '__main__':
+    pytest.main(['test_kinship_trie.py', '-v'])
@@ -0,0 +1,93 @@
+import json
+import os
+
+import pytest
+import extract_kinship_terms
+import mention_store
+
+
+# To run these tests from the commandline, navigate to the directory
+# this file is stored in, and run the command "pytest".
+
+matcher = extract_kinship_terms.KinshipMatcher('../terms.csv')
+
+
+def write_comments(file, comments):
+    with open(file, 'w', encoding='utf-8') as f:
+        f.write(''.join(json.dumps({"body": body, "author": "someone", "subreddit": "test", "created_utc": i,
+                                    "id": id}) + '\n' for i, (id, body) in enumerate(comments)))
+
+
+COMMENTS = [('a', 'my mom and your dads'), ('b', 'no terms here'), ('c', 'the sister, their grandma'),
+            ('a', 'my mom and your dads'), ('d', 'my son\'s kids')]
+
+
+def test_load_kinship_terms_parquet(tmp_path):
+    file = str(tmp_path / 'test.json')
+    output = str(tmp_path / 'test.csv')
+    write_comments(file, COMMENTS)
+    extract_kinship_terms.write_csv_from_json(file, matcher)
+    expected = mention_store.load_kinship_terms(output)
+    assert len(expected) == 5
+
+    extract_kinship_terms.write_csv_from_json(file, matcher, output_format='parquet')
+    assert mention_store.has_store(output)
+    os.remove(output)
+    assert mention_store.load_kinship_terms(output).equals(expected)
+    columns = ['kinship_term', 'body', 'index']
+    assert mention_store.load_kinship_terms(output, columns).equals(expected[columns])
+
+    # the comments table is only read for columns from it
+    comments_directory, _ = mention_store.store_directories(output[:-len('.csv')])
+    for part in mention_store.part_files(comments_directory):
+        os.remove(part)
+    columns = ['kinship_term', 'specific', 'singular', 'id']
+    assert mention_store.load_kinship_terms(output, columns).equals(expected[columns])
+
+    # writing a csv file again removes the store
+    extract_kinship_terms.write_csv_from_json(file, matcher)
+    assert not mention_store.has_store(output)
+
+
+def test_load_kinship_terms_empty_determiner(tmp_path):
+    file = str(tmp_path / 'test.json')
+    output = str(tmp_path / 'test.csv')
+    write_comments(file, [('a', 'grandma said hi'), ('b', 'my mom')])
+    extract_kinship_terms.write_csv_from_json(file, matcher)
+    from_csv = mention_store.load_kinship_terms(output, ['kinship_term', 'determiner'])
+    assert list(from_csv['determiner']) == ['', 'my']
+
+    extract_kinship_terms.write_csv_from_json(file, matcher, output_format='parquet')
+    assert mention_store.load_kinship_terms(output, ['kinship_term', 'determiner']).equals(from_csv)
+
+
+@pytest.mark.parametrize('n_processes', [1, 2])
+def test_write_parquet_incremental(tmp_path, n_processes):
+    file = str(tmp_path / 'test.json')
+    output = str(tmp_path / 'test.csv')
+    write_comments(file, COMMENTS[:2])
+    extract_kinship_terms.write_csv_from_json(file, matcher, n_processes=n_processes, incremental=True,
+                                              output_format='parquet')
+    write_comments(file, COMMENTS)
+    stats = extract_kinship_terms.write_csv_from_json(file, matcher, n_processes=n_processes, incremental=True,
+                                                      output_format='parquet')
+    assert stats.comments == 3
+    _, mentions_directory = mention_store.store_directories(output[:-len('.csv')])
+    assert len(mention_store.part_files(mentions_directory)) == 2
+    incremental = mention_store.load_kinship_terms(output)
+
+    extract_kinship_terms.write_csv_from_json(file, matcher, output_format='parquet')
+    assert len(mention_store.part_files(mentions_directory)) == 1
+    assert incremental.equals(mention_store.load_kinship_terms(output))
+    assert len(mention_store.load_kinship_terms(output, ['body'])) == 5
+
+
+def test_write_csv_from_json_output_format(tmp_path):
+    file = str(tmp_path / 'test.json')
+    write_comments(file, COMMENTS)
+    with pytest.raises(ValueError):
+        extract_kinship_terms.write_csv_from_json(file, matcher, output_format='feather')
+
+
+if __name__ == '__main__':
+    pytest.main(['test_mention_store.py', '-v'])
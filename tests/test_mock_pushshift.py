@@ -0,0 +1,60 @@
+import json
+
+import pytest
+import requests
+import scrape_data
+from mock_pushshift import MockPushshift
+
+
+# To run these tests from the commandline, navigate to the directory
+# this file is stored in, and run the command "pytest".
+
+
+@pytest.fixture
+def mock():
+    with MockPushshift(['Parenting'], n_comments=500) as mock:
+        yield mock
+
+
+def test_search(mock):
+    comments = mock.comments['parenting']
+    before = comments[100]['created_utc']
+    after = comments[300]['created_utc']
+    r = requests.get(mock.endpoint, params={'subreddit': 'Parenting', 'sort': 'desc', 'before': before,
+                                            'after': after, 'size': 1000, 'fields': 'id,created_utc',
+                                            'metadata': 'true'})
+    output = r.json()
+    expected = [c for c in comments if after < c['created_utc'] < before]
+    assert output['metadata']['total_results'] == len(expected)
+    assert len(output['data']) == 100  # size is capped like pushshift
+    assert output['data'] == [{'id': c['id'], 'created_utc': c['created_utc']} for c in expected[:100]]
+
+
+def test_search_q(mock):
+    r = requests.get(mock.endpoint, params={'subreddit': 'parenting', 'q': 'mom|"big brother"', 'size': 100})
+    assert r.json()['data']
+    assert all('mom' in c['body'].lower() for c in r.json()['data'])
+
+
+def test_errors():
+    with MockPushshift(['Parenting'], n_comments=10, error_rate_429=0.5, error_rate_5xx=0.5, retry_after=3) as mock:
+        statuses = [requests.get(mock.endpoint, params={'subreddit': 'Parenting'}) for _ in range(20)]
+    assert all(r.status_code != 200 for r in statuses)
+    assert all(r.headers['Retry-After'] == '3' for r in statuses if r.status_code == 429)
+    assert mock.stats['429'] + mock.stats['5xx'] == 20
+
+
+def test_scrape_with_errors(tmp_path, monkeypatch):
+    monkeypatch.setattr(scrape_data, 'BACKOFF_BASE', 0.01)
+    with MockPushshift(['Parenting'], n_comments=2000, error_rate_429=0.3, error_rate_5xx=0.3,
+                       retry_after=0) as mock:
+        count = scrape_data.retrieve_reddit_data('Parenting', output_dir=str(tmp_path), max_posts=None,
+                                                 endpoint=mock.endpoint, terms_file='../terms.csv')
+        assert mock.stats['429'] + mock.stats['5xx'] > 0
+    with open(tmp_path / 'Parenting.comment.kinship_terms.json') as f:
+        ids = [json.loads(line)['id'] for line in f]
+    assert count == len(ids) == len(set(ids))
+
+
+if __name__ == '__main__':
+    pytest.main(['test_mock_pushshift.py', '-v'])
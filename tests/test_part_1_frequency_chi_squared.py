@@ -0,0 +1,31 @@
+import importlib
+import os
+
+import collect_data
+import pytest
+from extract_kinship_terms import write_manifest
+
+
+# To run these tests from the commandline, navigate to the directory
+# this file is stored in, and run the command "pytest".
+
+
+@pytest.fixture
+def chi_squared(monkeypatch):
+    monkeypatch.chdir('..')  # it reads terms.csv when it's imported
+    return importlib.import_module('part_1_frequency_chi_squared')
+
+
+def test_load_total_words(tmp_path, chi_squared):
+    frequency_dir = str(tmp_path)
+    assert chi_squared.load_total_words(frequency_dir) == chi_squared.TOTAL_WORDS
+    write_manifest(os.path.join(frequency_dir, collect_data.MANIFEST_FILE),
+                   {'subreddits': {'parenting': {'total_words': 100000123}, 'aww': {'total_words': 42}}})
+    total_words = chi_squared.load_total_words(frequency_dir)
+    assert total_words['parenting'] == 100000123
+    assert total_words['aww'] == 42
+    assert total_words['askscience'] == chi_squared.TOTAL_WORDS['askscience']
+
+
+if __name__ == '__main__':
+    pytest.main(['test_part_1_frequency_chi_squared.py', '-v'])
@@ -0,0 +1,288 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+import jsonl_io
+import scrape_data
+from jsonl_io import open_jsonl
+
+
+# To run these tests from the commandline, navigate to the directory
+# this file is stored in, and run the command "pytest".
+
+N_COMMENTS = 250
+
+
+def make_comments(sub, n=N_COMMENTS):
+    # newest first, one second apart
+    return [{"body": f"my mom said {i}", "author": f"user{i}", "subreddit": sub,
+             "created_utc": 1600000000 - i, "id": f"{sub.lower()}{i}"} for i in range(n)]
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Answers like the pushshift comment search endpoint. The first request for each
+    subreddit gets a 429, so the retry path is exercised too.
+    """
+    comments = {}
+    seen = set()
+    n_requests = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        params = parse_qs(urlparse(self.path).query)
+        sub = params['subreddit'][0]
+        with self.lock:
+            StandInHandler.n_requests += 1
+            first_time = sub not in self.seen
+            self.seen.add(sub)
+        if first_time:
+            self.send_response(429)
+            self.send_header('Retry-After', '0')
+            self.end_headers()
+            return
+
+        before = int(params['before'][0])
+        size = int(params['size'][0])
+        after = int(params['after'][0]) if 'after' in params else 0
+        matching = [c for c in self.comments[sub] if after < c['created_utc'] < before]
+        output = {'data': matching[:size]}
+        if params.get('metadata') == ['true']:
+            output['metadata'] = {'total_results': len(matching)}
+        body = json.dumps(output).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def endpoint(monkeypatch):
+    monkeypatch.setattr(scrape_data, 'BACKOFF_BASE', 0.01)
+    StandInHandler.comments = {sub: make_comments(sub) for sub in ['AskReddit', 'Parenting', 'askscience']}
+    StandInHandler.seen = set()
+    StandInHandler.n_requests = 0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}/reddit/search/comment/'
+    server.shutdown()
+    server.server_close()
+
+
+def read_ids(path):
+    with open_jsonl(str(path)) as f:
+        return [json.loads(line)['id'] for line in f]
+
+
+def test_retrieve_reddit_data(endpoint, tmp_path):
+    count = scrape_data.retrieve_reddit_data('Parenting', output_dir=str(tmp_path), max_posts=None,
+                                             endpoint=endpoint, terms_file='../terms.csv')
+    assert count == N_COMMENTS
+    ids = read_ids(tmp_path / 'Parenting.comment.kinship_terms.json')
+    assert ids == [c['id'] for c in make_comments('Parenting')]
+
+
+def test_retrieve_reddit_data_existing_file(endpoint, tmp_path):
+    (tmp_path / 'Parenting.comment.kinship_terms.json').write_text('')
+    with pytest.raises(ValueError):
+        scrape_data.retrieve_reddit_data('Parenting', output_dir=str(tmp_path), endpoint=endpoint,
+                                         terms_file='../terms.csv')
+
+
+def test_retrieve_reddit_data_resume(endpoint, tmp_path):
+    output = tmp_path / 'Parenting.comment.kinship_terms.json'
+    comments = make_comments('Parenting')
+    # an interrupted run: 130 complete lines, the 131st only partly written
+    lines = [json.dumps(c) for c in comments[:131]]
+    output.write_text('\n'.join(lines[:130]) + '\n' + lines[130][:20])
+
+    count = scrape_data.retrieve_reddit_data('Parenting', output_dir=str(tmp_path), max_posts=None,
+                                             endpoint=endpoint, terms_file='../terms.csv', resume=True)
+    assert count == N_COMMENTS
+    assert read_ids(output) == [c['id'] for c in comments]
+
+
+def test_retrieve_reddit_data_resume_finished(endpoint, tmp_path):
+    output = tmp_path / 'Parenting.comment.kinship_terms.json'
+    output.write_text(''.join(json.dumps(c) + '\n' for c in make_comments('Parenting')[:120]))
+
+    count = scrape_data.retrieve_reddit_data('Parenting', output_dir=str(tmp_path), max_posts=100,
+                                             endpoint=endpoint, terms_file='../terms.csv', resume=True)
+    assert count == 120
+    assert StandInHandler.n_requests == 0
+    assert len(read_ids(output)) == 120
+
+
+@pytest.mark.parametrize('compression', ['gzip', 'zstd'])
+def test_retrieve_reddit_data_compressed_resume(endpoint, tmp_path, compression):
+    comments = make_comments('Parenting')
+    output = tmp_path / ('Parenting.comment.kinship_terms.json' + {'gzip': '.gz', 'zstd': '.zst'}[compression])
+    with open_jsonl(str(output), 'w') as f:
+        f.write(''.join(json.dumps(c) + '\n' for c in comments[:130]))
+    # cut the compressed stream off partway, like a crash would
+    output.write_bytes(output.read_bytes()[:-10])
+
+    count = scrape_data.retrieve_reddit_data('Parenting', output_dir=str(tmp_path), max_posts=None,
+                                             endpoint=endpoint, terms_file='../terms.csv', resume=True,
+                                             compression=compression)
+    assert count == N_COMMENTS
+    assert read_ids(output) == [c['id'] for c in comments]
+
+
+def test_retrieve_reddit_data_id_index(endpoint, tmp_path):
+    comments = make_comments('Parenting')
+    (tmp_path / 'first').mkdir()
+    count = scrape_data.retrieve_reddit_data('Parenting', output_dir=str(tmp_path / 'first'), max_posts=100,
+                                             endpoint=endpoint, terms_file='../terms.csv', use_id_index=True)
+    assert count == 100
+
+    # a second scrape writing to a new file skips everything the first one wrote
+    (tmp_path / 'first' / 'Parenting.comment.kinship_terms.json').rename(tmp_path / 'first' / 'old.json')
+    count = scrape_data.retrieve_reddit_data('Parenting', output_dir=str(tmp_path / 'first'), max_posts=None,
+                                             endpoint=endpoint, terms_file='../terms.csv', use_id_index=True)
+    assert count == N_COMMENTS - 100
+    assert read_ids(tmp_path / 'first' / 'Parenting.comment.kinship_terms.json') == [c['id'] for c in comments[100:]]
+
+
+@pytest.mark.parametrize('block_size', [7, 2 ** 16])
+def test_read_resume_point(tmp_path, monkeypatch, block_size):
+    monkeypatch.setattr(jsonl_io, 'TAIL_BLOCK_SIZE', block_size)
+    output = tmp_path / 'test.json'
+    comments = make_comments('test', 5)
+    for comment in comments[2:]:  # the last three were posted in the same second
+        comment['created_utc'] = comments[2]['created_utc']
+    output.write_text(''.join(json.dumps(c) + '\n' for c in comments) + '{"body": "my d')
+    n_comments, ids, oldest = scrape_data.read_resume_point(str(output))
+    assert n_comments == 5
+    assert ids == {'test2', 'test3', 'test4'}
+    assert oldest == comments[-1]['created_utc']
+    assert output.read_text().endswith('}\n')
+
+    output.write_text('')
+    assert scrape_data.read_resume_point(str(output)) == (0, set(), None)
+
+
+@pytest.mark.parametrize('suffix', ['', '.gz'])
+def test_read_resume_point_oldest_first(tmp_path, suffix):
+    output = str(tmp_path / ('test.json' + suffix))
+    with open_jsonl(output, 'w') as f:
+        f.write(''.join(json.dumps(c) + '\n' for c in reversed(make_comments('test', 3))))
+    with open(output, 'rb') as f:
+        data = f.read()
+    with pytest.raises(ValueError):
+        scrape_data.read_resume_point(output)
+    with open(output, 'rb') as f:
+        assert f.read() == data
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['test.json' + suffix]
+
+
+def test_retrieve_reddit_data_concurrently(endpoint, tmp_path):
+    subreddits = ['AskReddit', 'Parenting', 'askscience']
+    counts = scrape_data.retrieve_reddit_data_concurrently(
+        subreddits, n_workers=3, requests_per_second=100, output_dir=str(tmp_path), max_posts=120,
+        endpoint=endpoint, terms_file='../terms.csv')
+    assert counts == {sub: 200 for sub in subreddits}  # pages of 100, so it stops after the page reaching 120
+    for sub in subreddits:
+        ids = read_ids(tmp_path / f'{sub}.comment.kinship_terms.json')
+        assert ids == [c['id'] for c in make_comments(sub)][:200]
+    assert StandInHandler.n_requests == 3 * 3  # one 429 and two pages per subreddit
+
+
+def test_retrieve_reddit_data_sharded(endpoint, tmp_path):
+    comments = make_comments('AskReddit')
+    start_date = comments[-1]['created_utc']
+    end_date = comments[0]['created_utc'] + 1
+    count = scrape_data.retrieve_reddit_data_sharded(
+        'AskReddit', n_windows=5, start_date=start_date, end_date=end_date, output_dir=str(tmp_path),
+        max_posts=None, requests_per_second=100, endpoint=endpoint, terms_file='../terms.csv')
+    assert count == N_COMMENTS
+    assert read_ids(tmp_path / 'AskReddit.comment.kinship_terms.json') == [c['id'] for c in comments]
+    assert not (tmp_path / 'AskReddit.comment.kinship_terms.json.shards').exists()
+
+
+def test_retrieve_reddit_data_sharded_max_posts(endpoint, tmp_path):
+    comments = make_comments('AskReddit')
+    count = scrape_data.retrieve_reddit_data_sharded(
+        'AskReddit', n_windows=2, start_date=comments[-1]['created_utc'], end_date=comments[0]['created_utc'] + 1,
+        output_dir=str(tmp_path), max_posts=30, requests_per_second=100, endpoint=endpoint,
+        terms_file='../terms.csv')
+    assert count == 30
+    ids = read_ids(tmp_path / 'AskReddit.comment.kinship_terms.json')
+    assert ids == [c['id'] for c in comments[:30]]
+
+
+def test_retrieve_reddit_data_sharded_interrupted_merge(endpoint, tmp_path, monkeypatch):
+    comments = make_comments('AskReddit')
+    kwargs = dict(n_windows=2, start_date=comments[-1]['created_utc'], end_date=comments[0]['created_utc'] + 1,
+                  output_dir=str(tmp_path), max_posts=None, requests_per_second=100, endpoint=endpoint,
+                  terms_file='../terms.csv', use_id_index=True, resume=True)
+    merge_shards = scrape_data.merge_shards
+
+    def interrupted_merge(shard_files, output_filename, max_posts, id_index):
+        merge_shards(shard_files, output_filename, 10, id_index)
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(scrape_data, 'merge_shards', interrupted_merge)
+    with pytest.raises(KeyboardInterrupt):
+        scrape_data.retrieve_reddit_data_sharded('AskReddit', **kwargs)
+    assert not (tmp_path / 'AskReddit.comment.kinship_terms.json').exists()
+
+    monkeypatch.setattr(scrape_data, 'merge_shards', merge_shards)
+    assert scrape_data.retrieve_reddit_data_sharded('AskReddit', **kwargs) == N_COMMENTS
+    assert read_ids(tmp_path / 'AskReddit.comment.kinship_terms.json') == [c['id'] for c in comments]
+
+
+def test_merge_shards(tmp_path):
+    comments = make_comments('test', 6)
+    shards = [comments[0:4:2] + comments[3:4], comments[1:4:2] + comments[4:]]  # overlapping, each newest first
+    shards[0].sort(key=lambda c: -c['created_utc'])
+    files = []
+    for i, shard in enumerate(shards):
+        files.append(str(tmp_path / f'{i}.json'))
+        with open(files[-1], 'w') as f:
+            f.write(''.join(json.dumps(c) + '\n' for c in shard))
+    assert scrape_data.merge_shards(files, str(tmp_path / 'out.json')) == 6
+    assert read_ids(tmp_path / 'out.json') == [c['id'] for c in comments]
+
+
+def test_fetch_page_stats(endpoint):
+    stats = scrape_data.ScrapeStats()
+    query = endpoint + '?subreddit=Parenting&size=10&before=1700000000'
+    assert len(scrape_data.fetch_page(scrape_data.make_session(), query, stats=stats)['data']) == 10
+    assert stats.requests == 2  # a 429 first
+    assert stats.retries == 1
+    assert stats.bytes > 0
+    assert len(stats.latencies) == 2
+
+
+def test_fetch_page_max_retries(monkeypatch):
+    monkeypatch.setattr(scrape_data, 'BACKOFF_BASE', 0.01)
+    stats = scrape_data.ScrapeStats()
+    with pytest.raises(RuntimeError):
+        # nothing is listening on port 9 (discard), so every attempt fails
+        scrape_data.fetch_page(scrape_data.make_session(), 'http://127.0.0.1:9/', stats=stats, max_retries=3)
+    assert stats.retries == 3
+    assert stats.requests == 0
+
+
+def test_backoff_delay():
+    for attempt in range(10):
+        assert 0 <= scrape_data.backoff_delay(attempt, base=1, cap=30) <= min(30, 2 ** attempt)
+
+
+def test_rate_limiter_backoff():
+    limiter = scrape_data.RateLimiter(rate=1000, burst=1)
+    limiter.backoff(0.2)
+    start = scrape_data.time.monotonic()
+    limiter.acquire()
+    assert scrape_data.time.monotonic() - start >= 0.2
+
+
+if __name__ == '__main__':
+    pytest.main(['test_scrape_data.py', '-v'])
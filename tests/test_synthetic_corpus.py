@@ -0,0 +1,54 @@
+import json
+
+import pytest
+import extract_kinship_terms
+import synthetic_corpus
+from scrape_data import FIELDS
+
+
+# To run these tests from the commandline, navigate to the directory
+# this file is stored in, and run the command "pytest".
+
+
+def test_make_corpus():
+    comments = list(synthetic_corpus.make_corpus(2000, terms_file='../terms.csv', seed=1))
+    assert comments == list(synthetic_corpus.make_corpus(2000, terms_file='../terms.csv', seed=1))
+    assert comments != list(synthetic_corpus.make_corpus(2000, terms_file='../terms.csv', seed=2))
+    assert all(list(c) == FIELDS for c in comments)
+    assert len({c['id'] for c in comments}) == len(comments)
+    assert all(a['created_utc'] >= b['created_utc'] for a, b in zip(comments, comments[1:]))
+
+    valid = extract_kinship_terms.valid_comments([c['author'] for c in comments], [c['body'] for c in comments],
+                                                 [c['subreddit'] for c in comments])
+    assert 0.8 < valid.mean() < 0.95  # about 3% bots, 5% deleted authors and 5% removed bodies
+    lengths = sorted(len(c['body'].split()) for c in comments if c['body'] not in synthetic_corpus.REMOVED_BODIES)
+    assert lengths[len(lengths) // 2] < 50 < lengths[-1]
+
+
+@pytest.mark.parametrize('term_density', [0.0, 0.2, 1.0])
+def test_make_corpus_term_density(term_density):
+    matcher = extract_kinship_terms.KinshipMatcher('../terms.csv')
+    comments = synthetic_corpus.make_corpus(500, term_density=term_density, removed_rate=0.0,
+                                            terms_file='../terms.csv')
+    sentences = terms = 0
+    for c in comments:
+        sentences += sum(c['body'].count(p) for p in '.!?')
+        terms += len(matcher.extract(c['body']))
+    if term_density == 0.0:
+        assert terms == 0
+    else:
+        assert 0.5 * term_density < terms / sentences < 1.5 * term_density
+
+
+def test_write_corpus(tmp_path):
+    file = str(tmp_path / 'test.json')
+    n_bytes = synthetic_corpus.write_corpus(file, 100, terms_file='../terms.csv')
+    with open(file, 'rb') as f:
+        data = f.read()
+    assert len(data) == n_bytes
+    assert [json.loads(line) for line in data.splitlines()] == \
+           list(synthetic_corpus.make_corpus(100, terms_file='../terms.csv'))
+
+
+if __name__ == '__main__':
+    pytest.main(['test_synthetic_corpus.py', '-v'])